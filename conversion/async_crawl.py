@@ -0,0 +1,256 @@
+"""
+async_crawl.py
+
+asyncio crawl engine used by scrape_profiles.py (--mode async).
+
+Instead of one thread per in-flight request sleeping between fetches, a fixed
+number of worker coroutines share a single aiohttp session (keep-alive
+connection pool) and take a token from a per-host token bucket before each
+request. Concurrency and request rate are therefore configured separately:
+--concurrency caps in-flight requests, --rate/--burst cap requests per second
+per host.
+"""
+import asyncio
+import codecs
+import queue
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import crawl_metrics
+from retry_policy import classify
+
+try:
+    import aiohttp
+except Exception:
+    print("Missing dependencies. Install with: pip install -r conversion/requirements.txt", file=sys.stderr)
+    raise
+
+
+class TokenBucket:
+    """Token bucket limiter: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    """Lazily creates one TokenBucket per host."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def for_url(self, url):
+        host = urlsplit(url).netloc.lower()
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+
+def _trace_config():
+    """aiohttp hooks recording dns, connect (TCP + TLS), ttfb and connection-pool waits."""
+    trace = aiohttp.TraceConfig()
+
+    def now():
+        return time.perf_counter()
+
+    async def request_start(_session, ctx, _params):
+        ctx.start = now()
+        ctx.setup = 0.0
+
+    async def pool_wait_start(_session, ctx, _params):
+        ctx.queued = now()
+
+    async def pool_wait_end(_session, ctx, _params):
+        waited = now() - ctx.queued
+        ctx.setup += waited
+        crawl_metrics.observe('wait', 'queue', waited)
+
+    async def dns_start(_session, ctx, _params):
+        ctx.dns = now()
+
+    async def dns_end(_session, ctx, _params):
+        ctx.dns = now() - ctx.dns
+        crawl_metrics.observe('fetch', 'dns', ctx.dns)
+
+    async def connect_start(_session, ctx, _params):
+        ctx.dns = 0.0
+        ctx.connecting = now()
+
+    async def connect_end(_session, ctx, _params):
+        opened = now() - ctx.connecting
+        ctx.setup += opened
+        crawl_metrics.observe('fetch', 'connect', max(0.0, opened - ctx.dns))
+
+    async def request_end(_session, ctx, _params):
+        # response headers are in
+        crawl_metrics.observe('fetch', 'ttfb', max(0.0, now() - ctx.start - ctx.setup))
+
+    trace.on_request_start.append(request_start)
+    trace.on_connection_queued_start.append(pool_wait_start)
+    trace.on_connection_queued_end.append(pool_wait_end)
+    trace.on_dns_resolvehost_start.append(dns_start)
+    trace.on_dns_resolvehost_end.append(dns_end)
+    trace.on_connection_create_start.append(connect_start)
+    trace.on_connection_create_end.append(connect_end)
+    trace.on_request_end.append(request_end)
+    return trace
+
+
+def _charset(resp, body):
+    """Python codec name for the response's declared charset; UTF-8 if it has none or Python doesn't know it."""
+    try:
+        return codecs.lookup(resp.get_encoding() if body else 'utf-8').name
+    except (LookupError, ValueError):
+        return 'utf-8'
+
+
+async def _fetch(session, url, parse, timeout, cache=None, archive=None):
+    req_headers = cache.conditional_headers(url) if cache is not None else None
+    digest = None
+    t0 = time.perf_counter()
+    try:
+        async with session.get(url, headers=req_headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status != 304:
+                resp.raise_for_status()
+            status = resp.status
+            t_body = time.perf_counter()
+            body = await resp.read()
+            crawl_metrics.observe('fetch', 'download', time.perf_counter() - t_body)
+            encoding = _charset(resp, body)
+            resp_headers = resp.headers
+    except Exception as e:
+        # status/retry_after/timeout let retry_policy.classify() decide whether to retry
+        headers = getattr(e, 'headers', None) or {}
+        result = {'url': url, 'error': str(e) or type(e).__name__, 'badges': [], 'status': getattr(e, 'status', None),
+                  'retry_after': headers.get('Retry-After'), 'timeout': isinstance(e, asyncio.TimeoutError)}
+        crawl_metrics.observe('fetch', 'total', time.perf_counter() - t0)
+        crawl_metrics.inc('requests', classify(result))
+        return result
+    crawl_metrics.observe('fetch', 'total', time.perf_counter() - t0)
+    crawl_metrics.inc('bytes', amount=len(body))
+    if archive is not None and status == 200:
+        archive.add(url, body, encoding)
+
+    if cache is not None:
+        badges, digest = cache.check(url, status, body)
+        if badges is not None:
+            crawl_metrics.inc('requests', 'not_modified' if status == 304 else 'unchanged')
+            return {'url': url, 'badges': badges, 'cached': True}
+    if status == 304:
+        crawl_metrics.inc('requests', 'stale')
+        if cache is None:
+            return {'url': url, 'error': '304 Not Modified for an unconditional request', 'badges': [], 'status': 304,
+                    'retry_after': None, 'timeout': False}
+        # nothing cached to reuse: the whole page again, without validators, and it isn't cached (digest None)
+        return await _fetch(session, url, parse, timeout, None, archive)
+    crawl_metrics.inc('requests', 'ok')
+
+    # Parsing is CPU-bound; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    try:
+        badges = await loop.run_in_executor(None, parse, body.decode(encoding, errors='replace'))
+    except Exception as e:
+        return {'url': url, 'error': f'parse failed: {e}', 'badges': [], 'kind': 'parse'}
+    if cache is not None and digest is not None:
+        cache.store(url, resp_headers, digest, badges)
+    return {'url': url, 'badges': badges}
+
+
+async def crawl(entries, get_url, parse, on_result, headers=None, concurrency=10, rate=10.0, burst=10, timeout=15,
+                cache=None, breaker=None, archive=None):
+    """Fetch every entry's profile and call on_result(entry, result, err) as each one finishes.
+
+    The callback receives the same (entry, result, err) triples that
+    scrape_profiles.worker returns, so callers can share their update logic.
+    If a FetchCache is given, requests are conditional and unchanged pages
+    are not parsed. If a retry_policy.HostBreaker is given, each request also
+    takes one of its per-host slots. If a page_archive.PageArchive is given,
+    every page body received is added to it.
+    """
+    limiter = HostLimiter(rate, burst)
+    todo = asyncio.Queue()
+    for entry in entries:
+        todo.put_nowait(entry)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector, headers=headers, trace_configs=[_trace_config()]) as session:
+
+        async def worker():
+            while True:
+                try:
+                    entry = todo.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                url = get_url(entry)
+                if not url:
+                    on_result(entry, None, 'no-url')
+                    continue
+                t0 = time.perf_counter()
+                await limiter.for_url(url).acquire()
+                crawl_metrics.observe('wait', 'rate', time.perf_counter() - t0)
+                if breaker is None:
+                    on_result(entry, await _fetch(session, url, parse, timeout, cache, archive), None)
+                    continue
+                wait = breaker.try_acquire(url)
+                if wait:
+                    t0 = time.perf_counter()
+                    while wait:
+                        await asyncio.sleep(wait)
+                        wait = breaker.try_acquire(url)
+                    crawl_metrics.observe('wait', 'breaker', time.perf_counter() - t0)
+                result = None
+                try:
+                    result = await _fetch(session, url, parse, timeout, cache, archive)
+                finally:
+                    breaker.release(url, result)
+                on_result(entry, result, None)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+
+def iter_crawl(entries, get_url, parse, **kwargs):
+    """Run crawl() on a background event loop and yield (entry, result, err) as results arrive."""
+    results = queue.Queue()
+    done = object()
+    failure = []
+
+    def run():
+        try:
+            asyncio.run(crawl(entries, get_url, parse, lambda *r: results.put(r), **kwargs))
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=run, name='async-crawl', daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        yield item
+    thread.join()
+    if failure:
+        raise failure[0]
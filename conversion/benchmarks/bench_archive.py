@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+bench_archive.py
+
+Build a page_archive.PageArchive from the profile simulator's pages (no
+network) and time reparse over it, in one process and on every core, next
+to the pack size against the raw HTML. This is the cost of checking an
+extractor change against the whole cohort offline.
+
+Usage examples:
+  python conversion/benchmarks/bench_archive.py --cohort 20000
+  python conversion/benchmarks/bench_archive.py --cohort 20000 --page-kb 60
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONVERSION_DIR)
+
+import profile_simulator  # noqa: E402
+from page_archive import PageArchive, index_path, reparse  # noqa: E402
+from scrape_profiles import PARSER_BACKEND  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark archiving profile pages and reparsing them offline')
+    parser.add_argument('--cohort', '-n', type=int, default=20000)
+    parser.add_argument('--page-kb', type=float, default=40, help='Pad pages to about this size (KiB)')
+    parser.add_argument('--parser', default=PARSER_BACKEND)
+    parser.add_argument('--workers', type=int, default=0, help='Parser processes for the parallel run, 0 = one per CPU')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_archive_')
+    path = os.path.join(tmp, 'pages.pack')
+    archive = PageArchive(path)
+    raw = 0
+    t0 = time.perf_counter()
+    for i in range(args.cohort):
+        pid = f'00000000-0000-0000-0000-{i:012d}'
+        body, _etag = profile_simulator.page_for(pid, int(args.page_kb * 1024))
+        raw += len(body)
+        archive.add(f'http://127.0.0.1/public_profiles/{pid}', body, 'utf-8')
+    archive.close()
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    archive = PageArchive(path)
+    load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    serial, _ = reparse(archive, args.parser, workers=1)
+    one = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    parallel, strategies = reparse(archive, args.parser, workers=args.workers or None)
+    many = time.perf_counter() - t0
+    assert serial == parallel
+
+    packed = os.path.getsize(path) + os.path.getsize(index_path(path))
+    print(f'{args.cohort} profiles, {len(archive.blobs)} distinct pages: {raw / 2**20:.1f} MiB of HTML -> '
+          f'{packed / 2**20:.1f} MiB pack + index ({raw / packed:.1f}x), archived in {build:.2f}s')
+    print(f'index load {load * 1000:.0f}ms   reparse with {args.parser}: 1 process {one:.2f}s   '
+          f'{args.workers or os.cpu_count()} processes {many:.2f}s ({len(parallel) / many:.0f} profiles/s) '
+          f"{', '.join(f'{k} {v}' for k, v in sorted(strategies.items()))}")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
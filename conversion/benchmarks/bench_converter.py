@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+bench_converter.py
+
+Compare converter.csv_to_json with the streaming converter on a synthetic
+campaign export: wall time, peak RSS and whether the outputs are identical.
+Each conversion runs in its own process so peak RSS is per path.
+
+Usage examples:
+  python conversion/benchmarks/bench_converter.py --rows 200000
+  python conversion/benchmarks/bench_converter.py --rows 1000000 --keep
+"""
+import argparse
+import filecmp
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONVERSION_DIR)
+
+def make_csv(path, rows, seed=1):
+    import profile_simulator
+    profile_simulator.write_export_csv(path, rows, 'https://www.cloudskillsboost.google', seed)
+
+
+def convert(path_in, path_out, how):
+    import converter
+    if how == 'legacy':
+        converter.csv_to_json(path_in, path_out)
+    else:
+        converter.csv_to_json_stream(path_in, path_out, ndjson=(how == 'ndjson'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark legacy vs streaming CSV -> JSON conversion')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated CSV/JSON files')
+    parser.add_argument('--run', nargs=3, metavar=('HOW', 'IN', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        how, path_in, path_out = args.run
+        t0 = time.perf_counter()
+        sys.stdout = open(os.devnull, 'w')
+        convert(path_in, path_out, how)
+        sys.stdout = sys.__stdout__
+        print(json.dumps({'seconds': time.perf_counter() - t0,
+                          'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+        return
+
+    tmp = tempfile.mkdtemp(prefix='bench_converter_')
+    src = os.path.join(tmp, 'export.csv')
+    make_csv(src, args.rows)
+    print(f'{args.rows} rows, {os.path.getsize(src) / 2**20:.1f} MiB CSV in {tmp}')
+
+    outputs = {}
+    for how in ('legacy', 'stream', 'ndjson'):
+        out = os.path.join(tmp, f'{how}.json')
+        stats = json.loads(subprocess.run([sys.executable, os.path.abspath(__file__), '--run', how, src, out],
+                                          capture_output=True, text=True, check=True).stdout)
+        outputs[how] = out
+        print(f"{how:<7} {stats['seconds']:8.2f}s  {args.rows / stats['seconds']:10.0f} rows/s  "
+              f"peak RSS {stats['peak_rss_kb'] / 1024:8.1f} MiB")
+
+    same = filecmp.cmp(outputs['legacy'], outputs['stream'], shallow=False)
+    print(f'legacy and stream outputs identical: {same}')
+    if not args.keep:
+        for path in [src] + list(outputs.values()):
+            os.remove(path)
+        os.rmdir(tmp)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
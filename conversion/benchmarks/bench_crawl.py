@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+bench_crawl.py
+
+Compare crawl throughput (profiles/sec) of the thread-pool, asyncio and
+fetch/parse pipeline engines against the local profile simulator. No
+external requests.
+
+Usage examples:
+  python conversion/benchmarks/bench_crawl.py --profiles 500
+  python conversion/benchmarks/bench_crawl.py --profiles 2000 --latency 0.05 --rate 0
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_simulator  # noqa: E402
+import scrape_profiles  # noqa: E402
+
+
+def run_engine(name, results):
+    started = time.monotonic()
+    done = errors = 0
+    for _entry, result, _err in results:
+        done += 1
+        if result is None or result.get('error'):
+            errors += 1
+    elapsed = time.monotonic() - started
+    print(f'{name:<8} {done:>6} profiles  {elapsed:7.2f}s  {done / elapsed:8.1f} profiles/s  errors={errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crawl engines against a local simulator')
+    parser.add_argument('--profiles', '-n', type=int, default=500)
+    parser.add_argument('--concurrency', '-c', type=int, default=10)
+    parser.add_argument('--delay', '-d', type=float, default=1.0, help='Per-worker delay for the thread-pool path')
+    parser.add_argument('--rate', type=float, default=10.0, help='Per-host rate for the async path (0 = unlimited)')
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parser processes for the pipeline (0 = one per CPU)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency (s)')
+    args = parser.parse_args()
+
+    server, base_url = profile_simulator.start_server(latency=args.latency)
+    try:
+        cohort = profile_simulator.make_cohort(args.profiles, base_url)
+        print(f'Simulator at {base_url}, {args.profiles} profiles, concurrency={args.concurrency}')
+        run_engine('threads', scrape_profiles.crawl_threaded(cohort, args.concurrency, 15, args.delay))
+        run_engine('async', scrape_profiles.crawl_async(cohort, args.concurrency, 15, args.rate, args.burst))
+        run_engine('pipeline', scrape_profiles.crawl_pipeline(cohort, args.concurrency, args.parse_workers or None,
+                                                              delay=args.delay))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+bench_extract.py
+
+Check that every parser backend extracts exactly the same badges as the
+BeautifulSoup extractor, then report pages/sec and peak memory per backend.
+
+Memory is the tracemalloc peak over one pass through the corpus, on top of
+what was allocated before it: the trees, strings and result lists a parse
+builds. tracemalloc only sees Python's allocator, so the C-side trees of
+lxml (libxml2) and selectolax (lexbor) are not in it; peak RSS is printed
+next to it for those, but RSS barely moves on a corpus of small pages.
+
+The corpus is a directory of saved profile pages (*.html, e.g. pages saved
+while running inspect_profile_html.py) and/or synthetic pages covering the
+current '.profile-badges' markup plus the older layouts the heuristic
+fallbacks exist for.
+
+Usage examples:
+  python conversion/benchmarks/bench_extract.py
+  python conversion/benchmarks/bench_extract.py --fixtures saved_profiles/ --rounds 20
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_extract  # noqa: E402
+import profile_simulator  # noqa: E402
+import scrape_profiles  # noqa: E402
+
+
+def synthetic_corpus(n=200):
+    pages = []
+    titles = profile_simulator.BADGE_TITLES
+    for i in range(n):
+        pid = 'fixture-%04d' % i
+        pages.append(profile_simulator.render_profile(pid, titles[:i % (len(titles) + 1)]))
+    # Layouts the heuristic strategies handle; the fast path must defer on these
+    items = ''.join(f'<li><a href="/badges/{i}">{t} [Skill Badge]</a></li>' for i, t in enumerate(titles[:5]))
+    pages.append(f'<html><body><ul class="public-profile__badges">{items}</ul></body></html>')
+    links = ''.join(f'<a href="/quests/{i}">{t}</a>' for i, t in enumerate(titles[:3]))
+    pages.append(f'<html><body><section>{links}</section></body></html>')
+    pages.append('<html><body><p>Earned: Cloud Speech API: 3 Ways [Skill Badge]</p></body></html>')
+    pages.append('<html><body><div class="profile-badges"><div class="profile-badge">'
+                 '<div>Untitled layout</div></div></div></body></html>')
+    pages.append('<html><body><p>This user hasn\'t earned any badges yet.</p></body></html>')
+    return pages
+
+
+def load_corpus(fixtures, synthetic):
+    pages = []
+    if fixtures:
+        for path in sorted(glob.glob(os.path.join(fixtures, '*.html'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    if synthetic or not pages:
+        pages.extend(synthetic_corpus())
+    return pages
+
+
+def run_backend(backend, pages, rounds):
+    """Time one backend in this process and return its stats."""
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            scrape_profiles.extract_badges_from_html(page, backend)
+    elapsed = time.perf_counter() - started
+
+    # traced separately: tracemalloc would slow the timed loop down
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for page in pages:
+        scrape_profiles.extract_badges_from_html(page, backend)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {
+        'backend': backend,
+        'pages_per_sec': rounds * len(pages) / elapsed,
+        'peak_alloc_kb': peak / 1024,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'rss_growth_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify and benchmark badge extractor backends')
+    parser.add_argument('--fixtures', help='Directory of saved profile pages (*.html)')
+    parser.add_argument('--synthetic', action='store_true', help='Add synthetic pages even when --fixtures is given')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--backend', help=argparse.SUPPRESS)  # internal: time one backend in a fresh process
+    args = parser.parse_args()
+
+    pages = load_corpus(args.fixtures, args.synthetic)
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, pages, args.rounds)))
+        return
+
+    backends = fast_extract.available_backends() + ['bs4']
+    reference = [scrape_profiles.extract_badges_bs4(p) for p in pages]
+    mismatches = 0
+    for backend in backends:
+        for i, (page, expected) in enumerate(zip(pages, reference)):
+            got = scrape_profiles.extract_badges_from_html(page, backend)
+            if got != expected:
+                mismatches += 1
+                print(f'MISMATCH {backend} page {i}: {got!r} != {expected!r}')
+    print(f'{len(pages)} pages, backends: {", ".join(backends)}, mismatches: {mismatches}')
+
+    # Each backend runs in its own process so peak RSS is not shared
+    for backend in backends:
+        cmd = [sys.executable, os.path.abspath(__file__), '--backend', backend, '--rounds', str(args.rounds)]
+        if args.fixtures:
+            cmd += ['--fixtures', args.fixtures]
+        if args.synthetic:
+            cmd.append('--synthetic')
+        stats = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+        assert stats['peak_alloc_kb'] > 0, f'{backend}: tracemalloc saw no allocations while parsing'
+        print(f"{backend:<11} {stats['pages_per_sec']:9.1f} pages/s  peak {stats['peak_alloc_kb']:8.1f} KiB allocated "
+              f"while parsing  peak RSS {stats['peak_rss_kb'] / 1024:7.1f} MiB "
+              f"(+{stats['rss_growth_kb'] / 1024:.1f} MiB)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
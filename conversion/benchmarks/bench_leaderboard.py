@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+bench_leaderboard.py
+
+Compare what the frontend does per keystroke today (filter every record by
+name substring, then sort the whole cohort) with a leaderboard.Leaderboard
+query for one page of 50, on a synthetic data.json. Also reports the bytes
+a client downloads either way and the cost of an incremental update.
+
+Usage examples:
+  python conversion/benchmarks/bench_leaderboard.py --records 10000
+  python conversion/benchmarks/bench_leaderboard.py --records 100000 --queries 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import data_writer  # noqa: E402
+import leaderboard  # noqa: E402
+from bench_store import make_data  # noqa: E402
+from record_store import entry_url, profile_key  # noqa: E402
+
+# what a user types into the search box, one keystroke at a time
+TYPED = ['s', 'st', 'stu', 'stud', 'stude', 'student', 'student 1', 'student 12', 'student 123']
+
+
+def client_side(data, text):
+    """main/script.js updateData: substring filter and a full sort by total courses."""
+    rows = [r for r in data if r['User Name'] and text.lower() in r['User Name'].lower()]
+    rows.sort(key=lambda r: -(int(r['# of Skill Badges Completed'] or 0) + int(r['# of Arcade Games Completed'] or 0)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark client-side filtering vs leaderboard queries')
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=50, help='Rounds of typing TYPED')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_leaderboard_')
+    path = os.path.join(tmp, 'data.json')
+    make_data(path, args.records)
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    t0 = time.perf_counter()
+    board = leaderboard.Leaderboard('bench', path)
+    board.sync()
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.queries):
+        for text in TYPED:
+            client_side(data, text)
+    client = (time.perf_counter() - t0) / (args.queries * len(TYPED))
+
+    t0 = time.perf_counter()
+    for _ in range(args.queries):
+        for text in TYPED:
+            page = board.query('totalBadges', text, 1, 50)
+    server = (time.perf_counter() - t0) / (args.queries * len(TYPED))
+
+    # one refresh run changing 1% of the cohort, applied from the delta log
+    changed = {}
+    for rec in data[::100]:
+        rec['# of Skill Badges Completed'] = str(int(rec['# of Skill Badges Completed']) + 1)
+        changed[profile_key(entry_url(rec))] = rec
+    data_writer.save_data(path, data, changed, backups=0)
+    t0 = time.perf_counter()
+    board.sync()
+    update = time.perf_counter() - t0
+
+    whole = os.path.getsize(path)
+    one_page = len(json.dumps(page, ensure_ascii=False).encode('utf-8'))
+    print(f'{args.records} records; leaderboard built in {build:.2f}s')
+    print(f'per keystroke: client-side filter+sort {client * 1000:8.2f}ms   leaderboard query {server * 1000:8.2f}ms')
+    print(f'downloaded:    data.json {whole / 1024:10.0f} KiB   one page of 50 {one_page / 1024:8.1f} KiB')
+    print(f'incremental update of {len(changed)} records: {update * 1000:.1f}ms')
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    os.rmdir(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+bench_match.py
+
+Time the update phase of scrape_profiles.main (match each fetched URL to its
+record, then apply the badge list) on synthetic data.json cohorts, comparing
+the old linear scans with the profile_key index.
+
+Fetched URLs are given scheme/host/trailing-slash/query variations so both
+the exact and the fuzzy match paths are exercised.
+
+Usage examples:
+  python conversion/benchmarks/bench_match.py
+  python conversion/benchmarks/bench_match.py --sizes 1000 10000 50000 --legacy-max 10000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_simulator  # noqa: E402
+from record_store import RecordStore  # noqa: E402
+from scrape_profiles import apply_badges, build_profile_index, entry_url, profile_key  # noqa: E402
+
+BADGES = ['Badge %d [Skill Badge]' % i for i in range(5)]
+
+
+def fetched_urls(data):
+    """Fetched URLs as a crawler might report them, with cosmetic variations."""
+    urls = []
+    for i, entry in enumerate(data):
+        u = entry_url(entry)
+        if i % 4 == 1:
+            u = u + '/'
+        elif i % 4 == 2:
+            u = u + '?locale=en'
+        elif i % 4 == 3:
+            u = u.replace('https://www.', 'http://')
+        urls.append(u)
+    return urls
+
+
+def legacy_match(data, url):
+    for e in data:
+        if (e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')) == url:
+            return e
+    for e in data:
+        u = e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')
+        if u and url in u or (u and u in url):
+            return e
+    return None
+
+
+def update_phase(data, urls, match):
+    matched = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for url in urls:
+            rec = match(url)
+            if rec is not None:
+                matched += 1
+                apply_badges(rec, BADGES)
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark record matching in the scraper update phase')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000, 50000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='Skip the O(N^2) legacy scan above this cohort size')
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'legacy s':>10} {'matched':>8} {'index s':>9} {'build s':>8} {'matched':>8}")
+    for n in args.sizes:
+        base = profile_simulator.make_cohort(n, 'https://www.cloudskillsboost.google')
+        urls = fetched_urls(base)
+
+        legacy_s = legacy_matched = '-'
+        if n <= args.legacy_max:
+            data = RecordStore.from_dicts(base)
+            t0 = time.perf_counter()
+            legacy_matched = update_phase(data, urls, lambda u: legacy_match(data, u))
+            legacy_s = f'{time.perf_counter() - t0:.3f}'
+
+        data = RecordStore.from_dicts(base)
+        t0 = time.perf_counter()
+        index = build_profile_index(data)
+        build_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index_matched = update_phase(data, urls, lambda u: index.get(profile_key(u)))
+        index_s = time.perf_counter() - t0
+
+        print(f'{n:>8} {legacy_s:>10} {legacy_matched:>8} {index_s:>9.3f} {build_s:>8.3f} {index_matched:>8}')
+
+
+if __name__ == '__main__':
+    main()
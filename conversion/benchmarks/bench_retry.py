@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+bench_retry.py
+
+Wall-clock time of a crawl against a fault-injecting profile simulator
+(see profile_simulator.py --fault-rate), comparing the old retry path (a
+serial pass over the failures after the crawl, sleeping --delay between
+attempts) with scrape_profiles.run's in-crawl retry scheduler.
+
+Usage examples:
+  python conversion/benchmarks/bench_retry.py --profiles 300 --fault-rate 0.1
+  python conversion/benchmarks/bench_retry.py --profiles 300 --fault-rate 0.1 --max-concurrent 6
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_simulator  # noqa: E402
+import scrape_profiles  # noqa: E402
+
+
+def legacy_run(cohort, args):
+    """The crawl followed by the serial retry loop scrape_profiles.main used to run."""
+    started = time.monotonic()
+    failed = []
+    for entry, result, _err in scrape_profiles.crawl_threaded(cohort, args.concurrency, args.timeout, args.delay):
+        if result is not None and result.get('error'):
+            failed.append(scrape_profiles.entry_url(entry))
+    first_pass = len(failed)
+    for _attempt in range(args.retries):
+        remaining = []
+        for url in failed:
+            if scrape_profiles.fetch_profile(url, timeout=args.timeout).get('error'):
+                remaining.append(url)
+            time.sleep(args.delay)
+        failed = remaining
+    return {'elapsed': time.monotonic() - started, 'errors': first_pass, 'failed': len(failed)}
+
+
+def scheduler_run(path, args):
+    argv = ['--input', path, '--dry-run', '--no-cache', '--concurrency', str(args.concurrency),
+            '--delay', str(args.delay), '--timeout', str(args.timeout), '--retries', str(args.retries)]
+    return scrape_profiles.run(scrape_profiles.parse_args(argv), log=lambda line: None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark retry handling against a fault-injecting simulator')
+    parser.add_argument('--profiles', '-n', type=int, default=300)
+    parser.add_argument('--concurrency', '-c', type=int, default=10)
+    parser.add_argument('--delay', '-d', type=float, default=0.5)
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--retries', '-r', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--fault-rate', type=float, default=0.1)
+    parser.add_argument('--dead-rate', type=float, default=0.0)
+    parser.add_argument('--max-concurrent', type=int, default=0, help='Simulator answers 429 above this many in-flight requests')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    results = {}
+    for name in ('legacy', 'scheduler'):
+        # a fresh simulator per run so both see the same fault sequence
+        server, base_url = profile_simulator.start_server(
+            latency=args.latency, fault_rate=args.fault_rate, dead_rate=args.dead_rate, hang=args.timeout + 0.5,
+            max_concurrent=args.max_concurrent, seed=args.seed)
+        try:
+            cohort = profile_simulator.make_cohort(args.profiles, base_url)
+            if name == 'legacy':
+                stats = legacy_run(cohort, args)
+            else:
+                fd, path = tempfile.mkstemp(suffix='.json')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(cohort, f)
+                try:
+                    stats = scheduler_run(path, args)
+                finally:
+                    os.remove(path)
+            stats['requests'] = server.stats['requests']
+            stats['faults'] = server.stats['faults']
+        finally:
+            server.shutdown()
+        results[name] = stats
+        print(f"{name:<10} {stats['elapsed']:7.2f}s  first-pass errors {stats['errors']:>4}  "
+              f"still failed {stats['failed']:>4}  requests {stats['requests']:>5}  injected faults {stats['faults']:>4}")
+
+    saved = results['legacy']['elapsed'] - results['scheduler']['elapsed']
+    print(f"scheduler saved {saved:.2f}s ({saved / results['legacy']['elapsed']:.0%} of the legacy wall-clock time)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+bench_shards.py
+
+Run a sharded crawl as N local scrape_profiles.py --shard i/N processes
+against the profile simulator, merge them with merge_shards.py, and check
+the merged data.json is identical to what one unsharded process writes.
+Reports the wall-clock time of both.
+
+Usage examples:
+  python conversion/benchmarks/bench_shards.py --cohort 2000 --shards 4
+  python conversion/benchmarks/bench_shards.py --cohort 5000 --shards 8 --delay 1.0
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONVERSION_DIR)
+
+import profile_simulator  # noqa: E402
+
+
+def script(name):
+    return [sys.executable, os.path.join(CONVERSION_DIR, name)]
+
+
+def crawl_args(args, work, path, name):
+    return ['--input', path, '--output', path, '--concurrency', str(args.concurrency), '--delay', str(args.delay),
+            '--backups', '0', '--cache', os.path.join(work, f'{name}_cache.json'),
+            '--schedule', os.path.join(work, f'{name}_schedule.json')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark N local shard processes against one crawler')
+    parser.add_argument('--cohort', '-n', type=int, default=2000)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--concurrency', '-c', type=int, default=10, help='Per process')
+    parser.add_argument('--delay', '-d', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory')
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='bench_shards_')
+    server, base_url = profile_simulator.start_server(latency=args.latency)
+    try:
+        profile_simulator.write_export_csv(os.path.join(work, 'export.csv'), args.cohort, base_url)
+        single = os.path.join(work, 'single.json')
+        sharded = os.path.join(work, 'data.json')
+        subprocess.run(script('converter.py') + ['--input', os.path.join(work, 'export.csv'), '--output', single],
+                       check=True, stdout=subprocess.DEVNULL)
+        shutil.copy(single, sharded)
+
+        t0 = time.perf_counter()
+        subprocess.run(script('scrape_profiles.py') + crawl_args(args, work, single, 'single'),
+                       check=True, stdout=subprocess.DEVNULL)
+        single_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        procs = [subprocess.Popen(script('scrape_profiles.py') + crawl_args(args, work, sharded, f'shard{i}')
+                                  + ['--shard', f'{i}/{args.shards}'], stdout=subprocess.DEVNULL)
+                 for i in range(1, args.shards + 1)]
+        if any(p.wait() for p in procs):
+            sys.exit('a shard process failed')
+        crawl_seconds = time.perf_counter() - t0
+        subprocess.run(script('merge_shards.py') + ['--output', sharded, '--backups', '0'],
+                       check=True, stdout=subprocess.DEVNULL)
+        sharded_seconds = time.perf_counter() - t0
+    finally:
+        server.shutdown()
+
+    same = filecmp.cmp(single, sharded, shallow=False)
+    print(f'{args.cohort} profiles, concurrency {args.concurrency} per process, delay {args.delay}s')
+    print(f'single process   {single_seconds:7.2f}s')
+    print(f'{args.shards} shards + merge {sharded_seconds:7.2f}s  (crawl {crawl_seconds:.2f}s, '
+          f'merge {sharded_seconds - crawl_seconds:.2f}s, {single_seconds / sharded_seconds:.1f}x)')
+    print(f'merged data.json identical to the single-process output: {same}')
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
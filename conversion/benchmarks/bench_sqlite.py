@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+bench_sqlite.py
+
+Cost of saving one refresh run's changes: rewriting data.json (with a backup
+copy, as scrape_profiles.py does) versus one sqlite_store transaction with
+just the changed students. Uses a synthetic cohort in converter.py's layout.
+
+Usage examples:
+  python conversion/benchmarks/bench_sqlite.py --records 100000 --changed 50
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_store import make_data  # noqa: E402
+from record_store import RecordStore, entry_url, profile_key  # noqa: E402
+from sqlite_store import SqliteStore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark data.json rewrites vs SQLite upserts per run')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--changed', type=int, default=50, help='Students changed per run')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_sqlite_')
+    path = os.path.join(tmp, 'data.json')
+    make_data(path, args.records)
+    data = RecordStore.load(path)
+    store = SqliteStore(os.path.join(tmp, 'cohort.db'))
+    t0 = time.perf_counter()
+    store.write(enumerate(data), 'import', replace=True)
+    imported = time.perf_counter() - t0
+
+    json_times, db_times = [], []
+    step = max(1, len(data) // args.changed)
+    for run in range(args.runs):
+        changed = {}
+        for rec in data[run::step][:args.changed]:
+            rec.set_skill_badges(rec['Names of Completed Skill Badges'].split(' | ') + [f'Run {run} Badge'])
+            changed[profile_key(entry_url(rec))] = rec.to_dict()
+        t0 = time.perf_counter()
+        data.save(path, changed, backups=5)
+        json_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        store.write(((None, rec) for rec in changed.values()), 'scraper')
+        db_times.append(time.perf_counter() - t0)
+
+    print(f'{args.records} records; initial import into SQLite {imported:.2f}s')
+    print(f'per run with {args.changed} changed students: data.json rewrite + backup '
+          f'{sum(json_times) / len(json_times) * 1000:8.1f}ms   SQLite transaction '
+          f'{sum(db_times) / len(db_times) * 1000:8.1f}ms')
+    store.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
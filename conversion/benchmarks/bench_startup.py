@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+
+Time what a small scraper call costs before it does any work: import time
+of the CLI modules (python -X importtime), then the same one-profile calls
+run cold, as a new interpreter each time, and warm, as lines sent to one
+`scrape_profiles.py --worker`. Runs against the local profile simulator.
+
+Usage examples:
+  python conversion/benchmarks/bench_startup.py
+  python conversion/benchmarks/bench_startup.py --cohort 20000 --calls 20
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONVERSION_DIR)
+
+import profile_simulator  # noqa: E402
+
+MODULES = ('scrape_profiles', 'converter', 'leaderboard', 'merge_shards', 'page_archive')
+
+
+def import_ms(module):
+    """Cumulative import time of module in a fresh interpreter, from -X importtime (ms)."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=CONVERSION_DIR,
+                          capture_output=True, text=True, check=True)
+    for line in reversed(proc.stderr.splitlines()):
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f'no importtime line for {module}')
+
+
+def cold_ms(argv):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, 'scrape_profiles.py'] + argv, cwd=CONVERSION_DIR, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - t0) * 1000
+
+
+def warm_ms(worker, argv):
+    t0 = time.perf_counter()
+    worker.stdin.write(shlex.join(argv) + '\n')
+    worker.stdin.flush()
+    summary = json.loads(worker.stdout.readline())
+    if summary.get('error'):
+        raise RuntimeError(summary['error'])
+    return (time.perf_counter() - t0) * 1000
+
+
+def describe(times):
+    return f'median {statistics.median(times):7.1f}ms  min {min(times):7.1f}ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scraper cold start against a warm --worker')
+    parser.add_argument('--cohort', '-n', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=10, help='Calls of each kind to time')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency (s)')
+    args = parser.parse_args()
+
+    for module in MODULES:
+        print(f'import {module:<16} {statistics.median(import_ms(module) for _ in range(5)):6.1f}ms')
+
+    server, base_url = profile_simulator.start_server(latency=args.latency)
+    tmp = tempfile.mkdtemp(prefix='bench_startup_')
+    worker = None
+    try:
+        path = os.path.join(tmp, 'data.json')
+        cohort = profile_simulator.make_cohort(args.cohort, base_url)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cohort, f, indent=4)
+        common = ['--input', path, '--output', path, '--no-cache', '--dry-run']
+        calls = {
+            '--profile NAME': common + ['--profile', cohort[len(cohort) // 2]['User Name']],
+            '--max 1': common + ['--max', '1', '--delay', '0'],
+        }
+        print(f'Simulator at {base_url}, cohort of {args.cohort}, {args.calls} calls each')
+
+        worker = subprocess.Popen([sys.executable, 'scrape_profiles.py', '--worker'], cwd=CONVERSION_DIR, text=True,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # bring data.json up to date first, as after any refresh; a dry run that
+        # finds new badges changes the records and so drops the warm copy
+        warm_ms(worker, ['--input', path, '--output', path, '--no-cache', '--delay', '0', '--backups', '0',
+                         '--journal', os.path.join(tmp, 'journal.jsonl')])
+        for name, argv in calls.items():
+            cold = [cold_ms(argv) for _ in range(args.calls)]
+            first = warm_ms(worker, argv)
+            warm = [warm_ms(worker, argv) for _ in range(args.calls)]
+            print(f'{name:<15} cold  {describe(cold)}')
+            print(f'{"":<15} warm  {describe(warm)}  (first call {first:.1f}ms)  '
+                  f'{statistics.median(cold) / statistics.median(warm):.0f}x')
+    finally:
+        if worker is not None:
+            worker.stdin.close()
+            worker.wait()
+        server.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+bench_store.py
+
+Compare the memory held by a loaded cohort as a plain list of dicts
+(json.load) and as a record_store.RecordStore, on a synthetic data.json in
+converter.py's layout. Each model loads in its own process; reports load
+time, tracemalloc'd bytes per record and peak RSS, and checks that the store
+writes back exactly the input file.
+
+Usage examples:
+  python conversion/benchmarks/bench_store.py --records 100000
+  python conversion/benchmarks/bench_store.py --records 500000 --keep
+"""
+import argparse
+import filecmp
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONVERSION_DIR)
+
+
+def make_data(path, records, seed=1):
+    import data_writer
+    import profile_simulator
+    titles = [t + ' [Skill Badge]' for t in profile_simulator.BADGE_TITLES]
+    rng = random.Random(seed)
+
+    def rows():
+        for i in range(records):
+            n = rng.randint(0, len(titles))
+            arcade = rng.randint(0, 2)
+            done = 'Yes' if n >= 19 and arcade else 'No'
+            yield {
+                'User Name': f'Student {i}',
+                'Google Cloud Skills Boost Profile URL':
+                    f'https://www.cloudskillsboost.google/public_profiles/{i:08x}-0000-4000-8000-000000000000',
+                'Campaign Code Redemption Status': 'Yes',
+                'Gen AI Arcade Game Completion': '1' if arcade else '0',
+                'Prompt Design in Vertex AI Completion': rng.choice('01'),
+                'Develop GenAI Apps with Gemini and Streamlit Completion': rng.choice('01'),
+                '# of Courses Completed': n + arcade,
+                'All 3 Pathways Completed - Yes or No': done,
+                'Access Code Redemption Status': 'Yes',
+                'All Skill Badges & Games Completed': done,
+                '# of Skill Badges Completed': str(n),
+                'Names of Completed Skill Badges': ' | '.join(rng.sample(titles, n)),
+                '# of Arcade Games Completed': str(arcade),
+                'Names of Completed Arcade Games': ' | '.join(['Arcade Game'] * arcade),
+            }
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        data_writer.write_json_array(f, rows())
+
+
+def _load(path, how):
+    if how == 'dicts':
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    import record_store
+    # start from an empty badge table so each load pays for its own lists
+    record_store.BADGES = record_store.BadgeTable()
+    return record_store.RecordStore.load(path)
+
+
+def load(path, how, out):
+    # time an untraced load, then measure what a second one holds
+    t0 = time.perf_counter()
+    _load(path, how)
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    data = _load(path, how)
+    held, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if out and how == 'store':
+        data.save(out)
+    return {'records': len(data), 'seconds': seconds, 'held_bytes': held,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark list-of-dicts vs RecordStore memory use')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated JSON files')
+    parser.add_argument('--run', nargs=3, metavar=('HOW', 'IN', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        how, path_in, path_out = args.run
+        print(json.dumps(load(path_in, how, path_out if path_out != '-' else None)))
+        return
+
+    tmp = tempfile.mkdtemp(prefix='bench_store_')
+    src = os.path.join(tmp, 'data.json')
+    out = os.path.join(tmp, 'roundtrip.json')
+    make_data(src, args.records)
+    print(f'{args.records} records, {os.path.getsize(src) / 2**20:.1f} MiB data.json in {tmp}')
+
+    for how in ('dicts', 'store'):
+        stats = json.loads(subprocess.run([sys.executable, os.path.abspath(__file__), '--run', how, src,
+                                           out if how == 'store' else '-'],
+                                          capture_output=True, text=True, check=True).stdout)
+        print(f"{how:<6} load {stats['seconds']:7.2f}s  {stats['held_bytes'] / stats['records']:8.0f} B/record  "
+              f"held {stats['held_bytes'] / 2**20:8.1f} MiB  peak RSS {stats['peak_rss_kb'] / 1024:8.1f} MiB")
+
+    same = filecmp.cmp(src, out, shallow=False)
+    print(f'store round trip identical: {same}')
+    if not args.keep:
+        for path in (src, out):
+            os.remove(path)
+        os.rmdir(tmp)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
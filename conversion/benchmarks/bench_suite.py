@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+bench_suite.py
+
+End-to-end benchmark of the whole refresh path against the local profile
+simulator, with no requests to cloudskillsboost.google:
+
+  convert   converter.py turns a generated campaign CSV export into data.json
+  scrape    scrape_profiles.py crawls every profile and updates data.json
+  refresh   refresh_server.py runs a refresh job over HTTP; then its API
+            (/health, /jobs, /data/delta, /metrics) is timed
+
+Every stage runs in its own process, so peak RSS is per stage. Reports
+throughput, p50/p99 latency (profile fetches, API requests) and peak RSS,
+saves the results as JSON under benchmarks/results/<scenario>/ and compares
+them with the previous run of the same scenario (same parameters and
+stages), flagging regressions beyond --threshold.
+
+Usage examples:
+  python conversion/benchmarks/bench_suite.py
+  python conversion/benchmarks/bench_suite.py --cohort 10000 --latency 0.1 --jitter 0.2 --page-kb 300
+  python conversion/benchmarks/bench_suite.py --cohort 100000 --stages convert scrape --mode pipeline
+  python conversion/benchmarks/bench_suite.py --fault-rate 0.05 --fail-on-regression
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+CONVERSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+sys.path.insert(0, CONVERSION_DIR)
+
+try:
+    import requests
+except Exception:
+    print("Missing dependencies. Install with: pip install -r conversion/requirements.txt", file=sys.stderr)
+    raise
+
+STAGES = ('convert', 'scrape', 'refresh')
+API_ENDPOINTS = ('/health', '/jobs', '/data/delta?since=0', '/metrics')
+
+# metric name suffix -> True if higher is better
+DIRECTIONS = (('_per_s', True), ('_ms', False), ('_mb', False), ('seconds', False))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, proc, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{proc.args[1]} exited with {proc.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'nothing listening on port {port} after {timeout}s')
+
+
+def spawn(script, args, log_path):
+    log = open(log_path, 'w')
+    return subprocess.Popen([sys.executable, os.path.join(CONVERSION_DIR, script)] + [str(a) for a in args],
+                            stdout=log, stderr=subprocess.STDOUT, cwd=CONVERSION_DIR)
+
+
+def reap(proc, terminate=False):
+    """Wait for a child (terminating it first if asked). Returns its peak RSS in MiB."""
+    if terminate:
+        proc.terminate()
+    # wait4 rather than proc.wait() to get this child's own resource usage
+    _pid, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.stdout:
+        proc.stdout.close()
+    return usage.ru_maxrss / 1024
+
+
+def run_stage(script, args, log_path):
+    t0 = time.perf_counter()
+    proc = spawn(script, args, log_path)
+    rss = reap(proc)
+    seconds = time.perf_counter() - t0
+    if proc.returncode != 0:
+        with open(log_path, encoding='utf-8', errors='replace') as f:
+            tail = f.read()[-2000:]
+        raise RuntimeError(f'{script} failed with exit code {proc.returncode}:\n{tail}')
+    return seconds, rss
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def fetch_latency(report):
+    total = report.get('fetch', {}).get('total', {})
+    return {'fetch_p50_ms': round(total.get('p50', 0) * 1000, 2), 'fetch_p99_ms': round(total.get('p99', 0) * 1000, 2)}
+
+
+def bench_convert(args, work):
+    csv_path = os.path.join(work, 'export.csv')
+    data_path = os.path.join(work, 'data.json')
+    seconds, rss = run_stage('converter.py', ['--input', csv_path, '--output', data_path],
+                             os.path.join(work, 'convert.log'))
+    return {'rows': args.cohort, 'seconds': round(seconds, 3), 'rows_per_s': round(args.cohort / seconds, 1),
+            'peak_rss_mb': round(rss, 1)}
+
+
+def scraper_args(args, work, name):
+    return ['--concurrency', args.concurrency, '--delay', args.delay, '--mode', args.mode, '--backups', 0,
+            '--timeout', args.timeout, '--cache', os.path.join(work, f'{name}_cache.json'),
+            '--schedule', os.path.join(work, f'{name}_schedule.json')]
+
+
+def bench_scrape(args, work):
+    data_path = os.path.join(work, 'data.json')
+    report_path = os.path.join(work, 'scrape_report.json')
+    seconds, rss = run_stage('scrape_profiles.py', ['--input', data_path, '--output', data_path,
+                                                    '--report', report_path] + scraper_args(args, work, 'scrape'),
+                             os.path.join(work, 'scrape.log'))
+    with open(report_path, encoding='utf-8') as f:
+        report = json.load(f)
+    summary = report['summary']
+    result = {'profiles': summary['fetched'], 'seconds': round(seconds, 3),
+              'crawl_seconds': round(summary['elapsed'], 3),
+              'profiles_per_s': round(summary['fetched'] / summary['elapsed'], 1) if summary['elapsed'] else 0.0,
+              'updated': summary['updated'], 'errors': summary['errors'], 'failed': summary['failed'],
+              'bottleneck': report['bottleneck'], 'peak_rss_mb': round(rss, 1)}
+    result.update(fetch_latency(report))
+    return result
+
+
+def bench_refresh(args, work):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    # a fresh schedule makes every profile due; the scrape stage's warm cache is
+    # reused, so this measures a typical repeat refresh (mostly 304s)
+    if os.path.exists(os.path.join(work, 'scrape_cache.json')):
+        shutil.copy(os.path.join(work, 'scrape_cache.json'), os.path.join(work, 'refresh_cache.json'))
+    proc = spawn('refresh_server.py', ['--port', port, '--data', os.path.join(work, 'data.json')]
+                 + scraper_args(args, work, 'refresh'), os.path.join(work, 'refresh.log'))
+    try:
+        wait_for_port(port, proc)
+        session = requests.Session()
+        t0 = time.perf_counter()
+        job = session.post(f'{base}/refresh').json()
+        while True:
+            status = session.get(f"{base}/jobs/{job['job_id']}").json()
+            if status['status'] in ('succeeded', 'failed'):
+                break
+            time.sleep(0.05)
+        job_seconds = time.perf_counter() - t0
+        if status['status'] != 'succeeded':
+            raise RuntimeError(f"refresh job failed: {status.get('error')}")
+        report = session.get(f"{base}/jobs/{job['job_id']}/report").json()
+
+        api = {}
+        for endpoint in API_ENDPOINTS:
+            times = []
+            for _ in range(args.api_requests):
+                t = time.perf_counter()
+                session.get(base + endpoint).raise_for_status()
+                times.append((time.perf_counter() - t) * 1000)
+            api[endpoint] = {'p50_ms': round(percentile(times, 0.5), 2), 'p99_ms': round(percentile(times, 0.99), 2)}
+    finally:
+        rss = reap(proc, terminate=True)
+
+    summary = status['summary']
+    result = {'profiles': summary['fetched'], 'job_seconds': round(job_seconds, 3),
+              'profiles_per_s': round(summary['fetched'] / job_seconds, 1), 'updated': summary['updated'],
+              'errors': summary['errors'], 'requests': report.get('requests', {}), 'api': api,
+              'peak_rss_mb': round(rss, 1)}
+    result.update(fetch_latency(report))
+    return result
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=CONVERSION_DIR, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=CONVERSION_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def scenario_name(args):
+    stages = '+'.join(stage for stage in STAGES if stage in args.stages)
+    return (f'n{args.cohort}_lat{args.latency * 1000:g}ms_jit{args.jitter * 1000:g}ms_kb{args.page_kb:g}'
+            f'_err{args.fault_rate:g}_{args.mode}_c{args.concurrency}_{stages}')
+
+
+def flatten(d, prefix=''):
+    out = {}
+    for k, v in d.items():
+        key = f'{prefix}{k}'
+        if isinstance(v, dict):
+            out.update(flatten(v, key + '.'))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(previous, current, threshold):
+    """Print metric changes against a previous result. Returns the regressed metric names."""
+    old, new = flatten(previous['stages']), flatten(current['stages'])
+    regressions = []
+    print(f"\nCompared with {previous['git']} ({previous['time']}):")
+    for key in sorted(new):
+        higher_better = next((hb for suffix, hb in DIRECTIONS if key.endswith(suffix)), None)
+        if higher_better is None or key not in old or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        worse = -change if higher_better else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        elif worse < -threshold:
+            flag = '  improved'
+        print(f'  {key:<42} {old[key]:>12g} -> {new[key]:>12g}  {change:+7.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark against the local profile simulator')
+    parser.add_argument('--cohort', '-n', type=int, default=1000, help='Students in the generated export (1k-100k)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated server latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Extra random latency, up to this much (s)')
+    parser.add_argument('--page-kb', type=float, default=100, help='Profile page size (KiB)')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='Transient failure probability per request')
+    parser.add_argument('--mode', choices=['threads', 'async', 'pipeline'], default='threads')
+    parser.add_argument('--concurrency', '-c', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--timeout', type=int, default=15)
+    parser.add_argument('--api-requests', type=int, default=200, help='Requests per endpoint when timing the API')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--results', default=RESULTS_DIR, help='Where results are saved (default: benchmarks/results)')
+    parser.add_argument('--no-save', action='store_true', help="Don't save this run's results")
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on any regression')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory (data, logs, reports)')
+    args = parser.parse_args()
+
+    import profile_simulator
+
+    work = tempfile.mkdtemp(prefix='bench_suite_')
+    sim_port = free_port()
+    sim = spawn('profile_simulator.py', ['--port', sim_port, '--latency', args.latency, '--jitter', args.jitter,
+                                         '--page-kb', args.page_kb, '--fault-rate', args.fault_rate,
+                                         '--seed', args.seed], os.path.join(work, 'simulator.log'))
+    result = {'schema': 1, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'git': git_revision(),
+              'python': platform.python_version(), 'scenario': scenario_name(args),
+              'params': {k: v for k, v in vars(args).items() if k not in ('results', 'no_save', 'keep')},
+              'stages': {}}
+    print(f"Scenario {result['scenario']} at {result['git']}, work dir {work}")
+    try:
+        wait_for_port(sim_port, sim)
+        profile_simulator.write_export_csv(os.path.join(work, 'export.csv'), args.cohort,
+                                           f'http://127.0.0.1:{sim_port}', args.seed)
+        stages = {'convert': bench_convert, 'scrape': bench_scrape, 'refresh': bench_refresh}
+        for name in STAGES:
+            if name not in args.stages:
+                continue
+            if name != 'convert' and not os.path.exists(os.path.join(work, 'data.json')):
+                bench_convert(args, work)  # later stages need data.json
+            stats = stages[name](args, work)
+            result['stages'][name] = stats
+            print(f'{name:<8} ' + '  '.join(f'{k}={v}' for k, v in stats.items() if not isinstance(v, dict)))
+            for endpoint, lat in stats.get('api', {}).items():
+                print(f"           {endpoint:<22} p50 {lat['p50_ms']:7.2f}ms  p99 {lat['p99_ms']:7.2f}ms")
+    finally:
+        reap(sim, terminate=True)
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    scenario_dir = os.path.join(args.results, result['scenario'])
+    previous = sorted(glob.glob(os.path.join(scenario_dir, '*.json')))
+    regressions = []
+    if previous:
+        with open(previous[-1], encoding='utf-8') as f:
+            regressions = compare(json.load(f), result, args.threshold)
+    if not args.no_save:
+        os.makedirs(scenario_dir, exist_ok=True)
+        path = os.path.join(scenario_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{result['git']}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f'\nSaved results to {os.path.relpath(path)}')
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
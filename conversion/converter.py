@@ -5,12 +5,16 @@ import argparse
 import os
 import sys
 
-def csv_to_json(csv_file, json_file):
+import data_writer
+from pathways import DEFAULT_CLASSIFIER, PathwayClassifier, load_pathways
+
+def csv_to_json(csv_file, json_file, classifier=DEFAULT_CLASSIFIER):
     """Read data from CSV and convert it to a list of dictionaries, then write to JSON.
 
     This utility keeps values as strings so the frontend can interpret them
     the same way the author expected. It creates the output directory if
     necessary and writes UTF-8 JSON with indentation for readability.
+    Pathway completion flags come from `classifier` (see pathways.py).
     """
     raw_rows = []
     with open(csv_file, 'r', newline='', encoding='utf-8') as csvfile:
@@ -24,15 +28,6 @@ def csv_to_json(csv_file, json_file):
         except Exception:
             return 0
 
-    def contains_keyword(haystack, keywords):
-        if not haystack:
-            return False
-        s = haystack.lower()
-        for k in keywords:
-            if k.lower() in s:
-                return True
-        return False
-
     mapped = []
     for r in raw_rows:
         # Try multiple possible header names for each expected frontend field
@@ -44,19 +39,11 @@ def csv_to_json(csv_file, json_file):
 
         # Arcade games
         arcade_count = int_or_zero(r.get('# of Arcade Games Completed') or r.get('Arcade Games Completed') or r.get('Number of Arcade Games') or r.get('Names of Completed Arcade Games', '').count('|'))
-        gen_ai_arcade = '1' if arcade_count > 0 else '0'
 
         # Skill badges
         badges_count = int_or_zero(r.get('# of Skill Badges Completed') or r.get('Number of Skill Badges') or r.get('# of Skill Badges Completed') or r.get('# of Skill Badges Completed', 0))
         badges_names = r.get('Names of Completed Skill Badges') or r.get('Names of Completed Badges') or r.get('Names of Completed Arcade Games') or ''
 
-        # Heuristic detection for specific pathway completions
-        prompt_keywords = ['prompt', 'vertex']
-        develop_keywords = ['gemini', 'streamlit', 'genai', 'gen ai', 'gen-ai']
-
-        prompt_completion = '1' if contains_keyword(badges_names, prompt_keywords) else '0'
-        develop_completion = '1' if contains_keyword(badges_names, develop_keywords) else '0'
-
         total_completed = badges_count + arcade_count
 
         all_three = r.get('All Skill Badges & Games Completed') or r.get('All 3 Pathways Completed - Yes or No') or r.get('All 3 Pathways Completed') or ''
@@ -81,12 +68,11 @@ def csv_to_json(csv_file, json_file):
             'User Name': name,
             'Google Cloud Skills Boost Profile URL': profile,
             'Campaign Code Redemption Status': redemption,
-            'Gen AI Arcade Game Completion': gen_ai_arcade,
-            'Prompt Design in Vertex AI Completion': prompt_completion,
-            'Develop GenAI Apps with Gemini and Streamlit Completion': develop_completion,
-            '# of Courses Completed': total_completed,
-            'All 3 Pathways Completed - Yes or No': all_three
         }
+        # Pathway completion flags (arcade, prompt, develop, ...) from pathways.py
+        mapped_row.update(classifier.completion_flags(badges_names, arcade_count))
+        mapped_row['# of Courses Completed'] = total_completed
+        mapped_row['All 3 Pathways Completed - Yes or No'] = all_three
 
         # Merge preserved columns so result contains both mapped fields and originals
         mapped_row.update(preserved)
@@ -100,17 +86,170 @@ def csv_to_json(csv_file, json_file):
 
     print(f"Wrote {len(mapped)} records to {json_file}")
 
+# Header aliases per output field, in the same precedence order csv_to_json
+# tries them (first non-empty value wins)
+NAME_ALIASES = ('User Name', 'Name', 'Full Name')
+PROFILE_ALIASES = ('Google Cloud Skills Boost Profile URL', 'Profile URL', 'Google Cloud Profile')
+REDEMPTION_ALIASES = ('Access Code Redemption Status', 'Campaign Code Redemption Status', 'Access Code Redemption')
+ARCADE_COUNT_ALIASES = ('# of Arcade Games Completed', 'Arcade Games Completed', 'Number of Arcade Games')
+BADGE_COUNT_ALIASES = ('# of Skill Badges Completed', 'Number of Skill Badges')
+BADGE_NAMES_ALIASES = ('Names of Completed Skill Badges', 'Names of Completed Badges', 'Names of Completed Arcade Games')
+ALL_THREE_ALIASES = ('All Skill Badges & Games Completed', 'All 3 Pathways Completed - Yes or No', 'All 3 Pathways Completed')
+PRESERVED_REDEMPTION_ALIASES = ('Access Code Redemption Status', 'Access Code Redemption')
+PRESERVED_ALL_SKILL_ALIASES = ('All Skill Badges & Games Completed', 'All 3 Pathways Completed - Yes or No')
+PRESERVED_BADGE_NAMES_ALIASES = ('Names of Completed Skill Badges', 'Names of Completed Badges')
+
+
+class ColumnPlan:
+    """Header aliases resolved once to column indices for one CSV header.
+
+    Each field holds the indices of the aliases that exist in this header, so
+    a row lookup is a couple of list indexings instead of a chain of dict
+    lookups. A repeated header name resolves to its last column, as with
+    csv.DictReader.
+    """
+
+    def __init__(self, header):
+        pos = {name: i for i, name in enumerate(header)}
+
+        def resolve(aliases):
+            return tuple(pos[a] for a in aliases if a in pos)
+
+        self.width = len(header)
+        self.name = resolve(NAME_ALIASES)
+        self.profile = resolve(PROFILE_ALIASES)
+        self.redemption = resolve(REDEMPTION_ALIASES)
+        self.arcade_count = resolve(ARCADE_COUNT_ALIASES)
+        self.arcade_names = pos.get('Names of Completed Arcade Games')
+        self.badge_count = resolve(BADGE_COUNT_ALIASES)
+        self.badge_names = resolve(BADGE_NAMES_ALIASES)
+        self.all_three = resolve(ALL_THREE_ALIASES)
+        self.p_redemption = resolve(PRESERVED_REDEMPTION_ALIASES)
+        self.p_all_skill = resolve(PRESERVED_ALL_SKILL_ALIASES)
+        self.p_badge_count = pos.get('# of Skill Badges Completed')
+        self.p_badge_names = resolve(PRESERVED_BADGE_NAMES_ALIASES)
+        self.p_arcade_count = pos.get('# of Arcade Games Completed')
+
+
+def _first(row, idxs):
+    for i in idxs:
+        if i < len(row) and row[i]:
+            return row[i]
+    return None
+
+
+def _raw(row, i):
+    """DictReader-style value: None for a column missing from the header or a short row."""
+    if i is None or i >= len(row):
+        return None
+    return row[i]
+
+
+def _int_or_zero(val):
+    try:
+        return int(val)
+    except Exception:
+        return 0
+
+
+def map_row(row, plan, classifier=DEFAULT_CLASSIFIER):
+    """Map one CSV row (list of values) to a data.json record, exactly as csv_to_json does."""
+    arcade_names = _raw(row, plan.arcade_names)
+    arcade_count = _int_or_zero(_first(row, plan.arcade_count) or (arcade_names or '').count('|'))
+    badges_count = _int_or_zero(_first(row, plan.badge_count) or 0)
+    badges_names = _first(row, plan.badge_names) or ''
+    all_three = _first(row, plan.all_three) or ''
+    all_three = 'Yes' if all_three.strip().lower() in ('yes', 'y', 'true', '1') else 'No'
+
+    skill_raw = _raw(row, plan.p_badge_count)
+    arcade_raw = _raw(row, plan.p_arcade_count)
+    rec = {
+        'User Name': _first(row, plan.name) or '',
+        'Google Cloud Skills Boost Profile URL': _first(row, plan.profile) or '',
+        'Campaign Code Redemption Status': _first(row, plan.redemption) or '',
+    }
+    rec.update(classifier.completion_flags(badges_names, arcade_count))
+    rec.update({
+        '# of Courses Completed': badges_count + arcade_count,
+        'All 3 Pathways Completed - Yes or No': all_three,
+        'Access Code Redemption Status': _first(row, plan.p_redemption) or '',
+        'All Skill Badges & Games Completed': _first(row, plan.p_all_skill) or '',
+        '# of Skill Badges Completed': skill_raw if skill_raw or plan.p_badge_count is not None else '',
+        'Names of Completed Skill Badges': _first(row, plan.p_badge_names) or '',
+        '# of Arcade Games Completed': arcade_raw if arcade_raw or plan.p_arcade_count is not None else '',
+        'Names of Completed Arcade Games': arcade_names if arcade_names or plan.arcade_names is not None else '',
+    })
+    return rec
+
+
+def iter_records(csv_file, classifier=DEFAULT_CLASSIFIER):
+    """Yield data.json records one CSV row at a time."""
+    with open(csv_file, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        plan = ColumnPlan(header)
+        for row in reader:
+            if not row:
+                continue  # DictReader skips blank lines too
+            yield map_row(row, plan, classifier)
+
+
+def csv_to_json_stream(csv_file, json_file, ndjson=False, classifier=DEFAULT_CLASSIFIER):
+    """Streaming variant of csv_to_json with memory use independent of input size.
+
+    Header aliases are resolved once per file (ColumnPlan) and each record is
+    written as soon as its row is read. The JSON array output is byte-for-byte
+    what csv_to_json writes; ndjson=True writes one compact record per line.
+    """
+    with data_writer.open_atomic(json_file) as out:
+        if ndjson:
+            count = 0
+            for rec in iter_records(csv_file, classifier):
+                out.write(json.dumps(rec, ensure_ascii=False))
+                out.write('\n')
+                count += 1
+        else:
+            count = data_writer.write_json_array(out, iter_records(csv_file, classifier))
+
+    print(f"Wrote {count} records to {json_file}")
+
+
+def csv_to_db(csv_file, db_path, classifier=DEFAULT_CLASSIFIER):
+    """Convert into a SQLite store (see sqlite_store.py) instead of data.json.
+
+    The store's cohort is replaced in one transaction; students who already
+    had records get badge events for anything new. Export data.json with
+    `sqlite_store.py export`.
+    """
+    from sqlite_store import SqliteStore
+    with SqliteStore(db_path) as store:
+        _run, count, events = store.write(enumerate(iter_records(csv_file, classifier)), 'converter', replace=True)
+    print(f"Wrote {count} records to {db_path} ({events} new badges)")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Convert a CSV of student records to main/data.json')
     parser.add_argument('-i', '--input', default=os.path.join('conversion', 'input.csv'), help='Path to input CSV (default: conversion/input.csv)')
     parser.add_argument('-o', '--output', default=os.path.join('main', 'data.json'), help='Path to output JSON (default: main/data.json)')
+    parser.add_argument('--stream', action='store_true', help='Convert row by row with constant memory (for very large exports)')
+    parser.add_argument('--ndjson', action='store_true', help='Write one JSON record per line instead of an array (implies --stream)')
+    parser.add_argument('--pathways', help='JSON file of pathway rules to use instead of the built-in ones (see pathways.py)')
+    parser.add_argument('--db', help='Write to this SQLite store instead of --output (see sqlite_store.py)')
     args = parser.parse_args()
 
     if not os.path.exists(args.input):
         print(f"Error: input file '{args.input}' not found.", file=sys.stderr)
         sys.exit(2)
 
-    csv_to_json(args.input, args.output)
+    classifier = PathwayClassifier(load_pathways(args.pathways)) if args.pathways else DEFAULT_CLASSIFIER
+    if args.db:
+        csv_to_db(args.input, args.db, classifier)
+    elif args.stream or args.ndjson:
+        csv_to_json_stream(args.input, args.output, ndjson=args.ndjson, classifier=classifier)
+    else:
+        csv_to_json(args.input, args.output, classifier)
 
 if __name__ == '__main__':
     main()
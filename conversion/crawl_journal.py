@@ -0,0 +1,103 @@
+"""
+crawl_journal.py
+
+Append-only progress journal for scrape_profiles.py, so a crawl that gets
+killed (Ctrl-C, a crash, the refresh server restarting) or stopped by
+--time-limit keeps every profile it already fetched.
+
+Each profile's final result is appended as one JSON line as soon as it
+arrives:
+
+  {"key": <profile id>, "url": ..., "time": <fetch time>, "badges": [...], "error": null, "kind": null}
+
+Lines are flushed straight away, so they survive the process dying, and
+fsynced at most once a second, so a power cut loses at most the last second.
+--resume replays the journal, applies the finished profiles without fetching
+them again and crawls only the rest; a torn last line left by a crash is
+skipped. When a run has covered every profile, data.json is written from the
+store (the journal compacted into it) and the journal is deleted.
+"""
+import json
+import os
+import threading
+import time
+
+
+def journal_path(path):
+    """The journal kept next to an output file: data.json -> data.journal.jsonl."""
+    root, _ext = os.path.splitext(path)
+    return f'{root}.journal.jsonl'
+
+
+class CrawlJournal:
+    def __init__(self, path, sync_interval=1.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.written = 0
+        self._f = None
+        self._synced = 0.0
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def replay(self):
+        """{profile key: latest entry} from the journal on disk, or {} if there is none."""
+        entries = {}
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return entries
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if isinstance(entry, dict) and entry.get('key'):
+                    entries[entry['key']] = entry
+        return entries
+
+    def open(self, resume=False):
+        """Start appending; without resume any existing journal is discarded."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        torn = False
+        if resume and self.exists():
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b'\n'
+        self._f = open(self.path, 'a' if resume else 'w', encoding='utf-8', newline='\n')
+        if torn:
+            # finish the torn line so the next entry starts on its own
+            self._f.write('\n')
+        return self
+
+    def record(self, key, url, badges, error=None, kind=None, fetched_at=None):
+        line = json.dumps({'key': key, 'url': url, 'time': fetched_at or time.time(), 'badges': list(badges or []),
+                           'error': error, 'kind': kind}, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            now = time.monotonic()
+            if now - self._synced >= self.sync_interval:
+                os.fsync(self._f.fileno())
+                self._synced = now
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._f.close()
+                self._f = None
+
+    def remove(self):
+        """Close and delete the journal once its results are in the output."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,286 @@
+"""
+crawl_metrics.py
+
+Structured timings and counters for scrape_profiles.py runs, reported as a
+JSON run report (scrape_profiles.py --report) and in Prometheus text format
+(GET /metrics on refresh_server.py).
+
+Recorded per run:
+
+  fetch phase seconds   dns, connect, ttfb (request sent -> response headers),
+                        download (body) and total, per request; dns/connect
+                        only when a new connection was opened. The async
+                        engine times dns apart from connect (TCP + TLS); the
+                        requests-based ones time connect as DNS + TCP + TLS
+  parse seconds         per extraction strategy: the lxml/selectolax fast
+                        path, bs4 when chosen with --parser, or bs4-fallback
+                        when the fast path could not read the page
+  wait seconds          time spent not working: queue (a fetched page or
+                        submitted task waiting for a worker), delay (--delay
+                        sleeps), rate (async token bucket), breaker (per-host
+                        concurrency limit / open circuit) and backoff (retry
+                        delays)
+  update seconds        applying one result to the cohort
+  bytes                 response bytes read off the wire
+  requests              by outcome: ok, not_modified, unchanged (same body
+                        hash as last time) or the retry_policy error kind
+
+The report sums worker time per category (network, parse, waiting on rate
+limits) and names the largest as the bottleneck, which is what decides
+whether to raise --concurrency, add --parse-workers, or back off --rate.
+
+observe()/inc() record into ACTIVE, the current run; finish_run() folds a
+run into TOTAL, the process lifetime totals that /metrics exports.
+
+Histograms keep Prometheus buckets for /metrics, but the p50/p90/p99 in the
+report come from a reservoir of up to SAMPLES raw observations: exact for
+runs that fit, a uniform sample of the run beyond that.
+"""
+import random
+import threading
+import time
+
+# seconds; Prometheus-style cumulative buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# raw observations kept per histogram for quantiles
+SAMPLES = 4096
+
+FETCH_PHASES = ('dns', 'connect', 'ttfb', 'download', 'total')
+RATE_LIMIT_WAITS = ('delay', 'rate', 'breaker', 'backoff')
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS, samples=SAMPLES):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = []  # reservoir (algorithm R) of at most `size` observations
+        self.size = samples
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            j = random.randrange(self.count)
+            if j < self.size:
+                self.samples[j] = value
+
+    def merge(self, other):
+        if len(self.samples) + len(other.samples) <= self.size:
+            self.samples = self.samples + other.samples
+        else:
+            # draw from each reservoir in proportion to the observations it stands for
+            mine = random.sample(self.samples, len(self.samples))
+            theirs = random.sample(other.samples, len(other.samples))
+            merged = []
+            weight = self.count / (self.count + other.count)
+            while len(merged) < self.size and (mine or theirs):
+                source = mine if mine and (not theirs or random.random() < weight) else theirs
+                merged.append(source.pop())
+            self.samples = merged
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantiles(self, *qs):
+        """The q-quantiles of the kept observations, interpolating between neighbouring ones."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [0.0 for _ in qs]
+        out = []
+        for q in qs:
+            pos = q * (len(ordered) - 1)
+            i = int(pos)
+            upper = ordered[min(i + 1, len(ordered) - 1)]
+            out.append(ordered[i] + (upper - ordered[i]) * (pos - i))
+        return out
+
+    def quantile(self, q):
+        return self.quantiles(q)[0]
+
+    def to_dict(self):
+        p50, p90, p99 = self.quantiles(0.5, 0.9, 0.99)
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(p50, 6),
+            'p90': round(p90, 6),
+            'p99': round(p99, 6),
+            'max': round(self.max, 6),
+        }
+
+
+class CrawlMetrics:
+    """Histograms and counters keyed by (metric, label), safe to update from any thread."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def observe(self, name, label, seconds):
+        with self._lock:
+            hist = self.histograms.get((name, label))
+            if hist is None:
+                hist = self.histograms[(name, label)] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, name, label='', amount=1):
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + amount
+
+    def merge(self, other):
+        with self._lock, other._lock:
+            for key, hist in other.histograms.items():
+                self.histograms.setdefault(key, Histogram()).merge(hist)
+            for key, value in other.counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.runs += other.runs
+
+    def _group(self, name):
+        return {label: hist.to_dict() for (n, label), hist in sorted(self.histograms.items()) if n == name}
+
+    def _total(self, name, labels=None):
+        return sum(h.sum for (n, label), h in self.histograms.items()
+                   if n == name and (labels is None or label in labels))
+
+    def report(self, **extra):
+        """The JSON run report."""
+        with self._lock:
+            fetch = self._group('fetch')
+            time_split = {
+                'network': self._total('fetch', ('total',)),
+                'parse': self._total('parse'),
+                'rate_limited': self._total('wait', RATE_LIMIT_WAITS),
+                'queued': self._total('wait', ('queue',)),
+                'update': self._total('update'),
+            }
+            report = {
+                'started': self.started,
+                'fetch': {phase: fetch[phase] for phase in FETCH_PHASES if phase in fetch},
+                'parse': self._group('parse'),
+                'wait': self._group('wait'),
+                'update': self._group('update').get('', Histogram().to_dict()),
+                'bytes': self.counters.get(('bytes', ''), 0),
+                'requests': {label: n for (name, label), n in sorted(self.counters.items()) if name == 'requests'},
+                'seconds_by_activity': {k: round(v, 3) for k, v in time_split.items()},
+                'bottleneck': max(time_split, key=time_split.get) if any(time_split.values()) else None,
+            }
+        report.update(extra)
+        return report
+
+    def prometheus(self, prefix='scraper'):
+        """Prometheus text exposition of every histogram and counter."""
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, label), hist in sorted(self.histograms.items()):
+                by_name.setdefault(name, []).append((label, hist))
+            label_names = {'fetch': 'phase', 'parse': 'strategy', 'wait': 'reason'}
+            for name, series in by_name.items():
+                metric = f'{prefix}_{name}_seconds'
+                lines.append(f'# TYPE {metric} histogram')
+                for label, hist in series:
+                    sel = f'{label_names[name]}="{label}",' if name in label_names else ''
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets + ('+Inf',), hist.counts):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{{{sel}le="{bound}"}} {cumulative}')
+                    sel = sel.rstrip(',')
+                    lines.append(f'{metric}_sum{{{sel}}} {hist.sum:.6f}' if sel else f'{metric}_sum {hist.sum:.6f}')
+                    lines.append(f'{metric}_count{{{sel}}} {hist.count}' if sel else f'{metric}_count {hist.count}')
+            lines.append(f'# TYPE {prefix}_bytes_total counter')
+            lines.append(f"{prefix}_bytes_total {self.counters.get(('bytes', ''), 0)}")
+            lines.append(f'# TYPE {prefix}_requests_total counter')
+            for (name, label), n in sorted(self.counters.items()):
+                if name == 'requests':
+                    lines.append(f'{prefix}_requests_total{{outcome="{label}"}} {n}')
+            lines.append(f'# TYPE {prefix}_runs_total counter')
+            lines.append(f'{prefix}_runs_total {self.runs}')
+        return '\n'.join(lines) + '\n'
+
+
+ACTIVE = CrawlMetrics()
+TOTAL = CrawlMetrics()
+
+
+def observe(name, label, seconds):
+    ACTIVE.observe(name, label, seconds)
+
+
+def inc(name, label='', amount=1):
+    ACTIVE.inc(name, label, amount)
+
+
+def start_run():
+    """Start recording a new run into a fresh ACTIVE registry and return it."""
+    global ACTIVE
+    ACTIVE = CrawlMetrics()
+    ACTIVE.runs = 1
+    return ACTIVE
+
+
+def finish_run(metrics):
+    TOTAL.merge(metrics)
+
+
+class waiting:
+    """Context manager recording the time spent inside it as a wait of the given reason."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe('wait', self.reason, time.perf_counter() - self.t0)
+
+
+# Connection setup timings for the requests-based engines. urllib3 opens
+# connections on the thread that sends the request, so the timed connection
+# classes (timed_http.py) leave their connect times in a thread-local
+# for fetch_page to collect (take_connection_timings) and subtract from its
+# ttfb.
+
+_conn_timings = threading.local()
+
+
+def take_connection_timings():
+    """Pop the {phase: seconds} recorded for connections opened by this thread since the last call."""
+    timings = getattr(_conn_timings, 'phases', None)
+    _conn_timings.phases = {}
+    return timings or {}
+
+
+def add_connection_timing(phase, seconds):
+    phases = getattr(_conn_timings, 'phases', None)
+    if phases is None:
+        phases = _conn_timings.phases = {}
+    phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def instrument_session(session):
+    """Mount timed_http.TimedAdapter on a requests.Session for http and https. Returns the session."""
+    # imported here: it pulls in requests and urllib3, which the report and /metrics side never needs
+    from timed_http import TimedAdapter
+    adapter = TimedAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
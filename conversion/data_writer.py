@@ -0,0 +1,198 @@
+"""
+data_writer.py
+
+Crash-safe output for main/data.json.
+
+save_data() backs up the current file (data.json.YYYYMMDD_HHMMSS.bak, keeping
+the newest few), writes the new contents to a temp file in the same
+directory, fsyncs it and renames it over the old file, so a reader or a
+crash never sees a half-written data.json.
+
+It also appends the records that changed in this run to a versioned delta
+log next to it (data.delta.json):
+
+  {"version": 7, "flushed": 6, "changes": [{"version": 6, "time": ..., "records": {<profile id>: record}}, ...]}
+
+The frontend remembers the version it has and asks for
+GET /data/delta?since=<version> (see refresh_server.py), which merges the
+newer changes, so a refresh that touches 5 of 5,000 students transfers those
+5 records instead of the whole file.
+
+patch_data() logs a change without rewriting data.json at all (a
+single-profile refresh). "flushed" is the newest version data.json itself
+contains; the versions after it are pending, and readers of data.json apply
+them (pending(), RecordStore.apply_pending, main/script.js) until the next
+save_data() writes them into the file. Pending versions are never pruned.
+"""
+import contextlib
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+DELTA_VERSIONS_KEPT = 50
+
+# held while the delta log is read and rewritten, and around a save that flushes pending patches
+# into data.json, since refresh_server.py patches single profiles while a refresh job may be saving
+LOG_LOCK = threading.RLock()
+
+
+def _fsync_dir(path):
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def open_atomic(path):
+    """Open a temp file next to path for writing; on success fsync it and rename it over path."""
+    out_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=out_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _fsync_dir(path)
+
+
+def write_json_array(f, records, indent=4):
+    """Write an iterable of dicts to f exactly as json.dump(list(records), f, indent=indent)
+    would, holding one record in memory at a time."""
+    pad = ' ' * indent
+    count = 0
+    for rec in records:
+        # nest the record one level inside the array; JSON strings never contain raw newlines
+        f.write(',\n' + pad if count else '[\n' + pad)
+        f.write(json.dumps(rec, indent=indent, ensure_ascii=False).replace('\n', '\n' + pad))
+        count += 1
+    f.write('\n]' if count else '[]')
+    return count
+
+
+def write_json_atomic(path, data, indent=4):
+    """Write data as JSON to path via temp file + fsync + rename."""
+    with open_atomic(path) as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+
+
+def backup(path, keep=5):
+    """Copy path to path.YYYYMMDD_HHMMSS.bak and delete all but the newest `keep` backups."""
+    if keep <= 0 or not os.path.exists(path):
+        return None
+    dest = f"{path}.{time.strftime('%Y%m%d_%H%M%S')}.bak"
+    shutil.copy2(path, dest)
+    # timestamped names sort chronologically
+    backups = sorted(glob.glob(glob.escape(path) + '.????????_??????.bak'))
+    for old in backups[:-keep]:
+        os.remove(old)
+    return dest
+
+
+def delta_path(path):
+    root, ext = os.path.splitext(path)
+    return f'{root}.delta{ext or ".json"}'
+
+
+def load_delta_log(path):
+    try:
+        with open(delta_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': 0, 'changes': []}
+
+
+def _flushed(log):
+    return log.get('flushed', log.get('version', 0))
+
+
+def append_delta(path, changed, keep=DELTA_VERSIONS_KEPT, flushed=True):
+    """Record {profile id: record} as the next version in path's delta log. Returns the new version.
+
+    flushed=False logs a change that is not in path yet (see patch_data).
+    """
+    with LOG_LOCK:
+        log = load_delta_log(path)
+        version = log.get('version', 0) + 1
+        last_flushed = version if flushed else _flushed(log)
+        changes = log.get('changes', []) + [{'version': version, 'time': time.time(), 'records': changed}]
+        log['version'] = version
+        log['flushed'] = last_flushed
+        log['changes'] = [c for i, c in enumerate(changes) if i >= len(changes) - keep or c['version'] > last_flushed]
+        write_json_atomic(delta_path(path), log, indent=None)
+        return version
+
+
+def patch_data(path, changed):
+    """Log {profile id: record} as a pending change of path without rewriting it. Returns the new version."""
+    return append_delta(path, changed, flushed=False)
+
+
+def pending(path):
+    """{profile id: record} logged by patch_data() and not yet written to path, newest last."""
+    log = load_delta_log(path)
+    records = {}
+    for change in log.get('changes', []):
+        if change['version'] > _flushed(log):
+            records.update(change['records'])
+    return records
+
+
+def mark_flushed(path):
+    """Note that path now contains every change in its delta log."""
+    with LOG_LOCK:
+        log = load_delta_log(path)
+        if _flushed(log) != log.get('version', 0):
+            log['flushed'] = log.get('version', 0)
+            write_json_atomic(delta_path(path), log, indent=None)
+
+
+def read_delta(path, since):
+    """Changes newer than `since`, merged into one {profile id: record} map.
+
+    full_reload is set when the client is too far behind (older versions were
+    pruned) or ahead of the log (it was reset), and it should refetch data.json.
+    """
+    log = load_delta_log(path)
+    version = log.get('version', 0)
+    changes = log.get('changes', [])
+    oldest = changes[0]['version'] if changes else version + 1
+    full_reload = since > version or since < oldest - 1
+    records = {}
+    updated_at = None
+    if not full_reload:
+        for change in changes:
+            if change['version'] > since:
+                records.update(change['records'])
+                updated_at = change['time']
+    return {'version': version, 'since': since, 'full_reload': full_reload, 'records': records, 'time': updated_at}
+
+
+def save_data(path, records, changed=None, backups=5):
+    """Back up, atomically rewrite path, and log `changed` ({profile id: record}) as a delta.
+
+    records may be any iterable of dicts; they are streamed to disk, and are
+    taken to include every pending patch (see RecordStore.save).
+    Returns the delta version written, or None when nothing changed.
+    """
+    with LOG_LOCK:
+        backup(path, backups)
+        with open_atomic(path) as f:
+            write_json_array(f, records)
+        if changed:
+            return append_delta(path, changed)
+        mark_flushed(path)
+        return None
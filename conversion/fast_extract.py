@@ -0,0 +1,174 @@
+"""
+fast_extract.py
+
+Fast-path badge extractors for scrape_profiles.extract_badges_from_html.
+
+Each backend finds the '.profile-badges .profile-badge' blocks in a single
+pass with a compiled query and reads the 'ql-title' span of each block. They
+only handle that well-formed shape: if a page has no such blocks, or a block
+has no title span, the backend returns None and the caller falls back to the
+BeautifulSoup heuristics, so results always match the full extractor.
+
+A title's text is read the way bs4's get_text reads it: <script>, <style>
+and <template> contents and comments are left out. A CDATA section, which
+bs4's html.parser keeps as text but lxml and Lexbor turn into a comment,
+makes the backend fall back.
+
+Backends, fastest first:
+  selectolax  - selectolax's Lexbor parser, used if installed
+  lxml        - lxml.html + precompiled XPath (lxml is in requirements.txt)
+
+A backend's parser is imported, and its queries compiled, the first time it
+extracts a page; a long-lived process (refresh_server.py, scrape_profiles.py
+--worker) does this once.
+"""
+import importlib.util
+import re
+
+WS_RE = re.compile(r'\s+')
+# elements whose text bs4's get_text leaves out
+SKIPPED_TAGS = frozenset(('script', 'style', 'template'))
+
+
+def _badge_name(title):
+    return WS_RE.sub(' ', title).strip() + ' [Skill Badge]'
+
+
+def _join(parts):
+    return ' '.join(s.strip() for s in parts if s.strip())
+
+
+def _collect(titles):
+    """Dedupe badge names in order; None if any block lacked a usable title span."""
+    badges = []
+    seen = set()
+    for title in titles:
+        if title is None:
+            return None
+        if not title:
+            continue
+        bnorm = _badge_name(title)
+        if bnorm not in seen:
+            seen.add(bnorm)
+            badges.append(bnorm)
+    return badges or None
+
+
+def _build_lxml():
+    from lxml import etree
+    import lxml.html
+
+    blocks = etree.XPath(
+        "//*[contains(concat(' ', normalize-space(@class), ' '), ' profile-badges ')]"
+        "//*[contains(concat(' ', normalize-space(@class), ' '), ' profile-badge ')]"
+    )
+    title_span = etree.XPath(".//span[contains(@class, 'ql-title')]")
+
+    def lxml_text(el, parts):
+        """Append el's text to parts; False if it holds a CDATA section."""
+        if el.text:
+            parts.append(el.text)
+        for child in el:
+            tag = child.tag
+            if not isinstance(tag, str):
+                # comments and processing instructions
+                if tag is etree.Comment and (child.text or '').startswith('[CDATA['):
+                    return False
+            elif tag not in SKIPPED_TAGS and not lxml_text(child, parts):
+                return False
+            if child.tail:
+                parts.append(child.tail)
+        return True
+
+    def lxml_title(blk):
+        found = title_span(blk)
+        parts = []
+        if not found or not lxml_text(found[0], parts):
+            return None
+        return _join(parts)
+
+    def extract_lxml(text):
+        try:
+            root = lxml.html.fromstring(text)
+        except ValueError:
+            # str input with an XML encoding declaration
+            root = lxml.html.fromstring(text.encode('utf-8'))
+        except etree.ParserError:
+            return None
+        return _collect(lxml_title(blk) for blk in blocks(root))
+    return extract_lxml
+
+
+def _build_selectolax():
+    from selectolax.lexbor import LexborHTMLParser
+
+    def selectolax_text(node, parts):
+        """Append node's text to parts; False if it holds a CDATA section."""
+        child = node.child
+        while child is not None:
+            tag = child.tag
+            if tag == '-text':
+                parts.append(child.text_content)
+            elif tag == '-comment':
+                if (getattr(child, 'comment_content', None) or '').startswith('[CDATA['):
+                    return False
+            elif tag[0] != '-' and tag not in SKIPPED_TAGS and not selectolax_text(child, parts):
+                return False
+            child = child.next
+        return True
+
+    def selectolax_title(blk):
+        for span in blk.css('span'):
+            if 'ql-title' in (span.attributes.get('class') or ''):
+                parts = []
+                return _join(parts) if selectolax_text(span, parts) else None
+        return None
+
+    def extract_selectolax(text):
+        tree = LexborHTMLParser(text)
+        return _collect(selectolax_title(blk) for blk in tree.css('.profile-badges .profile-badge'))
+    return extract_selectolax
+
+
+# backend -> (module it needs, function importing it and compiling its queries). Backends are
+# built on first use, so importing this module (and scrape_profiles) doesn't load the parsers
+BACKENDS = {
+    'selectolax': ('selectolax.lexbor', _build_selectolax),
+    'lxml': ('lxml.html', _build_lxml),
+}
+_extractors = {}
+
+
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ImportError:
+        return False
+
+
+def available_backends():
+    return [name for name, (module, _build) in BACKENDS.items() if _installed(module)]
+
+
+def default_backend():
+    """Fastest installed backend, or 'bs4' when none is available."""
+    available = available_backends()
+    return available[0] if available else 'bs4'
+
+
+def extractor(backend):
+    """The backend's extract function, built on first use; None for an unknown or missing backend."""
+    if backend not in _extractors:
+        try:
+            _extractors[backend] = BACKENDS[backend][1]() if backend in BACKENDS else None
+        except ImportError:
+            _extractors[backend] = None
+    return _extractors[backend]
+
+
+def extract(text, backend):
+    """Badge list from the fast path, or None if the caller should fall back."""
+    fn = extractor(backend)
+    if fn is None:
+        return None
+    return fn(text)
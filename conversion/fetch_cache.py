@@ -0,0 +1,109 @@
+"""
+fetch_cache.py
+
+On-disk conditional-GET cache for profile fetches.
+
+For every profile URL the cache remembers the ETag / Last-Modified validators,
+a SHA-256 of the page body and the badge list extracted from it. The next run
+sends If-None-Match / If-Modified-Since; a 304, or a 200 whose body hashes the
+same as last time, reuses the stored badges without parsing the page.
+
+Entries older than max_age seconds (since they were last validated) are
+dropped, and beyond max_entries the least recently validated go first.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class FetchCache:
+    def __init__(self, path, max_entries=50000, max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = {}
+        self.not_modified = 0
+        self.unchanged = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.evict()
+
+    def save(self):
+        with self._lock:
+            self.evict()
+            out_dir = os.path.dirname(self.path) or '.'
+            os.makedirs(out_dir, exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def evict(self, now=None):
+        now = now or time.time()
+        if self.max_age:
+            self.entries = {k: v for k, v in self.entries.items() if now - v.get('validated_at', 0) <= self.max_age}
+        if self.max_entries and len(self.entries) > self.max_entries:
+            newest = sorted(self.entries.items(), key=lambda kv: kv[1].get('validated_at', 0), reverse=True)
+            self.entries = dict(newest[:self.max_entries])
+
+    def conditional_headers(self, url):
+        """Validator headers to send for url (empty if nothing is cached)."""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def check(self, url, status, body):
+        """Return (badges, digest). badges is the stored list if the page is known
+        to be unchanged, otherwise None and the caller must parse the body.
+
+        A 304 with no entry to reuse (evicted since the request was sent) is a
+        miss with digest None: the caller must fetch the page again without
+        validators and store nothing for it.
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+            if status == 304:
+                if not entry:
+                    self.misses += 1
+                    return None, None
+                self.not_modified += 1
+                entry['validated_at'] = time.time()
+                return list(entry['badges']), entry.get('body_hash')
+            digest = hashlib.sha256(body or b'').hexdigest()
+            if entry and entry.get('body_hash') == digest:
+                self.unchanged += 1
+                entry['validated_at'] = time.time()
+                return list(entry['badges']), digest
+            self.misses += 1
+            return None, digest
+
+    def store(self, url, headers, digest, badges):
+        with self._lock:
+            self.entries[url] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'body_hash': digest,
+                'badges': list(badges),
+                'validated_at': time.time(),
+            }
+
+    def summary(self):
+        total = self.not_modified + self.unchanged + self.misses
+        rate = 100.0 * (total - self.misses) / total if total else 0.0
+        return (f'Cache: {self.not_modified} not modified, {self.unchanged} unchanged, '
+                f'{self.misses} misses ({rate:.1f}% hits, {len(self.entries)} entries)')
@@ -0,0 +1,199 @@
+"""
+leaderboard.py
+
+Precomputed rankings behind refresh_server.py's read API, so the frontend
+can ask for one page of a sorted, filtered cohort instead of downloading
+data.json and sorting it on every keystroke.
+
+A Leaderboard holds one cohort's data.json in a RecordStore, plus:
+
+  rankings    for each sort order (SORTS), every student's sort key in a
+              sorted list, so a page of the ranking is a slice and a
+              student's rank is a bisect
+  name index  sorted (name word, position) pairs, so a name-prefix query
+              ('ali' finds 'Alice Smith' and 'Kumar Ali') is a bisect too;
+              find() looks a student up by profile id, URL or full name
+              for refresh_server.py's single-profile refresh
+
+Students with equal scores share a rank (1, 2, 2, 4) and keep their
+data.json order, like the frontend's stable sort.
+
+sync() keeps all of it current. On each read it stats data.json and its
+delta log. When a scraper run has changed them, only the records in the
+delta log (see data_writer.py) move to their new places in each ranking; if
+the log can't say what changed (e.g. converter.py replaced the file), the
+cohort is reloaded.
+"""
+import bisect
+import itertools
+import os
+import threading
+import uuid
+
+import data_writer
+from record_store import RecordStore, StudentRecord, delta_key, delta_keys, load_data, profile_key
+
+# sort name -> score (a tuple, higher ranks first); the names match main/script.js's sort-select
+SORTS = {
+    'courses': lambda r: (r.courses,),
+    'totalBadges': lambda r: (r.skill_badges + r.arcade_games,),
+    'skill': lambda r: (r.skill_badges,),
+    'arcade': lambda r: (r.arcade_games,),
+    'completion': lambda r: (r.is_complete(), r.courses),
+}
+DEFAULT_SORT = 'courses'
+MAX_PER_PAGE = 200
+
+
+def _words(name):
+    return (name or '').casefold().split()
+
+
+class Leaderboard:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.records = RecordStore()
+        self.version = 0  # delta log version the rankings reflect
+        self.revision = 0  # bumped on every change, for ETags
+        self.completed = 0
+        self._generation = uuid.uuid4().hex[:8]
+        self._stamp = None
+        self._positions = {}  # delta_key -> position in records
+        self._keys = {}  # sort -> [sort key of each position]
+        self._rankings = {}  # sort -> sorted sort keys
+        self._names = []  # sorted (word, position)
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self):
+        return f'{self._generation}-{self.revision}'
+
+    def _sort_key(self, sort, rec, pos):
+        # negated so an ascending sort ranks the highest score first; position breaks ties
+        return tuple(-v for v in SORTS[sort](rec)) + (pos,)
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        try:
+            delta = os.stat(data_writer.delta_path(self.path)).st_mtime_ns
+        except OSError:
+            delta = None
+        return st.st_mtime_ns, st.st_size, delta
+
+    def _load(self, stamp):
+        self.records = load_data(self.path)
+        self.version = data_writer.load_delta_log(self.path).get('version', 0)
+        self._positions = {}
+        self._names = []
+        for pos, (key, rec) in enumerate(zip(delta_keys(self.records), self.records)):
+            if key:
+                self._positions[key] = pos
+            self._names.extend((word, pos) for word in _words(rec.get('User Name')))
+        self._names.sort()
+        self._keys = {sort: [self._sort_key(sort, rec, pos) for pos, rec in enumerate(self.records)]
+                      for sort in SORTS}
+        self._rankings = {sort: sorted(keys) for sort, keys in self._keys.items()}
+        self.completed = sum(1 for rec in self.records if rec.is_complete())
+        self._stamp = stamp
+        self.revision += 1
+
+    def _update(self, pos, rec):
+        old = self.records[pos]
+        for sort in SORTS:
+            new_key = self._sort_key(sort, rec, pos)
+            old_key = self._keys[sort][pos]
+            if new_key != old_key:
+                ranking = self._rankings[sort]
+                del ranking[bisect.bisect_left(ranking, old_key)]
+                bisect.insort(ranking, new_key)
+                self._keys[sort][pos] = new_key
+        old_words, new_words = _words(old.get('User Name')), _words(rec.get('User Name'))
+        if old_words != new_words:
+            for word in old_words:
+                del self._names[bisect.bisect_left(self._names, (word, pos))]
+            for word in new_words:
+                bisect.insort(self._names, (word, pos))
+        self.completed += rec.is_complete() - old.is_complete()
+        self.records.records[pos] = rec
+
+    def sync(self):
+        """Bring the rankings up to date with data.json. Returns True if anything changed."""
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            delta = data_writer.read_delta(self.path, self.version) if self._stamp is not None else None
+            if (delta is None or delta['full_reload'] or delta['version'] == self.version
+                    or any(key not in self._positions for key in delta['records'])):
+                self._load(stamp)
+            else:
+                for key, record in delta['records'].items():
+                    self._update(self._positions[key], StudentRecord.from_dict(record))
+                self.version = delta['version']
+                self._stamp = stamp
+                self.revision += 1
+            return True
+
+    def _matches(self, query):
+        """Positions of students with a name word starting with every word of the query."""
+        matched = None
+        for word in _words(query):
+            lo = bisect.bisect_left(self._names, (word,))
+            hi = bisect.bisect_left(self._names, (word + '\U0010ffff',), lo)
+            found = {pos for _word, pos in self._names[lo:hi]}
+            matched = found if matched is None else matched & found
+            if not matched:
+                break
+        return matched
+
+    def find(self, query):
+        """Positions of the students a profile id or URL, or else a full name (any case), refers to."""
+        with self._lock:
+            key = profile_key(query)
+            found = []
+            while delta_key(key, len(found)) in self._positions:
+                found.append(self._positions[delta_key(key, len(found))])
+            if found:
+                return found
+            words = _words(query)
+            return sorted(pos for pos in self._matches(query) or ()
+                          if _words(self.records[pos].get('User Name')) == words)
+
+    def stats(self):
+        with self._lock:
+            return {'cohort': self.name, 'students': len(self.records), 'completed': self.completed,
+                    'version': self.version}
+
+    def query(self, sort=DEFAULT_SORT, q='', page=1, per_page=50):
+        """One page of the cohort ranked by `sort`, optionally only names matching the prefix q."""
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        page = max(1, page)
+        start = (page - 1) * per_page
+        with self._lock:
+            ranking = self._rankings.get(sort, [])
+            matched = self._matches(q)
+            if matched is None:
+                total = len(ranking)
+                keys = ranking[start:start + per_page]
+            elif len(matched) * 8 > len(ranking):
+                # a broad prefix: walking the ranking finds the page sooner than sorting the matches
+                total = len(matched)
+                keys = list(itertools.islice((key for key in ranking if key[-1] in matched),
+                                             start, start + per_page))
+            else:
+                total = len(matched)
+                sort_keys = self._keys.get(sort, [])
+                keys = sorted(sort_keys[pos] for pos in matched)[start:start + per_page]
+            rows = []
+            for key in keys:
+                row = self.records[key[-1]].to_dict()
+                # competition rank: the first place with this score
+                row['rank'] = bisect.bisect_left(ranking, key[:-1]) + 1
+                rows.append(row)
+            return {'cohort': self.name, 'sort': sort, 'q': q, 'page': page, 'per_page': per_page,
+                    'total': total, 'pages': (total + per_page - 1) // per_page, 'students': len(self.records),
+                    'completed': self.completed, 'version': self.version, 'etag': self.etag, 'rows': rows}
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+merge_shards.py
+
+Combine the outputs of a sharded crawl (scrape_profiles.py --shard i/N) into
+data.json. Each shard file holds that shard's records after its crawl; they
+are applied to data.json with the scraper's usual rule that a badge count
+only ever increases, so merging the same shard twice, or a shard from an
+older run, never loses a badge. The merged run is logged as one version of
+the delta log (data.delta.json) and data.json is rewritten atomically.
+
+Shards can run anywhere, e.g. one per machine:
+
+  machine 1:  python conversion/scrape_profiles.py --shard 1/2 -i main/data.json -o main/data.json
+  machine 2:  python conversion/scrape_profiles.py --shard 2/2 -i main/data.json -o main/data.json
+  then, with both main/data.shard-*-of-2.json copied next to data.json:
+              python conversion/merge_shards.py --output main/data.json
+
+Usage examples:
+  python conversion/merge_shards.py --output main/data.json
+  python conversion/merge_shards.py --output main/data.json path/to/data.shard-1-of-4.json ...
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+from record_store import (ProfileIndex, RecordStore, apply_badges, delta_key, entry_url, load_data, profile_key,
+                          record_key)
+
+SHARD_FILE_RE = re.compile(r'\.shard-(\d+)-of-(\d+)\.json$')
+
+
+def find_shards(output):
+    """Shard files next to output (data.json -> data.shard-*-of-*.json)."""
+    root, ext = os.path.splitext(output)
+    return sorted(glob.glob(glob.escape(root) + '.shard-*-of-*' + (ext or '.json')))
+
+
+def missing_shards(paths):
+    """Shards of each N-way split that are not among paths, as 'i/N' strings."""
+    present = {}
+    for path in paths:
+        m = SHARD_FILE_RE.search(path)
+        if m:
+            present.setdefault(int(m.group(2)), set()).add(int(m.group(1)))
+    return [f'{i}/{n}' for n, seen in sorted(present.items()) for i in range(1, n + 1) if i not in seen]
+
+
+def merge(output, paths, input_path=None, backups=5, dry_run=False, log=print):
+    """Apply every shard file in paths to input_path (default: output) and write output. Returns a summary dict."""
+    data = load_data(input_path or output)
+    index = ProfileIndex(data).by_key  # profile_key -> every record listing that profile
+    changed_records = {}
+    unknown = 0
+    for path in paths:
+        shard = RecordStore.load(path)
+        before = len(changed_records)
+        for rec in shard:
+            key = profile_key(entry_url(rec))
+            matched = index.get(key)
+            if not matched:
+                unknown += 1
+                continue
+            names = rec.get('Names of Completed Skill Badges') or ''
+            badges = names.split(' | ') if names else []
+            for i, target in enumerate(matched):
+                if apply_badges(target, badges, label='Merge', log=log):
+                    changed_records[delta_key(key, i)] = target.to_dict()
+        log(f'{path}: {len(shard)} records, {len(changed_records) - before} updated')
+    if unknown:
+        log(f'Warning: {unknown} shard records have no matching record in {input_path or output}')
+
+    version = None
+    if changed_records and not dry_run:
+        version = data.save(output, changed_records, backups=backups, key=record_key)
+        log(f'Wrote merged data to {output} (delta version {version}, {len(changed_records)} changed records)')
+    else:
+        log(f'Merged {len(paths)} shards, {len(changed_records)} records changed' + (' (dry run)' if dry_run else ''))
+    return {'shards': len(paths), 'updated': len(changed_records), 'unknown': unknown, 'version': version}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge sharded scrape_profiles.py outputs into data.json')
+    parser.add_argument('shards', nargs='*', help='Shard files (default: every data.shard-*-of-*.json next to --output)')
+    parser.add_argument('--output', '-o', default='main/data.json')
+    parser.add_argument('--input', '-i', help='Base data to merge into (default: --output)')
+    parser.add_argument('--backups', type=int, default=5, help='Timestamped backups of the output to keep (0 = none)')
+    parser.add_argument('--dry-run', action='store_true', help='Do not write output file; just show changes')
+    parser.add_argument('--allow-partial', action='store_true', help='Merge even if some shards of a split are missing')
+    parser.add_argument('--remove', action='store_true', help='Delete the shard files after a successful merge')
+    args = parser.parse_args()
+
+    paths = args.shards or find_shards(args.output)
+    if not paths:
+        parser.error(f'no shard files found next to {args.output}')
+    missing = missing_shards(paths)
+    if missing and not args.allow_partial:
+        print(f"Missing shards: {', '.join(missing)} (use --allow-partial to merge anyway)", file=sys.stderr)
+        sys.exit(1)
+
+    merge(args.output, paths, args.input, args.backups, args.dry_run)
+    if args.remove and not args.dry_run:
+        for path in paths:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+page_archive.py
+
+Archive of fetched profile pages (scrape_profiles.py --archive), so a fixed
+badge extractor can be checked against, and applied to, the whole cohort
+without crawling anyone again.
+
+Two append-only files:
+
+  pages.pack   zlib-compressed page bodies, each stored once however many
+               profiles or runs it appears in (content-addressed by the
+               SHA-256 of the body, the same hash fetch_cache.py keeps)
+  pages.idx    one JSON line per stored body {"h", "o", "n", "u"}: hash,
+               offset and length in the pack, uncompressed length; and one
+               per fetched profile page {"k", "url", "h", "enc", "t"}: profile
+               id, URL, body hash, text encoding and fetch time
+
+The pack is appended before its index line, so a crash leaves at most some
+unreferenced bytes; torn index lines are skipped. The latest line per
+profile wins.
+
+reparse memory-maps the pack and runs extract_badges_from_html over the
+latest page of every profile on all CPU cores. Each worker process maps the
+pack itself and decompresses straight from the mapping, so pages are never
+copied between processes. It reports where the result differs from
+data.json, and --apply writes the gains (only ever increasing, like a crawl)
+and updates the fetch cache so the next crawl doesn't bring the old badges
+back.
+
+Usage examples:
+  python conversion/scrape_profiles.py --archive ...                     # collect pages while crawling
+  python conversion/page_archive.py stats
+  python conversion/page_archive.py reparse --data main/data.json
+  python conversion/page_archive.py reparse --data main/data.json --apply
+  python conversion/page_archive.py show <profile URL or id> --grep badge
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import fast_extract
+from record_store import ProfileIndex, apply_badges, delta_key, load_data, profile_key, record_key
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'pages.pack')
+
+# each blob in the pack: magic, compressed length, SHA-256 of the body, then the compressed body
+BLOB_HEADER = struct.Struct('>4sI32s')
+BLOB_MAGIC = b'CSBP'
+
+
+def index_path(pack_path):
+    root, _ext = os.path.splitext(pack_path)
+    return root + '.idx'
+
+
+class PageArchive:
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, level=6):
+        self.path = path
+        self.level = level
+        self.blobs = {}  # hash -> (offset, compressed length, length)
+        self.pages = {}  # profile key -> latest page entry
+        self.added = 0
+        self.deduplicated = 0
+        self._pack = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            f = open(index_path(self.path), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if 'o' in entry:
+                    self.blobs[entry['h']] = (entry['o'], entry['n'], entry['u'])
+                elif 'k' in entry:
+                    self.pages[entry['k']] = entry
+
+    def _open_for_append(self):
+        if self._pack is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._pack = open(self.path, 'ab')
+            self._index = open(index_path(self.path), 'a', encoding='utf-8', newline='\n')
+
+    def add(self, url, body, encoding=None):
+        """Archive a fetched page body (bytes) as the latest page of its profile."""
+        key = profile_key(url)
+        if not key or not body:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            known = digest in self.blobs
+        compressed = None if known else zlib.compress(body, self.level)
+        with self._lock:
+            self._open_for_append()
+            lines = []
+            if digest not in self.blobs:
+                self._pack.write(BLOB_HEADER.pack(BLOB_MAGIC, len(compressed), bytes.fromhex(digest)))
+                offset = self._pack.tell()
+                self._pack.write(compressed)
+                self._pack.flush()
+                self.blobs[digest] = (offset, len(compressed), len(body))
+                lines.append({'h': digest, 'o': offset, 'n': len(compressed), 'u': len(body)})
+                self.added += 1
+            else:
+                self.deduplicated += 1
+            if self.pages.get(key, {}).get('h') != digest:
+                page = {'k': key, 'url': url, 'h': digest, 'enc': encoding or 'utf-8', 't': time.time()}
+                self.pages[key] = page
+                lines.append(page)
+            if lines:
+                self._index.write(''.join(json.dumps(line) + '\n' for line in lines))
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            for f in (self._pack, self._index):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+            self._pack = self._index = None
+
+    def read(self, key):
+        """Text of the latest archived page of a profile, or None."""
+        page = self.pages.get(key)
+        if page is None:
+            return None
+        offset, length, _size = self.blobs[page['h']]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode(page['enc'], errors='replace')
+
+    def summary(self):
+        return f'Archive: {self.added} new pages stored, {self.deduplicated} already stored ({len(self.pages)} profiles)'
+
+
+# reparse worker processes: each maps the pack once and parses batches of pages from it
+
+_worker_pack = None
+_worker_backend = None
+
+
+def _init_worker(pack_path, backend):
+    global _worker_pack, _worker_backend
+    with open(pack_path, 'rb') as f:
+        _worker_pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker_backend = backend
+
+
+def _parse_batch(batch):
+    """[(hash, offset, length, encoding)] -> [(hash, badges, strategy)]"""
+    # the crawler is only imported by what runs its extractor, not by a crawl writing the archive
+    from scrape_profiles import extract_badges_timed
+    view = memoryview(_worker_pack)
+    results = []
+    try:
+        for digest, offset, length, encoding in batch:
+            text = zlib.decompress(view[offset:offset + length]).decode(encoding, errors='replace')
+            badges, strategy, _seconds = extract_badges_timed(text, _worker_backend)
+            results.append((digest, badges, strategy))
+    finally:
+        view.release()
+    return results
+
+
+def reparse(archive, backend, workers=None, batch_size=64):
+    """Extract badges from the latest page of every archived profile. Returns ({key: badges}, {strategy: pages})."""
+    # identical bodies are parsed once
+    todo = {}
+    for page in archive.pages.values():
+        if page['h'] not in todo:
+            offset, length, _size = archive.blobs[page['h']]
+            todo[page['h']] = (page['h'], offset, length, page['enc'])
+    batches = [list(todo.values())[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    by_hash = {}
+    strategies = {}
+    if workers == 1:
+        _init_worker(archive.path, backend)
+        results = map(_parse_batch, batches)
+    else:
+        # imported here: a crawl with --archive only needs PageArchive
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(archive.path, backend))
+        results = pool.map(_parse_batch, batches)
+    try:
+        for batch in results:
+            for digest, badges, strategy in batch:
+                by_hash[digest] = badges
+                strategies[strategy] = strategies.get(strategy, 0) + 1
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    return {key: by_hash[page['h']] for key, page in archive.pages.items()}, strategies
+
+
+def cmd_reparse(args):
+    archive = PageArchive(args.archive)
+    if not archive.pages:
+        print(f'No pages archived in {args.archive}', file=sys.stderr)
+        sys.exit(1)
+    t0 = time.perf_counter()
+    extracted, strategies = reparse(archive, args.parser, args.workers or None)
+    seconds = time.perf_counter() - t0
+    print(f"Reparsed {len(extracted)} profiles ({len(archive.blobs)} stored pages) in {seconds:.2f}s with "
+          f"{args.parser}: {', '.join(f'{k} {v}' for k, v in sorted(strategies.items()))}")
+
+    data = load_data(args.data)
+    index = ProfileIndex(data).by_key  # profile_key -> every record listing that profile
+    records = {}  # delta_key -> record; a profile listed twice is compared (and applied) once per record
+    outcome = {'same': [], 'gained': [], 'lost': [], 'different': [], 'not in data': []}
+    for key, badges in extracted.items():
+        if key not in index:
+            outcome['not in data'].append((key, None, badges))
+            continue
+        for i, rec in enumerate(index[key]):
+            records[delta_key(key, i)] = rec
+            names = rec.get('Names of Completed Skill Badges') or ''
+            current = names.split(' | ') if names else []
+            if badges == current:
+                kind = 'same'
+            elif len(badges) > len(current):
+                kind = 'gained'
+            elif len(badges) < len(current):
+                kind = 'lost'
+            else:
+                kind = 'different'
+            outcome[kind].append((delta_key(key, i), current, badges))
+    print('Compared with ' + args.data + ': ' + ', '.join(f'{len(v)} {k}' for k, v in outcome.items()))
+    for kind in ('gained', 'lost', 'different'):
+        for key, current, badges in outcome[kind][:args.show]:
+            print(f'  {kind} {key}: {len(current)} -> {len(badges)}  '
+                  f'+{sorted(set(badges) - set(current))} -{sorted(set(current) - set(badges))}')
+
+    if not args.apply:
+        return
+    changed = {}
+    for key, _current, badges in outcome['gained']:
+        if apply_badges(records[key], badges, label='Reparse'):
+            changed[key] = records[key].to_dict()
+    if changed:
+        version = data.save(args.data, changed, backups=args.backups, key=record_key)
+        print(f'Wrote {len(changed)} updated records to {args.data} (delta version {version})')
+    # cached badges for these exact bodies must not bring the old extraction back on the next crawl
+    if os.path.exists(args.cache):
+        from fetch_cache import FetchCache
+        cache = FetchCache(args.cache, max_entries=0, max_age=0)
+        updated = 0
+        for key, page in archive.pages.items():
+            entry = cache.entries.get(page['url'])
+            if entry and entry.get('body_hash') == page['h'] and entry.get('badges') != extracted[key]:
+                entry['badges'] = list(extracted[key])
+                updated += 1
+        cache.save()
+        print(f'Updated {updated} fetch cache entries in {args.cache}')
+
+
+def cmd_show(args):
+    archive = PageArchive(args.archive)
+    key = profile_key(args.profile)
+    text = archive.read(key)
+    if text is None:
+        print(f'No archived page for {key}', file=sys.stderr)
+        sys.exit(1)
+    page = archive.pages[key]
+    print(f"{page['url']} fetched {time.strftime('%Y-%m-%d %H:%M', time.localtime(page['t']))}, {len(text)} chars")
+    if not args.grep:
+        print(text)
+        return
+    # like backups/.../inspect_profile_html.py, but from the archive instead of a live fetch
+    pattern = re.compile(args.grep, re.I)
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if pattern.search(line):
+            print(f'--- lines {max(0, i - 2) + 1} to {min(len(lines), i + 3)}')
+            for j in range(max(0, i - 2), min(len(lines), i + 3)):
+                print(j + 1, lines[j].strip())
+
+
+def cmd_stats(args):
+    archive = PageArchive(args.archive)
+    raw = sum(size for _offset, _length, size in archive.blobs.values())
+    packed = os.path.getsize(archive.path) if os.path.exists(archive.path) else 0
+    print(f'{len(archive.pages)} profiles, {len(archive.blobs)} distinct pages, '
+          f'{raw / 2**20:.1f} MiB of HTML in a {packed / 2**20:.1f} MiB pack '
+          f'({raw / packed if packed else 0:.1f}x)')
+
+
+def main():
+    from scrape_profiles import DEFAULT_CACHE_PATH, PARSER_BACKEND
+
+    parser = argparse.ArgumentParser(description='Inspect and re-extract archived profile pages')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH, help='Pack file (default: conversion/.cache/pages.pack)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('reparse', help='Re-run the badge extractor over every archived profile, offline')
+    p.add_argument('--data', default='main/data.json', help='data.json to compare with (and update with --apply)')
+    p.add_argument('--parser', choices=['lxml', 'selectolax', 'bs4'], default=PARSER_BACKEND)
+    p.add_argument('--workers', type=int, default=0, help='Parser processes, 0 = one per CPU')
+    p.add_argument('--show', type=int, default=10, help='Example differences to print per kind')
+    p.add_argument('--apply', action='store_true', help='Write badge gains to --data and update the fetch cache')
+    p.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    p.add_argument('--backups', type=int, default=5)
+    p = sub.add_parser('show', help='Print the archived page of one profile')
+    p.add_argument('profile', help='Profile URL or id')
+    p.add_argument('--grep', help='Only print lines matching this regex, with context')
+    sub.add_parser('stats', help='Archive size and deduplication')
+    args = parser.parse_args()
+
+    if args.command == 'reparse' and args.parser != 'bs4' and args.parser not in fast_extract.available_backends():
+        parser.error(f'parser backend {args.parser!r} is not installed')
+    {'reparse': cmd_reparse, 'show': cmd_show, 'stats': cmd_stats}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+pathways.py
+
+Pathway completion rules for converter.py and a classifier that applies all
+of them at once.
+
+Each rule sets one data.json field to '1' or '0':
+
+  - keyword rules are met when any completed skill badge name contains one of
+    the keywords (case-insensitive)
+  - arcade rules are met when the student completed at least `arcade_games`
+    arcade games
+
+All keywords of all rules are compiled into one regex, so a badge name is
+scanned once no matter how many pathways exist. Badge names are split out of
+the ' | '-joined column, interned and classified once each; since the same
+~20 titles repeat for every student, a row costs a few dict lookups.
+Extra rules can be loaded from a JSON file of the same shape as PATHWAYS
+(converter.py --pathways FILE).
+"""
+import json
+import re
+import sys
+
+PATHWAYS = (
+    {'name': 'arcade', 'field': 'Gen AI Arcade Game Completion', 'arcade_games': 1},
+    {'name': 'prompt', 'field': 'Prompt Design in Vertex AI Completion', 'keywords': ['prompt', 'vertex']},
+    {'name': 'develop', 'field': 'Develop GenAI Apps with Gemini and Streamlit Completion',
+     'keywords': ['gemini', 'streamlit', 'genai', 'gen ai', 'gen-ai']},
+)
+
+
+LIST_CACHE_SIZE = 4096  # distinct badge lists remembered per classifier
+
+
+def load_pathways(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return tuple(json.load(f))
+
+
+class PathwayClassifier:
+    def __init__(self, pathways=PATHWAYS):
+        self.pathways = tuple(pathways)
+        self.fields = tuple(p['field'] for p in self.pathways)
+
+        owners = {}  # keyword -> names of the pathways listing it
+        for p in self.pathways:
+            for k in p.get('keywords', ()):
+                owners.setdefault(k.lower(), set()).add(p['name'])
+        # The regex reports one keyword per position (the longest), so credit
+        # each keyword with the pathways of every keyword that is a prefix of it
+        self._hits = {k: frozenset().union(*(owners[o] for o in owners if k.startswith(o))) for k in owners}
+        if owners:
+            alternatives = '|'.join(re.escape(k) for k in sorted(owners, key=len, reverse=True))
+            # zero-width lookahead so overlapping keywords are all found
+            self._regex = re.compile(f'(?=({alternatives}))')
+        else:
+            self._regex = None
+        self._by_badge = {}
+        self._by_list = {}
+        self._empty = frozenset()
+
+    def classify_badge(self, name):
+        """Names of the keyword pathways a single badge title counts towards (memoized)."""
+        hit = self._by_badge.get(name)
+        if hit is None:
+            hit = self._empty
+            if self._regex is not None:
+                found = {m.group(1) for m in self._regex.finditer(name.lower())}
+                if found:
+                    hit = frozenset().union(*(self._hits[k] for k in found))
+            self._by_badge[sys.intern(name)] = hit
+        return hit
+
+    def classify_badges(self, badge_names):
+        """Union of classify_badge over a ' | '-joined badge list (memoized, up to LIST_CACHE_SIZE lists)."""
+        if not badge_names:
+            return self._empty
+        hit = self._by_list.get(badge_names)
+        if hit is None:
+            hit = self._empty
+            # keywords never contain '|', so no match can span two badge names
+            for name in badge_names.split('|'):
+                hit = hit | self.classify_badge(name.strip())
+            if len(self._by_list) < LIST_CACHE_SIZE:
+                self._by_list[badge_names] = hit
+        return hit
+
+    def completion_flags(self, badge_names, arcade_count):
+        """[(field, '1' or '0')] for every pathway, in rule order."""
+        matched = self.classify_badges(badge_names)
+        flags = []
+        for p in self.pathways:
+            if 'arcade_games' in p:
+                met = arcade_count >= p['arcade_games']
+            else:
+                met = p['name'] in matched
+            flags.append((p['field'], '1' if met else '0'))
+        return flags
+
+
+DEFAULT_CLASSIFIER = PathwayClassifier()
@@ -0,0 +1,211 @@
+"""
+pipeline.py
+
+Three-stage crawl used by scrape_profiles.py (--mode pipeline):
+
+  fetchers  N threads, each with its own keep-alive requests.Session, download
+            raw pages and push them onto a bounded queue (--queue-depth). When
+            the parsers fall behind the queue fills and fetchers block, so the
+            number of open connections and buffered pages stays constant.
+  parsers   a ProcessPoolExecutor (--parse-workers) runs the badge extractor,
+            so parsing uses every core instead of contending for the GIL.
+  writer    the caller's thread consumes the yielded (entry, result, err)
+            triples and applies them to records; it is the only stage that
+            touches the data.
+
+Pages the fetch cache already knows, and failed fetches, skip the parse
+stage entirely. A parse that fails, including one the process pool can no
+longer take (a parser process died), becomes that profile's 'parse failed'
+result. If the consumer stops early (--time-limit, an exception in a refresh
+job), the fetchers stop taking new profiles and every stage is shut down
+before the generator returns.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import crawl_metrics
+
+try:
+    import requests
+except Exception:
+    requests = None
+
+_DONE = object()
+
+
+def _parse_failed(page, error):
+    return {'url': page['url'], 'error': f'parse failed: {error}', 'badges': [], 'kind': 'parse'}
+
+
+class PipelineStats:
+    """Per-stage counters, printed after the run. Every stage updates them under one lock."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.fetchers = self.parsers = self.queue_depth = 0
+        self.fetched = 0
+        self.fetch_errors = 0
+        self.fetch_busy = 0.0
+        self.parsed = 0
+        self.parse_skipped = 0
+        self.written = 0
+        self.write_busy = 0.0
+        self.max_queued = 0
+        self._lock = threading.Lock()
+
+    def add_fetch(self, seconds, failed=False):
+        with self._lock:
+            self.fetched += 1
+            self.fetch_errors += failed
+            self.fetch_busy += seconds
+
+    def note_queued(self, depth):
+        with self._lock:
+            self.max_queued = max(self.max_queued, depth)
+
+    def add_parse(self, skipped=False):
+        with self._lock:
+            if skipped:
+                self.parse_skipped += 1
+            else:
+                self.parsed += 1
+
+    def add_write(self, seconds):
+        with self._lock:
+            self.written += 1
+            self.write_busy += seconds
+
+    def summary(self):
+        wall = max(time.monotonic() - self.started, 1e-9)
+        return (f'Pipeline ({wall:.1f}s): '
+                f'fetch {self.fetched / wall:.1f} pages/s with {self.fetchers} threads '
+                f'({self.fetch_busy / wall / max(self.fetchers, 1):.0%} busy, {self.fetch_errors} failed); '
+                f'parse {self.parsed / wall:.1f} pages/s with {self.parsers} processes '
+                f'({self.parse_skipped} skipped via cache); '
+                f'write {self.written / wall:.1f} records/s ({self.write_busy:.2f}s busy); '
+                f'queue peak {self.max_queued}/{self.queue_depth}')
+
+
+def iter_pipeline(entries, get_url, fetch_page, finish_page, parse, fetchers=10, parsers=None, queue_depth=64,
+                  timeout=15, delay=1.0, cache=None, stats=None):
+    """Yield (entry, result, err) triples as pages make it through fetch and parse.
+
+    fetch_page/finish_page/parse are scrape_profiles' functions; parse must be
+    picklable since it runs in the parser processes.
+    """
+    stats = stats or PipelineStats()
+    parsers = parsers or os.cpu_count() or 1
+    stats.fetchers, stats.parsers, stats.queue_depth = fetchers, parsers, queue_depth
+
+    todo = queue.Queue()
+    for entry in entries:
+        todo.put(entry)
+    raw = queue.Queue(maxsize=queue_depth)
+    out = queue.Queue()
+    stop = threading.Event()  # the consumer has gone: take no new profiles, parse nothing more
+
+    def fetch_stage():
+        session = crawl_metrics.instrument_session(requests.Session()) if requests is not None else None
+        try:
+            while not stop.is_set():
+                try:
+                    entry = todo.get_nowait()
+                except queue.Empty:
+                    return
+                url = get_url(entry)
+                if not url:
+                    out.put((entry, None, 'no-url'))
+                    continue
+                t0 = time.monotonic()
+                page = fetch_page(url, timeout=timeout, cache=cache, session=session)
+                stats.add_fetch(time.monotonic() - t0, failed='error' in page)
+                raw.put((entry, page, time.perf_counter()))
+                stats.note_queued(raw.qsize())
+                with crawl_metrics.waiting('delay'):
+                    stop.wait(delay)
+        finally:
+            if session is not None:
+                session.close()
+
+    def parse_stage():
+        in_flight = threading.BoundedSemaphore(parsers * 2)
+        try:
+            with ProcessPoolExecutor(max_workers=parsers) as pool:
+                while True:
+                    item = raw.get()
+                    if item is _DONE:
+                        break
+                    if stop.is_set():
+                        continue  # drained so the fetchers can finish
+                    entry, page, queued_at = item
+                    # time the page sat in the queue waiting for a parser
+                    crawl_metrics.observe('wait', 'queue', time.perf_counter() - queued_at)
+                    if 'text' not in page:
+                        if page.get('cached'):
+                            stats.add_parse(skipped=True)
+                        out.put((entry, page, None))
+                        continue
+                    in_flight.acquire()
+                    try:
+                        fut = pool.submit(parse, page['text'])
+                    except Exception as e:
+                        # e.g. BrokenProcessPool after a parser process died
+                        in_flight.release()
+                        out.put((entry, _parse_failed(page, e), None))
+                        continue
+
+                    def done(fut, entry=entry, page=page):
+                        try:
+                            result = finish_page(page, fut.result(), cache)
+                        except Exception as e:
+                            result = _parse_failed(page, e)
+                        stats.add_parse()
+                        in_flight.release()
+                        out.put((entry, result, None))
+
+                    fut.add_done_callback(done)
+        finally:
+            out.put(_DONE)
+
+    fetch_threads = [threading.Thread(target=fetch_stage, name=f'fetch-{i}', daemon=True) for i in range(fetchers)]
+    for t in fetch_threads:
+        t.start()
+    parse_thread = threading.Thread(target=parse_stage, name='parse-dispatch', daemon=True)
+    parse_thread.start()
+
+    def close_fetch_stage():
+        for t in fetch_threads:
+            t.join()
+        raw.put(_DONE)
+
+    closer = threading.Thread(target=close_fetch_stage, name='fetch-join', daemon=True)
+    closer.start()
+
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            t0 = time.monotonic()
+            yield item
+            stats.add_write(time.monotonic() - t0)
+    finally:
+        stop.set()
+        while True:
+            try:
+                todo.get_nowait()
+            except queue.Empty:
+                break
+        # fetchers still in a fetch finish it; if the parse stage has died, nothing else empties raw for them
+        while closer.is_alive():
+            if not parse_thread.is_alive():
+                try:
+                    while True:
+                        raw.get_nowait()
+                except queue.Empty:
+                    pass
+            closer.join(0.05)
+        parse_thread.join()
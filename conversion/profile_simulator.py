@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+profile_simulator.py
+
+Local stand-in for Cloud Skills Boost public profile pages, so the crawler can
+be exercised and benchmarked without touching cloudskillsboost.google.
+
+Pages are served at /public_profiles/<uuid> using the same
+'.profile-badges .profile-badge' markup the scraper targets. The badge list
+for a profile is derived from its uuid, so repeated runs see the same data,
+and responses carry an ETag so conditional requests get a 304.
+
+Latency (--latency plus up to --jitter of random extra) and page size
+(--page-kb, padded with navigation-like filler markup the way real profile
+pages are) are configurable. make_cohort()/write_export_csv() generate
+data.json cohorts and campaign CSV exports of any size pointing at it.
+
+Faults can be injected to exercise retry_policy.py:
+
+  --fault-rate P       each request fails transiently with probability P: a 429
+                       with Retry-After, a 503, a 500, a dropped connection or
+                       a response held for --hang seconds (a client timeout)
+  --dead-rate P        this fraction of profiles always answers 404
+  --max-concurrent N   answer 429 while more than N requests are in flight
+
+Usage examples:
+  python conversion/profile_simulator.py --port 8765
+  python conversion/profile_simulator.py --port 8765 --latency 0.05 --jitter 0.2 --page-kb 300
+  python conversion/profile_simulator.py --port 8765 --fault-rate 0.1 --dead-rate 0.01
+"""
+import argparse
+import csv
+import functools
+import hashlib
+import random
+import sys
+import threading
+import time
+import uuid as uuidlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BADGE_TITLES = [
+    'The Basics of Google Cloud Compute',
+    'Get Started with Cloud Storage',
+    'Get Started with Pub/Sub',
+    'Get Started with API Gateway',
+    'Get Started with Looker',
+    'Get Started with Dataplex',
+    'Get Started with Google Workspace Tools',
+    'App Building with AppSheet',
+    'Develop with Apps Script and AppSheet',
+    'Build a Website on Google Cloud',
+    'Set Up a Google Cloud Network',
+    'Store, Process, and Manage Data on Google Cloud - Console',
+    'Cloud Run Functions: 3 Ways',
+    'App Engine: 3 Ways',
+    'Cloud Speech API: 3 Ways',
+    'Monitoring in Google Cloud',
+    'Analyze Speech and Language with Google APIs',
+    'Prompt Design in Vertex AI',
+    'Develop GenAI Apps with Gemini and Streamlit',
+]
+
+
+def badges_for(profile_id):
+    """Deterministic badge titles for a profile id (0..len(BADGE_TITLES))."""
+    digest = hashlib.sha1(profile_id.encode('utf-8')).digest()
+    return BADGE_TITLES[:digest[0] % (len(BADGE_TITLES) + 1)]
+
+
+FILLER = ('<li class="nav-item"><a class="nav-link" href="/catalog?keywords=&amp;locale=&amp;solution%5B%5D=any'
+          '&amp;role%5B%5D=any&amp;skill-badge%5B%5D=any">Explore the catalog</a>'
+          '<span class="ql-body-small">Browse labs, courses and skill badges</span></li>')
+
+
+def render_profile(profile_id, badges, page_bytes=0):
+    blocks = []
+    for title in badges:
+        blocks.append(
+            '<div class="profile-badge">'
+            f'<a class="badge-image" href="https://www.credly.com/badges/{profile_id}"><img alt="badge" src="/badge.png"></a>'
+            f'<span class="ql-title-medium l-mts">{escape(title)}</span>'
+            '<span class="ql-body-medium l-mbs">Earned Oct 10, 2025 EDT</span>'
+            '</div>'
+        )
+    if not blocks:
+        blocks.append('<p class="ql-body-large">This user hasn\'t earned any badges yet.</p>')
+    page = (
+        '<!DOCTYPE html><html><head><title>Public Profile</title></head><body>'
+        f'<main><h1 class="ql-display-small">Student {escape(profile_id[:8])}</h1>'
+        f'<div class="profile-badges">{"".join(blocks)}</div></main>'
+    )
+    # pad up to page_bytes with site chrome, like the real pages' navigation
+    missing = page_bytes - len(page) - len('<nav><ul></ul></nav></body></html>')
+    if missing > 0:
+        page += f'<nav><ul>{FILLER * -(-missing // len(FILLER))}</ul></nav>'
+    return page + '</body></html>'
+
+
+def make_cohort(n, base_url):
+    """Build n data.json-shaped records pointing at a simulator at base_url."""
+    records = []
+    for i in range(n):
+        pid = str(uuidlib.UUID(int=i + 1))
+        records.append({
+            'User Name': f'Student {i + 1}',
+            'Google Cloud Skills Boost Profile URL': f'{base_url}/public_profiles/{pid}',
+            '# of Skill Badges Completed': '0',
+            'Names of Completed Skill Badges': '',
+            '# of Arcade Games Completed': '0',
+        })
+    return records
+
+
+EXPORT_HEADER = ['User Name', 'User Email', 'Google Cloud Skills Boost Profile URL', 'Profile URL Status',
+                 'Access Code Redemption Status', 'All Skill Badges & Games Completed', '# of Skill Badges Completed',
+                 'Names of Completed Skill Badges', '# of Arcade Games Completed', 'Names of Completed Arcade Games']
+
+
+def write_export_csv(path, n, base_url, seed=1):
+    """Write a campaign CSV export of n students whose profiles live at base_url.
+
+    Each student starts 0-2 badges behind what the simulator serves, so a
+    scrape after converting it finds updates.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        w.writerow(EXPORT_HEADER)
+        for i in range(n):
+            pid = str(uuidlib.UUID(int=i + 1))
+            earned = badges_for(pid)
+            badges = [t + ' [Skill Badge]' for t in earned[:max(0, len(earned) - rng.randint(0, 2))]]
+            arcade = rng.randint(0, 2)
+            w.writerow([f'Student {i + 1}', f'student{i + 1}@example.com', f'{base_url}/public_profiles/{pid}',
+                        'All Good', rng.choice(['Yes', 'No']), 'Yes' if len(badges) >= 19 and arcade else 'No',
+                        len(badges), ' | '.join(badges), arcade, ' | '.join(['Arcade Game'] * arcade)])
+
+
+FAULTS = ('throttle', 'unavailable', 'error', 'reset', 'hang')
+
+
+def is_dead(profile_id, dead_rate):
+    """Whether a profile is one of the dead_rate fraction that always 404s (stable per id)."""
+    digest = hashlib.sha1(('dead:' + profile_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') < dead_rate * 2 ** 32
+
+
+@functools.lru_cache(maxsize=4096)
+def page_for(profile_id, page_bytes=0):
+    """(encoded page, ETag) for a profile."""
+    body = render_profile(profile_id, badges_for(profile_id), page_bytes).encode('utf-8')
+    return body, '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+class ProfileHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; without this Nagle's
+    # algorithm holds the body back for a delayed ACK (~40ms per response)
+    disable_nagle_algorithm = True
+    latency = 0.0
+    jitter = 0.0
+    page_bytes = 0
+    fault_rate = 0.0
+    dead_rate = 0.0
+    hang = 5.0
+    retry_after = 1
+    max_concurrent = 0
+    rng = random.Random()
+    stats = None  # {'requests', 'faults', 'in_flight'} shared by the server's threads
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            busy = self.max_concurrent and self.stats['in_flight'] > self.max_concurrent
+            fault = self.rng.choice(FAULTS) if self.rng.random() < self.fault_rate else None
+            if busy:
+                fault = 'throttle'
+            if fault:
+                self.stats['faults'] += 1
+        try:
+            self._serve(fault)
+        finally:
+            with self.lock:
+                self.stats['in_flight'] -= 1
+
+    def _send_empty(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _serve(self, fault):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if fault == 'throttle':
+            self._send_empty(429, [('Retry-After', str(self.retry_after))])
+            return
+        if fault == 'unavailable':
+            self._send_empty(503)
+            return
+        if fault == 'error':
+            self._send_empty(500)
+            return
+        if fault == 'reset':
+            self.close_connection = True
+            return
+        if fault == 'hang':
+            time.sleep(self.hang)
+        path = self.path.split('?', 1)[0].rstrip('/')
+        prefix = '/public_profiles/'
+        if not path.startswith(prefix):
+            self.send_error(404)
+            return
+        profile_id = path[len(prefix):]
+        if self.dead_rate and is_dead(profile_id, self.dead_rate):
+            self.send_error(404)
+            return
+        body, etag = page_for(profile_id, self.page_bytes)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connects (and causes client timeouts) under load
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # clients that time out on a hanging response close the socket first
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, fault_rate=0.0, dead_rate=0.0, hang=5.0, retry_after=1,
+                 max_concurrent=0, seed=None, jitter=0.0, page_kb=0):
+    """Start the simulator on a background thread. Returns (server, base_url).
+
+    server.stats counts requests and injected faults.
+    """
+    stats = {'requests': 0, 'faults': 0, 'in_flight': 0}
+    handler = type('ConfiguredProfileHandler', (ProfileHandler,), {
+        'latency': latency, 'jitter': jitter, 'page_bytes': int(page_kb * 1024), 'fault_rate': fault_rate, 'dead_rate': dead_rate, 'hang': hang,
+        'retry_after': retry_after, 'max_concurrent': max_concurrent, 'rng': random.Random(seed),
+        'stats': stats, 'lock': threading.Lock()})
+    server = SimulatorServer((host, port), handler)
+    server.stats = stats
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic Cloud Skills Boost profile pages locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial per-request latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, uniform in [0, JITTER] (s)')
+    parser.add_argument('--page-kb', type=float, default=0, help='Pad pages to about this size (KiB)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latency jitter and fault injection')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='Probability of a transient failure per request')
+    parser.add_argument('--dead-rate', type=float, default=0.0, help='Fraction of profiles that always return 404')
+    parser.add_argument('--hang', type=float, default=5.0, help='How long a hanging response stalls (s)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After sent with injected 429s (s)')
+    parser.add_argument('--max-concurrent', type=int, default=0, help='Return 429 above this many in-flight requests (0 = off)')
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.host, args.port, args.latency, args.fault_rate, args.dead_rate, args.hang,
+                                    args.retry_after, args.max_concurrent, args.seed, args.jitter, args.page_kb)
+    print(f'Serving synthetic profiles on {base_url}/public_profiles/<uuid>', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""
+record_store.py
+
+Compact in-memory form of the cohort (the main/data.json schema), used by
+scrape_profiles.py and the tools that read data.json back. converter.py
+doesn't hold the cohort: it streams mapped rows straight to data_writer.
+
+A StudentRecord keeps the known data.json columns in __slots__ with real
+types: counts are ints, Yes/No and 1/0 columns are bools, and badge lists
+are tuples of ids into a shared BadgeTable (identical lists are shared
+too). Only the key order (an interned tuple shared by records with the same
+columns), one bitmask and, rarely, a dict of leftovers are kept per record
+to reproduce the original JSON exactly:
+
+  - the bitmask remembers whether a count was written as "3" or 3
+  - values that don't have a canonical typed form (e.g. a count of " 3" or
+    a flag of "yes") and unknown columns are kept verbatim in `extras`
+
+Records still answer the dict protocol (get, [], in, keys, items), so code
+written against the list-of-dicts model keeps working, while the scraper's
+recompute step reads the typed slots directly.
+
+The helpers at the end (profile keys, the profile index, load_data,
+apply_badges) are what the read-only tools (leaderboard.py, merge_shards.py,
+sqlite_store.py, page_archive.py) need from the cohort, without importing
+the crawler.
+"""
+import json
+import re
+import sys
+import threading
+from urllib.parse import urlsplit
+
+import data_writer
+
+
+def parse_count(value):
+    """Best-effort int: int(v or 0), then int(str(v).strip()), else 0."""
+    try:
+        return int(value or 0)
+    except Exception:
+        try:
+            return int(str(value or '0').strip())
+        except Exception:
+            return 0
+
+
+class BadgeTable:
+    """Interns badge names to small ints and badge lists to shared id tuples."""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.lists = {}
+        self._lock = threading.Lock()
+
+    def encode(self, joined):
+        with self._lock:
+            out = []
+            for name in joined.split(' | ') if joined else ():
+                i = self.ids.get(name)
+                if i is None:
+                    i = self.ids[sys.intern(name)] = len(self.names)
+                    self.names.append(name)
+                out.append(i)
+            ids = tuple(out)
+            # share the tuple between every record with this exact list
+            return self.lists.setdefault(ids, ids)
+
+    def decode(self, ids):
+        return ' | '.join(self.names[i] for i in ids)
+
+
+BADGES = BadgeTable()
+
+# Codecs: encode(raw) -> (canonical, value, string_form); decode(value, string_form) -> raw
+
+
+def _enc_text(raw):
+    if isinstance(raw, str):
+        return True, sys.intern(raw) if len(raw) <= 32 else raw, False
+    return False, '', False
+
+
+def _dec_text(value, _form):
+    return value
+
+
+def _enc_count(raw):
+    if type(raw) is int:
+        return True, raw, False
+    if isinstance(raw, str):
+        try:
+            n = int(raw)
+        except ValueError:
+            return False, parse_count(raw), True
+        return str(n) == raw, n, True
+    return False, parse_count(raw), False
+
+
+def _dec_count(value, form):
+    return str(value) if form else value
+
+
+def _flag_codec(yes, no):
+    truthy = {'yes', 'y', 'true', '1'}
+
+    def enc(raw):
+        if raw == yes:
+            return True, True, True
+        if raw == no:
+            return True, False, True
+        return False, str(raw).strip().lower() in truthy, True
+
+    def dec(value, _form):
+        return yes if value else no
+
+    return enc, dec
+
+
+def _enc_badges(raw):
+    if isinstance(raw, str):
+        return True, BADGES.encode(raw), False
+    return False, (), False
+
+
+def _dec_badges(value, _form):
+    return BADGES.decode(value)
+
+
+TEXT = (_enc_text, _dec_text, '')
+COUNT = (_enc_count, _dec_count, 0)
+YESNO = _flag_codec('Yes', 'No') + (False,)
+ONEZERO = _flag_codec('1', '0') + (False,)
+BADGE_LIST = (_enc_badges, _dec_badges, ())
+
+# data.json column -> (slot, codec)
+FIELDS = {
+    'User Name': ('name', TEXT),
+    'Google Cloud Skills Boost Profile URL': ('profile_url', TEXT),
+    'Profile URL': ('alt_profile_url', TEXT),
+    'Campaign Code Redemption Status': ('campaign_redemption', TEXT),
+    'Access Code Redemption Status': ('access_redemption', TEXT),
+    'Gen AI Arcade Game Completion': ('arcade_done', ONEZERO),
+    'Prompt Design in Vertex AI Completion': ('prompt_done', ONEZERO),
+    'Develop GenAI Apps with Gemini and Streamlit Completion': ('develop_done', ONEZERO),
+    '# of Courses Completed': ('courses', COUNT),
+    'All 3 Pathways Completed - Yes or No': ('all_pathways', YESNO),
+    'All Skill Badges & Games Completed': ('all_complete', YESNO),
+    '# of Skill Badges Completed': ('skill_badges', COUNT),
+    'Names of Completed Skill Badges': ('badge_ids', BADGE_LIST),
+    '# of Arcade Games Completed': ('arcade_games', COUNT),
+    'Names of Completed Arcade Games': ('arcade_ids', BADGE_LIST),
+}
+_FIELD_BIT = {key: 1 << i for i, key in enumerate(FIELDS)}
+# key -> (slot, encode, bit), for the from_dict fast path
+_DECODE_PLAN = {key: (slot, codec[0], _FIELD_BIT[key]) for key, (slot, codec) in FIELDS.items()}
+_SCHEMAS = {}  # key tuple -> (shared key tuple, [(slot, default) for fields it lacks])
+
+
+def _schema(keys):
+    keys = tuple(keys)
+    entry = _SCHEMAS.get(keys)
+    if entry is None:
+        missing = [(slot, codec[2]) for key, (slot, codec) in FIELDS.items() if key not in keys]
+        entry = _SCHEMAS.setdefault(keys, (keys, missing))
+    return entry
+
+
+class StudentRecord:
+    __slots__ = ('schema', 'forms', 'extras') + tuple(slot for slot, _codec in FIELDS.values())
+
+    def __init__(self):
+        self.schema = ()
+        self.forms = 0
+        self.extras = None
+        for slot, codec in FIELDS.values():
+            setattr(self, slot, codec[2])
+
+    @classmethod
+    def from_dict(cls, d):
+        rec = cls.__new__(cls)
+        rec.schema, missing = _schema(d)
+        forms = 0
+        extras = None
+        for key, raw in d.items():
+            plan = _DECODE_PLAN.get(key)
+            if plan is None:
+                canonical = False
+            else:
+                slot, enc, bit = plan
+                canonical, value, form = enc(raw)
+                setattr(rec, slot, value)
+                if form:
+                    forms |= bit
+            if not canonical:
+                if extras is None:
+                    extras = {}
+                extras[key] = raw
+        for slot, default in missing:
+            setattr(rec, slot, default)
+        rec.forms = forms
+        rec.extras = extras
+        return rec
+
+    def _set(self, key, raw):
+        field = FIELDS.get(key)
+        if field is None:
+            canonical = False
+        else:
+            slot, (enc, _dec, _default) = field
+            canonical, value, form = enc(raw)
+            setattr(self, slot, value)
+            bit = _FIELD_BIT[key]
+            self.forms = (self.forms | bit) if form else (self.forms & ~bit)
+        if canonical:
+            if self.extras and key in self.extras:
+                del self.extras[key]
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = raw
+
+    # dict protocol, in data.json terms
+
+    def __contains__(self, key):
+        return key in self.schema
+
+    def __getitem__(self, key):
+        if key not in self.schema:
+            raise KeyError(key)
+        if self.extras and key in self.extras:
+            return self.extras[key]
+        slot, (_enc, dec, _default) = FIELDS[key]
+        return dec(getattr(self, slot), self.forms & _FIELD_BIT[key])
+
+    def __setitem__(self, key, raw):
+        self._set(key, raw)
+        if key not in self.schema:
+            self.schema = _schema(self.schema + (key,))[0]
+
+    def get(self, key, default=None):
+        return self[key] if key in self.schema else default
+
+    def keys(self):
+        return self.schema
+
+    def items(self):
+        return ((k, self[k]) for k in self.schema)
+
+    def to_dict(self):
+        return {k: self[k] for k in self.schema}
+
+    # typed helpers
+
+    def is_complete(self):
+        """Business rule: >=19 skill badges AND >=1 arcade game."""
+        return self.skill_badges >= 19 and self.arcade_games >= 1
+
+    def set_skill_badges(self, names):
+        """Store a new skill badge list and recompute the derived columns.
+
+        Written the way the scraper always has: counts as JSON numbers, the
+        'All Skill Badges & Games Completed' and 'Gen AI Arcade Game
+        Completion' columns only if the record already has them.
+        """
+        self['# of Skill Badges Completed'] = len(names)
+        self['Names of Completed Skill Badges'] = ' | '.join(names)
+        self['# of Courses Completed'] = self.skill_badges + self.arcade_games
+        complete = 'Yes' if self.is_complete() else 'No'
+        if 'All Skill Badges & Games Completed' in self:
+            self['All Skill Badges & Games Completed'] = complete
+        self['All 3 Pathways Completed - Yes or No'] = complete
+        if 'Gen AI Arcade Game Completion' in self:
+            self['Gen AI Arcade Game Completion'] = '1' if self.arcade_games > 0 else '0'
+
+
+class RecordStore:
+    """The cohort as a list of StudentRecords."""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    @classmethod
+    def from_dicts(cls, dicts):
+        return cls(StudentRecord.from_dict(d) for d in dicts)
+
+    @classmethod
+    def load(cls, path):
+        # object_hook converts each record as it is parsed, so the full
+        # list of dicts never exists in memory
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f, object_hook=StudentRecord.from_dict))
+
+    def append(self, record):
+        if not isinstance(record, StudentRecord):
+            record = StudentRecord.from_dict(record)
+        self.records.append(record)
+        return record
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+    def to_dicts(self):
+        return (rec.to_dict() for rec in self.records)
+
+    def apply_pending(self, path, key):
+        """Take in the patches logged for path but not written to it yet (see data_writer.patch_data).
+
+        key(record) gives a record's profile id; patches are matched by
+        delta_keys. A patch only replaces a record with fewer skill badges,
+        as badge counts only ever increase. Returns the number of records
+        replaced.
+        """
+        patches = data_writer.pending(path)
+        replaced = 0
+        if patches:
+            for i, k in enumerate(list(delta_keys(self.records, key))):
+                rec = self.records[i]
+                patch = patches.get(k)
+                if patch is not None:
+                    patch = StudentRecord.from_dict(patch)
+                    if patch.skill_badges > rec.skill_badges:
+                        self.records[i] = patch
+                        replaced += 1
+        return replaced
+
+    def save(self, path, changed=None, backups=0, key=None):
+        """Write the data.json schema (see data_writer.save_data). Returns the delta version.
+
+        With key (see apply_pending), patches logged since this store was
+        loaded are taken in first, so writing the file doesn't drop them.
+        """
+        with data_writer.LOG_LOCK:
+            if key is not None:
+                self.apply_pending(path, key)
+            return data_writer.save_data(path, self.to_dicts(), changed, backups=backups)
+
+
+PROFILE_ID_RE = re.compile(r'public_profiles/([0-9a-fA-F-]+)')
+
+
+def entry_url(entry):
+    return entry.get('Google Cloud Skills Boost Profile URL') or entry.get('Profile URL')
+
+
+def profile_key(url):
+    """Canonical key for a profile URL.
+
+    Uses the public_profiles/<uuid> id when present, so scheme, host,
+    trailing slashes and query strings don't matter. Other URLs fall back to
+    host + path without scheme, 'www.', query or trailing slash.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    m = PROFILE_ID_RE.search(url)
+    if m:
+        return m.group(1).lower()
+    parts = urlsplit(url if '//' in url else '//' + url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host + parts.path.rstrip('/')
+
+
+def record_key(rec):
+    return profile_key(entry_url(rec))
+
+
+def delta_key(key, occurrence):
+    """Delta-log key of a profile's record: the profile id, with '#2', '#3', ... on the
+    later records of a profile listed more than once (occurrence counts from 0)."""
+    return f'{key}#{occurrence + 1}' if occurrence and key else key
+
+
+def delta_keys(data, key=record_key):
+    """delta_key of every record, in order."""
+    seen = {}
+    for rec in data:
+        k = key(rec)
+        n = seen.get(k, 0)
+        seen[k] = n + 1
+        yield delta_key(k, n)
+
+
+def build_profile_index(data):
+    """Map profile_key -> record. The first record wins if a profile appears twice."""
+    index = {}
+    for entry in data:
+        key = profile_key(entry_url(entry))
+        if key and key not in index:
+            index[key] = entry
+    return index
+
+
+class ProfileIndex:
+    """The records of a cohort by profile id and by full name (any case), in data.json order."""
+
+    def __init__(self, data):
+        self.by_key = {}
+        self.by_name = {}
+        for rec in data:
+            key = record_key(rec)
+            if key:
+                self.by_key.setdefault(key, []).append(rec)
+            self.by_name.setdefault(tuple((rec.get('User Name') or '').casefold().split()), []).append((key, rec))
+
+    def find(self, query):
+        """[(profile id, record)] for a profile id or URL, or else a full name."""
+        key = profile_key(query)
+        matches = [(key, rec) for rec in self.by_key.get(key, ())]
+        return matches or list(self.by_name.get(tuple(query.casefold().split()), ()))
+
+
+def load_data(path):
+    """RecordStore.load, plus any single-profile patches not yet written to path (see data_writer.patch_data)."""
+    data = RecordStore.load(path)
+    data.apply_pending(path, record_key)
+    return data
+
+
+def apply_badges(matched, badges, label='Update', log=print):
+    """Update a StudentRecord with a freshly scraped badge list. Only ever increases the count.
+
+    Returns True if the record changed.
+    """
+    old_count = matched.skill_badges
+    new_count = len(badges)
+    if new_count <= old_count:
+        return False
+
+    log(f"{label} {matched.get('User Name')}: badges {old_count} -> {new_count}")
+    # also recalculates the course total and the completion flags
+    matched.set_skill_badges(badges)
+    return True
@@ -0,0 +1,112 @@
+"""
+refresh_schedule.py
+
+Per-profile staleness scheduling for incremental refreshes
+(scrape_profiles.py --incremental / --budget N).
+
+For every profile the schedule remembers when it was last fetched and when
+its badge count last changed. A profile is due again once its refresh
+interval has passed since the last fetch:
+
+  - never fetched:       due immediately
+  - last fetch failed:   min_interval, doubling with every further failure
+                         up to complete_interval; a profile that is gone
+                         (404) waits complete_interval straight away
+  - completed the track: complete_interval (they will not change any more)
+  - otherwise:           a quarter of the time since the last change, clamped
+                         to [min_interval, max_interval], so a student who
+                         earned a badge an hour ago is polled on every refresh
+                         and one idle for two weeks about every three days
+
+With a budget only the most overdue profiles are fetched, so the cost of a
+refresh follows how many students are active rather than cohort size.
+Profiles never fetched rank as NEW_SCORE intervals overdue rather than
+first, so new or broken entries can't take the whole budget.
+"""
+import json
+import os
+import time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# overdue() of a profile never fetched: due, but behind profiles more than this many intervals late
+NEW_SCORE = 2.0
+
+
+class RefreshSchedule:
+    def __init__(self, path, min_interval=HOUR, max_interval=3 * DAY, complete_interval=7 * DAY):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.complete_interval = complete_interval
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def interval(self, key, complete, now):
+        st = self.state.get(key)
+        if not st:
+            return 0
+        failures = st.get('failures')
+        if failures:
+            if st.get('dead'):
+                return self.complete_interval
+            return min(self.complete_interval, self.min_interval * 2 ** (failures - 1))
+        if complete:
+            return self.complete_interval
+        idle = now - (st.get('last_changed') or st['first_fetched'])
+        return min(self.max_interval, max(self.min_interval, idle / 4))
+
+    def overdue(self, key, complete, now):
+        """How many intervals have passed since the last fetch (>= 1 means due)."""
+        st = self.state.get(key)
+        if not st:
+            return NEW_SCORE
+        return (now - st['last_fetched']) / self.interval(key, complete, now)
+
+    def select(self, records, key_fn, complete_fn, budget=0, now=None):
+        """Records that are due, most overdue first, at most `budget` of them (0 = no cap)."""
+        now = now or time.time()
+        scored = []
+        for rec in records:
+            key = key_fn(rec)
+            if not key:
+                continue
+            score = self.overdue(key, complete_fn(rec), now)
+            if score >= 1:
+                scored.append((score, rec))
+        scored.sort(key=lambda sr: sr[0], reverse=True)
+        due = [rec for _, rec in scored]
+        return due[:budget] if budget > 0 else due
+
+    def record_fetch(self, key, badge_count, changed=False, now=None):
+        now = now or time.time()
+        st = self.state.get(key)
+        if st is None:
+            st = self.state[key] = {'first_fetched': now, 'last_changed': None, 'badges': badge_count}
+        if st.get('first_fetched') is None:
+            st['first_fetched'] = now
+        st.pop('failures', None)
+        st.pop('dead', None)
+        if changed or st.get('badges') != badge_count:
+            st['last_changed'] = now
+        st['badges'] = badge_count
+        st['last_fetched'] = now
+
+    def record_failure(self, key, dead=False, now=None):
+        """A fetch that failed for good (after its retries), or found the profile gone when dead."""
+        now = now or time.time()
+        st = self.state.setdefault(key, {'first_fetched': None, 'last_changed': None, 'badges': None})
+        st['failures'] = st.get('failures', 0) + 1
+        st['dead'] = dead
+        st['last_fetched'] = now
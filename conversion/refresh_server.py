@@ -1,48 +1,460 @@
 #!/usr/bin/env python3
 """
 Simple Flask server to trigger the scraper when refresh is clicked on the site.
+
+A refresh runs as a background job inside this process (scrape_profiles.run
+on a worker thread), so POST /refresh returns a job id immediately. A refresh
+of a cohort that is already queued or running joins that job instead of
+starting another, however many tabs or cron jobs ask, and jobs for different
+cohorts run one after another, so at most one scraper crawls at a time.
+Every run shares one single_flight.SingleFlight, so a profile fetched in the
+last --fresh-for seconds (by any cohort's run) is not fetched again.
+
+Endpoints:
+  POST /refresh?cohort=<name>&wait=<s>
+                              start a refresh of a cohort (default: the first), or join
+                              the one queued or running; with wait, answer once the
+                              job has finished (or after that many seconds)
+  POST /refresh/<profile>?cohort=<name>
+                              refresh one student now, by profile id or full name,
+                              and patch their record into data.json's delta log
+  GET  /jobs                  recent jobs
+  GET  /jobs/<id>             status, progress (done/total, errors, ETA)
+  GET  /jobs/<id>/events      server-sent events: log lines and progress
+  GET  /jobs/<id>/report      the job's run report (timings, histograms, bottleneck)
+  GET  /data/delta?since=<v>&cohort=<name>
+                              records of a cohort (default: the first) changed
+                              since delta version v
+  GET  /cohorts/<name>/delta?since=<v>
+                              the same, by cohort path
+  GET  /cohorts               every cohort's size, completions and delta version
+  GET  /cohorts/<name>/leaderboard?sort=courses&q=<name prefix>&page=1&per_page=50
+                              one page of a cohort's precomputed ranking (see
+                              leaderboard.py), with an ETag for If-None-Match
+  GET  /metrics               Prometheus metrics for every run since the server started
+                              (?format=json: the current or last run's report)
 """
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import subprocess
-import sys
+import argparse
+import json
 import os
+import threading
+import time
+import uuid
+
+import crawl_metrics
+import data_writer
+import scrape_profiles
+from leaderboard import DEFAULT_SORT, SORTS, Leaderboard
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for localhost requests
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'main', 'data.json')
+SCRAPER_ARGS = []  # extra scrape_profiles options for every refresh (see --help)
+COHORTS = {}  # leaderboard cohort name -> data.json path (--cohort); default: main -> DATA_PATH
+MAX_JOBS_KEPT = 20
+DEFAULT_FRESH_FOR = 600  # seconds a fetched profile is reused by later runs (--fresh-for)
+FLUSH_AFTER = 60  # seconds after a single-profile refresh before data.json is rewritten with it
+
+# every run and single-profile refresh shares one; replaced from --fresh-for when run as a script
+scrape_profiles.FLIGHTS = SingleFlight(DEFAULT_FRESH_FOR)
+# refresh jobs reuse the cohort loaded by the previous job while its file is unchanged
+scrape_profiles.WARM = {}
+
+
+class RefreshJob:
+    """One scraper run: state, progress counters and its log, guarded by a condition."""
+
+    def __init__(self, cohort='main'):
+        self.id = uuid.uuid4().hex[:12]
+        self.cohort = cohort
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = 0
+        self.total = 0
+        self.errors = 0
+        self.logs = []
+        self.summary = None
+        self.report = None
+        self.error = None
+        self.seq = 0  # bumped on every change so event streams know to wake up
+        self.cond = threading.Condition()
+
+    def _changed(self):
+        self.seq += 1
+        self.cond.notify_all()
+
+    def log(self, line):
+        with self.cond:
+            self.logs.append(str(line))
+            self._changed()
+
+    def progress(self, done, total, errors):
+        with self.cond:
+            self.done, self.total, self.errors = done, total, errors
+            self._changed()
+
+    def set_status(self, status, error=None):
+        with self.cond:
+            self.status = status
+            self.error = error
+            if status == 'running':
+                self.started = time.time()
+            elif status in ('succeeded', 'failed'):
+                self.finished = time.time()
+            self._changed()
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (or timeout seconds). Returns True if it has."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.active, timeout)
+
+    def eta(self):
+        if self.status != 'running' or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self.started
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+    def to_dict(self, include_output=False):
+        d = {
+            'job_id': self.id,
+            'cohort': self.cohort,
+            'status': self.status,
+            'success': self.status == 'succeeded' if not self.active else None,
+            'done': self.done,
+            'total': self.total,
+            'errors': self.errors,
+            'eta_seconds': self.eta(),
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'summary': self.summary,
+            'error': self.error,
+        }
+        if include_output:
+            d['output'] = '\n'.join(self.logs)
+        return d
+
+    def run(self, argv):
+        self.set_status('running')
+        try:
+            args = scrape_profiles.parse_args(argv)
+            summary = scrape_profiles.run(args, log=self.log, progress=self.progress)
+            self.report = summary.pop('report', None)
+            self.summary = summary
+            sync_leaderboards()
+            self.set_status('succeeded')
+        except (Exception, SystemExit) as e:
+            # argparse reports bad options via SystemExit; KeyboardInterrupt still stops the server
+            self.log(f'Refresh failed: {e!r}')
+            self.set_status('failed', error=str(e) or type(e).__name__)
+
+
+_jobs = {}
+_current = {}  # cohort -> its queued or running job
+_last = None  # the job that ran most recently, for /metrics
+_jobs_lock = threading.Lock()
+_run_lock = threading.Lock()  # one scraper run at a time, whatever the cohort
+
+
+def _run_job(job, argv):
+    global _last
+    with _run_lock:
+        _last = job
+        job.run(argv)
+
+
+def start_refresh(argv, cohort='main'):
+    """Start a refresh job for a cohort, or return the one already queued or running. Returns (job, merged)."""
+    with _jobs_lock:
+        current = _current.get(cohort)
+        if current is not None and current.active:
+            return current, True
+        job = RefreshJob(cohort)
+        _jobs[job.id] = job
+        for old in sorted(_jobs.values(), key=lambda j: j.created)[:-MAX_JOBS_KEPT]:
+            if not old.active:
+                del _jobs[old.id]
+        _current[cohort] = job
+    threading.Thread(target=_run_job, args=(job, argv), name=f'refresh-{job.id}', daemon=True).start()
+    return job, False
+
+
+def refresh_argv(cohort, path):
+    # --resume picks up the journal of a run cut short by a server restart
+    argv = ['--input', path, '--output', path, '--incremental', '--resume']
+    if path != DATA_PATH:
+        # each cohort keeps its own refresh schedule, or one cohort's run would make shared students look fresh
+        argv += ['--schedule', os.path.join(os.path.dirname(scrape_profiles.DEFAULT_SCHEDULE_PATH),
+                                            f'schedule.{cohort}.json')]
+    return argv + SCRAPER_ARGS
+
+
 @app.route('/refresh', methods=['POST'])
 def refresh_data():
-    """Run the scraper and return results"""
+    """Start (or join) a background refresh of a cohort and return its job id"""
+    paths = cohort_paths()
+    cohort = request.args.get('cohort') or next(iter(paths))
+    path = paths.get(cohort)
+    if path is None:
+        return jsonify({'success': False, 'error': 'unknown cohort'}), 404
+    job, merged = start_refresh(refresh_argv(cohort, path), cohort)
+    wait = request.args.get('wait', type=float)
+    if wait:
+        job.wait(wait)
+    body = job.to_dict()
+    body['merged'] = merged
+    if job.active:
+        body['success'] = True
+    return jsonify(body), 202 if job.active else 200
+
+
+_flush_timers = {}
+
+
+def schedule_flush(cohort, args):
+    """Write a cohort's single-profile patches into its data.json in FLUSH_AFTER seconds, in one rewrite."""
+    with _jobs_lock:
+        if cohort in _flush_timers:
+            return
+        timer = _flush_timers[cohort] = threading.Timer(FLUSH_AFTER, flush_patches, (cohort, args))
+    timer.daemon = True
+    timer.start()
+
+
+def flush_patches(cohort, args):
+    with _jobs_lock:
+        _flush_timers.pop(cohort, None)
+    # never alongside a refresh job, which rewrites the same file (and takes the patches in when it does)
+    with _run_lock:
+        if args.db:
+            if args.export:
+                from sqlite_store import SqliteStore
+                with SqliteStore(args.db) as store:
+                    store.export(args.export)
+        elif data_writer.pending(args.output):
+            scrape_profiles.load_data(args.output).save(args.output, key=scrape_profiles.record_key)
+
+
+@app.route('/refresh/<profile>', methods=['POST'])
+def refresh_profile(profile):
+    """Fetch one student now and patch their record, without a full refresh or a data.json rewrite"""
+    t0 = time.perf_counter()
+    paths = cohort_paths()
+    cohort = request.args.get('cohort') or next(iter(paths))
+    board = get_leaderboard(cohort)
+    if board is None:
+        return jsonify({'success': False, 'error': 'unknown cohort'}), 404
+    found = board.find(profile)
+    keys = sorted({scrape_profiles.record_key(board.records[pos]) for pos in found})
+    if len(keys) != 1:
+        if not keys:
+            return jsonify({'success': False, 'error': 'unknown profile'}), 404
+        return jsonify({'success': False, 'error': 'more than one student has this name', 'profiles': keys}), 409
+    key, rec = keys[0], board.records[found[0]]
+
+    # the same options as a refresh of this cohort, for --db/--export and --timeout
+    args = scrape_profiles.parse_args(refresh_argv(cohort, paths[cohort]))
+    # a profile fetched within --fresh-for (a repeat click, or a refresh run) is answered without fetching it
+    flights = scrape_profiles.FLIGHTS
+    hit = flights.recent(key)
+    if hit is not None:
+        result, age = hit
+    else:
+        age = None
+        result = flights.do(key, lambda: scrape_profiles.fetch_profile(scrape_profiles.entry_url(rec),
+                                                                        timeout=args.timeout))
+    if result.get('error'):
+        return jsonify({'success': False, 'profile': key, 'error': result['error']}), 502
+
+    store = None
+    if args.db:
+        from sqlite_store import SqliteStore
+        store = SqliteStore(args.db)
     try:
-        # Get the path to scrape_profiles.py
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        scraper_path = os.path.join(script_dir, 'scrape_profiles.py')
-        data_path = os.path.join(os.path.dirname(script_dir), 'main', 'data.json')
-        
-        # Run the scraper with default settings
-        result = subprocess.run(
-            [sys.executable, scraper_path, '--input', data_path, '--output', data_path],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
-        
-        return jsonify({
-            'success': result.returncode == 0,
-            'output': result.stdout,
-            'error': result.stderr if result.returncode != 0 else None
-        })
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            'success': False,
-            'error': 'Scraper timed out after 5 minutes'
-        }), 500
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        patched = scrape_profiles.patch_profile(args.export if store is not None else args.output, key,
+                                                [board.records[pos] for pos in found], result.get('badges', []),
+                                                store, log=app.logger.info)
+    finally:
+        if store is not None:
+            store.close()
+    if patched is not None:
+        schedule_flush(cohort, args)
+        board.sync()
+    return jsonify({'success': True, 'cohort': cohort, 'profile': key, 'cached': hit is not None,
+                    'age_seconds': age, 'updated': patched is not None,
+                    'version': patched[1] if patched else None, 'badges': len(result.get('badges', [])),
+                    'record': (patched[0] if patched else rec).to_dict(),
+                    'elapsed_ms': round((time.perf_counter() - t0) * 1000, 1)})
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Recent refresh jobs, newest first"""
+    with _jobs_lock:
+        jobs = sorted(_jobs.values(), key=lambda j: j.created, reverse=True)
+    return jsonify([j.to_dict() for j in jobs])
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status and progress of one refresh job"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'unknown job'}), 404
+    return jsonify(job.to_dict(include_output=not job.active))
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a job's log lines and progress as server-sent events"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'unknown job'}), 404
+
+    def stream():
+        sent_logs = 0
+        seen = -1
+        while True:
+            with job.cond:
+                job.cond.wait_for(lambda: job.seq != seen, timeout=15)
+                if job.seq == seen:
+                    lines, state = [], None
+                else:
+                    seen = job.seq
+                    lines = job.logs[sent_logs:]
+                    sent_logs = len(job.logs)
+                    state = job.to_dict()
+            if state is None:
+                yield ': keep-alive\n\n'
+                continue
+            for line in lines:
+                yield f'event: log\ndata: {json.dumps(line)}\n\n'
+            yield f'event: progress\ndata: {json.dumps(state)}\n\n'
+            if state['status'] in ('succeeded', 'failed'):
+                yield f'event: done\ndata: {json.dumps(state)}\n\n'
+                return
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>/report', methods=['GET'])
+def job_report(job_id):
+    """Run report of a finished refresh job"""
+    job = _jobs.get(job_id)
+    if job is None or job.report is None:
+        return jsonify({'success': False, 'error': 'unknown job or no report yet'}), 404
+    return jsonify(job.report)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Scraper metrics: Prometheus text, or ?format=json for the current/last run report"""
+    job = _last
+    running = job is not None and job.status == 'running'
+    if request.args.get('format') == 'json':
+        if running:
+            return jsonify(crawl_metrics.ACTIVE.report(job_id=job.id, status=job.status))
+        if job is not None and job.report is not None:
+            return jsonify(job.report)
+        return jsonify({'success': False, 'error': 'no refresh has run yet'}), 404
+
+    # finished runs, plus the one in progress so counters move while it runs
+    snapshot = crawl_metrics.CrawlMetrics()
+    snapshot.merge(crawl_metrics.TOTAL)
+    if running:
+        snapshot.merge(crawl_metrics.ACTIVE)
+    lines = [snapshot.prometheus().rstrip('\n')]
+    if job is not None:
+        lines.append('# TYPE refresh_job_running gauge')
+        lines.append(f'refresh_job_running {int(running)}')
+        for name in ('done', 'total', 'errors'):
+            lines.append(f'# TYPE refresh_job_{name} gauge')
+            lines.append(f'refresh_job_{name} {getattr(job, name)}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/data/delta', methods=['GET'])
+def data_delta():
+    """A cohort's records changed since ?since=<version>, keyed by profile id"""
+    return cohort_delta(request.args.get('cohort') or next(iter(cohort_paths())))
+
+
+@app.route('/cohorts/<name>/delta', methods=['GET'])
+def cohort_delta(name):
+    """A cohort's records changed since ?since=<version>, keyed by profile id"""
+    path = cohort_paths().get(name)
+    if path is None:
+        return jsonify({'success': False, 'error': 'unknown cohort'}), 404
+    since = request.args.get('since', default=0, type=int)
+    return jsonify(data_writer.read_delta(path, since))
+
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+
+def cohort_paths():
+    return COHORTS or {'main': DATA_PATH}
+
+
+def get_leaderboard(name):
+    """The cohort's Leaderboard, brought up to date with its data.json, or None for an unknown cohort."""
+    path = cohort_paths().get(name)
+    if path is None:
+        return None
+    with _boards_lock:
+        board = _boards.get(name)
+        if board is None or board.path != path:
+            board = _boards[name] = Leaderboard(name, path)
+    board.sync()
+    return board
+
+
+def sync_leaderboards():
+    for name in cohort_paths():
+        get_leaderboard(name)
+
+
+@app.route('/cohorts', methods=['GET'])
+def list_cohorts():
+    """Every cohort served by the leaderboard API"""
+    return jsonify([get_leaderboard(name).stats() for name in cohort_paths()])
+
+
+@app.route('/cohorts/<name>/leaderboard', methods=['GET'])
+def cohort_leaderboard(name):
+    """One page of a cohort's ranking, sorted and filtered by name prefix"""
+    board = get_leaderboard(name)
+    if board is None:
+        return jsonify({'success': False, 'error': 'unknown cohort'}), 404
+    sort = request.args.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        return jsonify({'success': False, 'error': f"sort must be one of {', '.join(SORTS)}"}), 400
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=50, type=int)
+    # the ETag changes whenever the cohort does, so a repeat query can be answered without a body
+    if board.etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(board.etag)
+        return response
+    body = board.query(sort, request.args.get('q', '').strip(), page, per_page)
+    response = jsonify(body)
+    response.set_etag(body.pop('etag'))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -50,6 +462,25 @@ def health():
     return jsonify({'status': 'ok'})
 
 if __name__ == '__main__':
-    print("Starting refresh server on http://localhost:5001")
+    parser = argparse.ArgumentParser(description='Serve refresh jobs for the site',
+                                     epilog='Any other options are passed to scrape_profiles.py on each refresh, '
+                                            'e.g. --concurrency 20 --delay 0.5')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--data', default=DATA_PATH, help='data.json to refresh (default: main/data.json)')
+    parser.add_argument('--fresh-for', type=float, default=DEFAULT_FRESH_FOR,
+                        help='Seconds a fetched profile is reused instead of fetched again, across runs and cohorts '
+                             f'(default: {DEFAULT_FRESH_FOR})')
+    parser.add_argument('--cohort', action='append', default=[], metavar='NAME=PATH',
+                        help='Serve a leaderboard for this data.json (repeatable; default: main=--data)')
+    args, SCRAPER_ARGS = parser.parse_known_args()
+    DATA_PATH = os.path.abspath(args.data)
+    for spec in args.cohort:
+        name, sep, path = spec.partition('=')
+        if not sep or not name:
+            parser.error(f'--cohort expects NAME=PATH, got {spec!r}')
+        COHORTS[name] = os.path.abspath(path)
+    scrape_profiles.FLIGHTS = SingleFlight(args.fresh_for)
+
+    print(f"Starting refresh server on http://localhost:{args.port}")
     print("Make sure to keep this running while using the site!")
-    app.run(host='localhost', port=5001, debug=False)
+    app.run(host='localhost', port=args.port, debug=False, threaded=True)
@@ -0,0 +1,296 @@
+"""
+retry_policy.py
+
+Retries for failed profile fetches, run while the crawl is still going
+instead of serially after it, used by scrape_profiles.py.
+
+classify() sorts a failed fetch result into:
+
+  timeout    the request timed out                     retried with backoff
+  throttled  429 or 503; Retry-After is honoured       retried, trips the breaker
+  server     other 5xx                                 retried with backoff, trips the breaker
+  network    connection refused/reset                  retried with backoff, trips the breaker
+  parse      fetched, but badge extraction failed      retried once
+  dead       404/410: the profile no longer exists     not retried
+  client     any other 4xx                             not retried
+
+Retry delays grow exponentially with full jitter (a random wait between 0
+and base * 2**attempt, capped), so throttled workers don't come back in
+lockstep. When a 429/503 carries Retry-After the wait is at least that long,
+and a Retry-After beyond the cap gives up on the profile for this run.
+
+HostBreaker is shared by the crawl engine and the retries. It caps in-flight
+requests per host at an adaptive limit: throttling halves it (at most once
+per cooldown), a full window of successes raises it by one (up to --concurrency), and a run
+of consecutive failures opens the circuit so the host gets no requests at all
+until the cooldown (or its Retry-After) has passed. Dead and client errors
+say nothing about the host's load and count as neither.
+"""
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import crawl_metrics
+
+RETRYABLE = {'timeout': None, 'throttled': None, 'server': None, 'network': None, 'parse': 1}
+TRIPS_BREAKER = ('timeout', 'throttled', 'server', 'network')
+NEUTRAL = ('dead', 'client')  # neither raise nor lower a host's limit
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    import email.utils
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+def classify(result):
+    """Error kind of a failed fetch result (see the module docstring), or None if it succeeded."""
+    if result is None:
+        return 'network'
+    if not result.get('error'):
+        return None
+    if result.get('kind'):
+        return result['kind']
+    if result.get('timeout'):
+        return 'timeout'
+    status = result.get('status')
+    if status in (429, 503):
+        return 'throttled'
+    if status in (404, 410):
+        return 'dead'
+    if status and status >= 500:
+        return 'server'
+    if status and status >= 400:
+        return 'client'
+    return 'network'
+
+
+class RetryPolicy:
+    """How many times and how long to wait before retrying a failed fetch."""
+
+    def __init__(self, retries=3, base=0.5, cap=30.0, rng=None):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.rng = rng or random.Random()
+
+    def delay(self, kind, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up."""
+        if kind not in RETRYABLE or attempt > self.retries:
+            return None
+        limit = RETRYABLE[kind]
+        if limit is not None and attempt > limit:
+            return None
+        wait = self.rng.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        if retry_after is not None:
+            if retry_after > self.cap:
+                return None
+            wait = retry_after + self.rng.uniform(0, self.base)
+        return wait
+
+
+class HostBreaker:
+    """Per-host circuit breaker with an adaptive (AIMD) in-flight limit."""
+
+    def __init__(self, max_concurrency=10, failure_threshold=5, cooldown=5.0, max_pause=30.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_pause = max_pause
+        self.hosts = {}
+        self.trips = 0
+        self._cond = threading.Condition()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc.lower()
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {'limit': self.max_concurrency, 'in_flight': 0, 'failures': 0,
+                                        'successes': 0, 'open_until': 0.0, 'decreased': float('-inf'),
+                                        'min_limit': self.max_concurrency}
+        return state
+
+    def try_acquire(self, url):
+        """Take a request slot for url's host. Returns 0 on success, else seconds to wait before asking again."""
+        with self._cond:
+            state = self._host(url)
+            wait = state['open_until'] - time.monotonic()
+            if wait > 0:
+                return wait
+            if state['in_flight'] >= state['limit']:
+                return 0.05
+            state['in_flight'] += 1
+            return 0
+
+    def acquire(self, url):
+        t0 = None
+        while True:
+            wait = self.try_acquire(url)
+            if not wait:
+                break
+            t0 = t0 or time.perf_counter()
+            with self._cond:
+                self._cond.wait(wait)
+        if t0 is not None:
+            crawl_metrics.observe('wait', 'breaker', time.perf_counter() - t0)
+
+    def release(self, url, result):
+        """Give the slot back and adjust the host's limit from the fetch result."""
+        kind = classify(result)
+        with self._cond:
+            state = self._host(url)
+            state['in_flight'] -= 1
+            now = time.monotonic()
+            if kind in TRIPS_BREAKER:
+                state['failures'] += 1
+                state['successes'] = 0
+                if kind == 'throttled':
+                    # multiplicative decrease, at most once per cooldown so one burst counts once
+                    if now >= state['decreased'] + self.cooldown:
+                        state['limit'] = max(1, state['limit'] // 2)
+                        state['decreased'] = now
+                    retry_after = parse_retry_after((result or {}).get('retry_after'))
+                    if retry_after:
+                        state['open_until'] = max(state['open_until'], now + min(retry_after, self.max_pause))
+                if state['failures'] >= self.failure_threshold and state['open_until'] <= now:
+                    state['open_until'] = now + self.cooldown
+                    state['limit'] = max(1, state['limit'] // 2)
+                    state['failures'] = 0
+                    self.trips += 1
+                state['min_limit'] = min(state['min_limit'], state['limit'])
+            elif kind not in NEUTRAL:
+                state['failures'] = 0
+                state['successes'] += 1
+                # additive increase after a full window of successes
+                if state['successes'] >= state['limit'] and state['limit'] < self.max_concurrency:
+                    state['limit'] += 1
+                    state['successes'] = 0
+            self._cond.notify_all()
+
+    def summary(self):
+        with self._cond:
+            lowest = min((s['min_limit'] for s in self.hosts.values()), default=self.max_concurrency)
+            return f'Circuit breaker: {self.trips} trips, lowest per-host concurrency {lowest}/{self.max_concurrency}'
+
+
+class RetryScheduler:
+    """Runs retries of failed fetches in the background as soon as they are submitted.
+
+    fetch(url) performs one attempt and returns a fetch_profile-style result.
+    submit() queues a retry if the failure is retryable; drain() yields
+    (entry, result, None) for every submitted profile once it either
+    succeeded or ran out of retries.
+    """
+
+    def __init__(self, fetch, policy, breaker, workers=4, log=print):
+        from concurrent.futures import ThreadPoolExecutor
+        self.fetch = fetch
+        self.policy = policy
+        self.breaker = breaker
+        self.log = log
+        self.retried = 0
+        self.recovered = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._out = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='retry')
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name='retry-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def _schedule(self, entry, url, result, attempt):
+        kind = classify(result)
+        wait = self.policy.delay(kind, attempt, parse_retry_after(result.get('retry_after')))
+        if wait is None:
+            return False
+        crawl_metrics.observe('wait', 'backoff', wait)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + wait, next(self._seq), entry, url, attempt))
+            self._cond.notify()
+        return True
+
+    def submit(self, entry, url, result):
+        """Queue a retry of a failed fetch. Returns False if it should not be retried."""
+        with self._cond:
+            self._pending += 1
+        if self._schedule(entry, url, result, 1):
+            return True
+        with self._cond:
+            self._pending -= 1
+        return False
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._closed:
+                    return
+                _due, _seq, entry, url, attempt = heapq.heappop(self._heap)
+            self._pool.submit(self._attempt, entry, url, attempt)
+
+    def _attempt(self, entry, url, attempt):
+        self.breaker.acquire(url)
+        result = None
+        try:
+            result = self.fetch(url)
+        except Exception as e:
+            result = {'url': url, 'error': str(e), 'badges': []}
+        finally:
+            self.breaker.release(url, result)
+        with self._cond:
+            self.retried += 1
+        if result.get('error'):
+            if self._schedule(entry, url, result, attempt + 1):
+                return
+            self.log(f"Giving up on {url} after {attempt} retries ({classify(result)}): {result.get('error')}")
+        else:
+            with self._cond:
+                self.recovered += 1
+        self._finish(entry, result)
+
+    def _finish(self, entry, result):
+        self._out.put((entry, result, None))
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def drain(self):
+        """Yield every submitted profile's final result, then shut the scheduler down."""
+        try:
+            while True:
+                # checked first, so a run with nothing to retry doesn't sit out the timeout
+                with self._cond:
+                    if self._pending == 0 and self._out.empty():
+                        return
+                try:
+                    yield self._out.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+
+    def summary(self):
+        return f'Retries: {self.retried} attempts, {self.recovered} profiles recovered'
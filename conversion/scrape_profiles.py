@@ -16,29 +16,101 @@ changes without writing the output file.
 Usage examples:
   python conversion/scrape_profiles.py --input main/data.json --output main/data.json
   python conversion/scrape_profiles.py --input main/data.json --dry-run --delay 1.5
+  python conversion/scrape_profiles.py --mode async --concurrency 20 --rate 10
 
 Notes:
  - Be respectful: default delay=1.0s between requests and optional concurrency.
+ - --mode async (see async_crawl.py) reuses keep-alive connections and paces
+   requests with a per-host token bucket (--rate/--burst) instead of --delay.
+ - --shard i/N crawls a stable, hash-based subset of the cohort, so several
+   processes or machines can split a refresh; merge_shards.py combines them.
+ - Results are journaled as they arrive (see crawl_journal.py): a run that is
+   killed or stopped by --time-limit continues where it left off with --resume.
+ - --worker keeps one process up and runs a command line per line of stdin,
+   so the cohort, parsers and connections stay warm between refreshes
+   (refresh_server.py does the same in-process).
  - If you want me to run this against your dataset now, tell me and I'll run
    it here (it will make outbound HTTP requests).
 """
 import argparse
+import contextlib
+import functools
+import hashlib
+import importlib.util
 import json
+import os
 import re
+import shlex
 import sys
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from html import escape
 
-try:
-    import requests
-    from bs4 import BeautifulSoup
-except Exception:
+# requests and bs4 are most of this module's import time, and bs4 only runs when
+# the fast extractor can't read a page; they are imported where first used
+if importlib.util.find_spec('requests') is None or importlib.util.find_spec('bs4') is None:
     print("Missing dependencies. Install with: pip install -r conversion/requirements.txt", file=sys.stderr)
-    raise
+    raise ModuleNotFoundError('requests and beautifulsoup4 are required')
+
+import crawl_metrics
+import data_writer
+import fast_extract
+import record_store
+from page_archive import DEFAULT_ARCHIVE_PATH
+# the record helpers are re-exported for callers that know them from here
+from record_store import (ProfileIndex, RecordStore, StudentRecord, apply_badges, build_profile_index,  # noqa: F401
+                          delta_key, entry_url, profile_key, record_key)
+from retry_policy import RETRYABLE, HostBreaker, RetryPolicy, RetryScheduler, classify
+
+# Parser backend for extract_badges_from_html: 'lxml', 'selectolax' or 'bs4'
+PARSER_BACKEND = fast_extract.default_backend()
+
+# page_archive.PageArchive keeping every fetched page body (--archive), or None
+ARCHIVE = None
+
+# single_flight.SingleFlight shared by every run in this process (refresh_server.py), or None for one per run
+FLIGHTS = None
+
+# path -> (stamp, RecordStore, its ProfileIndex or None until needed) kept loaded between runs by a
+# long-lived process (refresh_server.py, --worker), or None to load the file every run; see load_data
+WARM = None
+_warm_lock = threading.Lock()
+
+BADGE_CONTAINER_RES = [re.compile(pat, re.I) for pat in (r'badg', r'skill-badg', r'badge-list', r'badges-list',
+                                                          r'public-profile__badges', r'profile-badges')]
+BRACKETED_BADGE_RE = re.compile(r"([A-Za-z0-9\-:,() '&]+\[Skill Badge\])")
+
+
+def extract_badges_timed(text, backend=None):
+    """extract_badges_from_html without recording metrics: returns (badges, strategy, seconds).
+
+    strategy is the fast backend that read the page, 'bs4' when bs4 was
+    chosen, or 'bs4-fallback' when the fast backend could not read it.
+    """
+    backend = backend or PARSER_BACKEND
+    t0 = time.perf_counter()
+    strategy = 'bs4'
+    if backend != 'bs4':
+        badges = fast_extract.extract(text, backend)
+        if badges:
+            return badges, backend, time.perf_counter() - t0
+        strategy = 'bs4-fallback'
+    return extract_badges_bs4(text), strategy, time.perf_counter() - t0
+
+
+def extract_badges_from_html(text, backend=None):
+    """Extract skill badge names from a profile page.
+
+    The fast backend (see fast_extract.py) handles the usual
+    '.profile-badges .profile-badge' markup in one pass; anything else falls
+    back to the BeautifulSoup heuristics in extract_badges_bs4.
+    """
+    badges, strategy, seconds = extract_badges_timed(text, backend)
+    crawl_metrics.observe('parse', strategy, seconds)
+    return badges
 
 
-def extract_badges_from_html(text):
+def extract_badges_bs4(text):
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(text, "html.parser")
     badges = []
 
@@ -73,7 +145,7 @@ def extract_badges_from_html(text):
 
         if title:
             # normalize badge name and attach [Skill Badge] for compatibility with existing data
-            bnorm = re.sub(r'\s+', ' ', title).strip()
+            bnorm = fast_extract.WS_RE.sub(' ', title).strip()
             if earned:
                 # Optionally include earned date in parentheses to preserve that info
                 bnorm = f"{bnorm} [Skill Badge]"
@@ -88,10 +160,9 @@ def extract_badges_from_html(text):
         return badges
 
     # Primary strategy: find explicit badge containers by class name patterns and extract list items / anchors inside them.
-    container_class_patterns = [r'badg', r'skill-badg', r'badge-list', r'badges-list', r'public-profile__badges', r'profile-badges']
     containers = []
-    for pat in container_class_patterns:
-        containers.extend(soup.find_all(class_=re.compile(pat, re.I)))
+    for pat in BADGE_CONTAINER_RES:
+        containers.extend(soup.find_all(class_=pat))
 
     for cont in containers:
         for el in cont.find_all(['a', 'li', 'div', 'span'], recursive=True):
@@ -103,7 +174,7 @@ def extract_badges_from_html(text):
             href = el.get('href', '') if el.name == 'a' else ''
             # Accept if it explicitly looks like a skill badge: contains '[Skill Badge]' or 'skill badge' or the anchor points to a badge-like path
             if '[Skill Badge]' in txt or 'skill badge' in txt.lower() or '/badges' in href or '/quests' in href or '/skill' in href:
-                bnorm = re.sub(r'\s+', ' ', txt).strip()
+                bnorm = fast_extract.WS_RE.sub(' ', txt).strip()
                 if bnorm and bnorm not in seen:
                     seen.add(bnorm)
                     badges.append(bnorm)
@@ -117,13 +188,13 @@ def extract_badges_from_html(text):
         if is_negative_phrase(txt):
             continue
         if '/badges' in href or 'badge' in href.lower() or '/quests' in href:
-            bnorm = re.sub(r'\s+', ' ', txt).strip()
+            bnorm = fast_extract.WS_RE.sub(' ', txt).strip()
             if bnorm and bnorm not in seen:
                 seen.add(bnorm)
                 badges.append(bnorm)
 
     # Tertiary fallback: regex for bracketed badge names (rare but useful)
-    for m in re.finditer(r"([A-Za-z0-9\-:,() '&]+\[Skill Badge\])", text):
+    for m in BRACKETED_BADGE_RE.finditer(text):
         b = m.group(1).strip()
         if is_negative_phrase(b):
             continue
@@ -134,199 +205,756 @@ def extract_badges_from_html(text):
     return badges
 
 
-def fetch_profile(url, timeout=15):
-    headers = {
+HEADERS = {
     'User-Agent': 'GDSC-Bennett-Completion-Tracker-Bot/1.0 (+https://github.com/Chitresh-code)'
-    }
+}
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'fetch_cache.json')
+DEFAULT_SCHEDULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'schedule.json')
+
+def shard_of(key, shards):
+    """0-based shard of a profile key: a stable hash, so every machine agrees without coordinating."""
+    if not key:
+        return 0
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def parse_shard(value):
+    """argparse type for --shard i/N (1 <= i <= N)."""
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
-        r.raise_for_status()
-    except Exception as e:
-        return {'url': url, 'error': str(e), 'badges': []}
+        index, shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected i/N, got {value!r}')
+    if not 1 <= index <= shards:
+        raise argparse.ArgumentTypeError(f'shard {index} is not between 1 and {shards}')
+    return index, shards
+
+
+def shard_path(path, index, shards):
+    """Per-shard variant of a file: data.json -> data.shard-2-of-4.json."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.shard-{index}-of-{shards}{ext}'
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_data(path, warm=False):
+    """RecordStore.load, plus any single-profile patches not yet written to path (see data_writer.patch_data).
+
+    With warm and WARM set, the store loaded by an earlier run is handed out
+    again while path is unchanged; new pending patches are applied to it in
+    place. Whoever changes its records must forget_data(path), and may
+    remember_data once they are saved.
+    """
+    if not warm or WARM is None:
+        return record_store.load_data(path)
+    stamp = _file_stamp(path), _file_stamp(data_writer.delta_path(path))
+    with _warm_lock:
+        cached = WARM.get(path)
+        if cached is not None and stamp[0] is not None and cached[0][0] == stamp[0]:
+            data, index = cached[1], cached[2]
+            # patches only ever raise counts, so applying them all again is harmless; the
+            # records they replace are new objects, which the index would not know
+            if cached[0][1] != stamp[1] and data.apply_pending(path, record_key):
+                index = None
+        else:
+            data, index = record_store.load_data(path), None
+        WARM[path] = stamp, data, index
+        return data
 
-    badges = extract_badges_from_html(r.text)
-    return {'url': url, 'badges': badges}
 
+def remember_data(path, data):
+    """Keep data, just saved to path, for the next load_data(path, warm=True)."""
+    if WARM is not None:
+        # under LOG_LOCK so no patch lands between the save and the stamp
+        with data_writer.LOG_LOCK, _warm_lock:
+            WARM[path] = (_file_stamp(path), _file_stamp(data_writer.delta_path(path))), data, None
 
-def worker(entry, timeout=15, delay=1.0):
-    url = entry.get('Google Cloud Skills Boost Profile URL') or entry.get('Profile URL')
+
+def forget_data(path):
+    if WARM is not None:
+        with _warm_lock:
+            WARM.pop(path, None)
+
+
+def find_profiles(path, data, query):
+    """[(profile id, record)] for a profile id or URL, or else a full name (any case), in data.json order.
+
+    The ProfileIndex behind the lookup is built once per warm load of path
+    (see load_data), so repeated --profile calls in one process don't scan
+    the cohort.
+    """
+    with _warm_lock:
+        cached = WARM.get(path) if WARM is not None else None
+        if cached is None or cached[1] is not data:
+            return ProfileIndex(data).find(query)
+        if cached[2] is None:
+            cached = WARM[path] = cached[0], data, ProfileIndex(data)
+        return cached[2].find(query)
+
+
+def is_complete(record):
+    """Business rule: >=19 skill badges AND >=1 arcade game."""
+    return record.is_complete()
+
+
+# keep-alive sessions not in use; they outlive the worker threads of a run, so the
+# next run in the same process (refresh_server.py, --worker) reuses their connections
+_idle_sessions = []
+_sessions_lock = threading.Lock()
+MAX_IDLE_SESSIONS = 64
+
+
+@contextlib.contextmanager
+def pooled_session():
+    """Borrow a keep-alive requests.Session, instrumented by crawl_metrics, for one thread at a time."""
+    with _sessions_lock:
+        session = _idle_sessions.pop() if _idle_sessions else None
+    if session is None:
+        import requests
+        session = crawl_metrics.instrument_session(requests.Session())
+    try:
+        yield session
+    finally:
+        with _sessions_lock:
+            if len(_idle_sessions) < MAX_IDLE_SESSIONS:
+                _idle_sessions.append(session)
+                session = None
+        if session is not None:
+            session.close()
+
+
+def fetch_page(url, timeout=15, cache=None, session=None):
+    """Download a profile page without parsing it.
+
+    Returns {'url', 'badges', 'cached'} when the cache already knows the
+    page, {'url', 'text', 'headers', 'digest'} when it still has to be
+    parsed (see finish_page), or {'url', 'error', 'badges': [], 'status',
+    'retry_after', 'timeout'} on failure.
+    """
+    if session is None:
+        with pooled_session() as session:
+            return fetch_page(url, timeout, cache, session)
+    import requests
+    headers = dict(HEADERS)
+    if cache is not None:
+        headers.update(cache.conditional_headers(url))
+    crawl_metrics.take_connection_timings()
+    t0 = time.perf_counter()
+    t_headers = None
+    try:
+        # stream so the time to the response headers and the body download are timed apart
+        r = session.get(url, headers=headers, timeout=timeout, stream=True)
+        t_headers = time.perf_counter()
+        if r.status_code != 304:
+            r.raise_for_status()
+        body = r.content
+    except Exception as e:
+        # status/retry_after/timeout let retry_policy.classify() decide whether to retry
+        response = getattr(e, 'response', None)
+        if response is not None:
+            response.close()
+        result = {'url': url, 'error': str(e), 'badges': [],
+                  'status': response.status_code if response is not None else None,
+                  'retry_after': response.headers.get('Retry-After') if response is not None else None,
+                  'timeout': isinstance(e, requests.Timeout)}
+        _record_fetch(t0, t_headers, 0, classify(result))
+        return result
+
+    received = r.raw.tell() if hasattr(r.raw, 'tell') else len(body)
+    if ARCHIVE is not None and r.status_code == 200:
+        ARCHIVE.add(url, body, r.encoding)
+    digest = None
+    if cache is not None:
+        badges, digest = cache.check(url, r.status_code, body)
+        if badges is not None:
+            _record_fetch(t0, t_headers, received, 'not_modified' if r.status_code == 304 else 'unchanged')
+            return {'url': url, 'badges': badges, 'cached': True}
+    if r.status_code == 304:
+        _record_fetch(t0, t_headers, received, 'stale')
+        if cache is None:
+            return {'url': url, 'error': '304 Not Modified for an unconditional request', 'badges': [],
+                    'status': 304, 'retry_after': None, 'timeout': False}
+        # nothing cached to reuse: the whole page again, without validators, and it isn't cached (digest None)
+        return fetch_page(url, timeout, None, session)
+    _record_fetch(t0, t_headers, received, 'ok')
+    return {'url': url, 'text': r.text, 'headers': r.headers, 'digest': digest}
+
+
+def _record_fetch(t0, t_headers, received, outcome):
+    end = time.perf_counter()
+    setup = 0.0
+    for phase, seconds in crawl_metrics.take_connection_timings().items():
+        crawl_metrics.observe('fetch', phase, seconds)
+        setup += seconds
+    if t_headers is not None:
+        crawl_metrics.observe('fetch', 'ttfb', max(0.0, t_headers - t0 - setup))
+        crawl_metrics.observe('fetch', 'download', end - t_headers)
+    crawl_metrics.observe('fetch', 'total', end - t0)
+    crawl_metrics.inc('bytes', amount=received)
+    crawl_metrics.inc('requests', outcome)
+
+
+def finish_page(page, badges, cache=None):
+    """Turn a fetched page plus its extracted badges into a fetch_profile result."""
+    if cache is not None and page['digest'] is not None:
+        cache.store(page['url'], page['headers'], page['digest'], badges)
+    return {'url': page['url'], 'badges': badges}
+
+
+def fetch_profile(url, timeout=15, cache=None, session=None):
+    page = fetch_page(url, timeout=timeout, cache=cache, session=session)
+    if 'text' not in page:
+        return page
+    try:
+        badges = extract_badges_from_html(page['text'])
+    except Exception as e:
+        return {'url': url, 'error': f'parse failed: {e}', 'badges': [], 'kind': 'parse'}
+    return finish_page(page, badges, cache)
+
+
+def patch_profile(path, key, records, badges, store=None, log=print):
+    """Apply one profile's freshly fetched badges without rewriting data.json.
+
+    records are every record listing the profile, in data.json order. The
+    updated records go to the SQLite store, if given, and are logged as a
+    pending patch of path (a data.json, may be None with a store), which
+    readers and the frontend delta pick up at once; the next save writes it
+    into the file. Returns (first updated record, delta version), or None if
+    the badges add nothing.
+    """
+    patches = {}
+    for i, rec in enumerate(records):
+        updated = StudentRecord.from_dict(rec.to_dict())
+        if apply_badges(updated, badges, label='Refresh', log=log):
+            patches[delta_key(key, i)] = updated
+    if not patches:
+        return None
+    if store is not None and key in patches:
+        # the store keeps a profile's later rows by position, so (None, rec) can only update the first
+        store.write([(None, patches[key])], 'profile')
+    version = data_writer.patch_data(path, {k: rec.to_dict() for k, rec in patches.items()}) if path else None
+    return next(iter(patches.values())), version
+
+
+def gated(fetch, breaker):
+    """Wrap a fetch_page/fetch_profile-style function so each call holds a slot of a retry_policy.HostBreaker."""
+    if breaker is None:
+        return fetch
+
+    def fetch_gated(url, **kwargs):
+        breaker.acquire(url)
+        result = None
+        try:
+            result = fetch(url, **kwargs)
+            return result
+        finally:
+            breaker.release(url, result)
+    return fetch_gated
+
+
+def worker(entry, timeout=15, delay=1.0, cache=None, breaker=None, get_url=entry_url):
+    url = get_url(entry)
     if not url:
         return (entry, None, 'no-url')
-    result = fetch_profile(url, timeout=timeout)
-    time.sleep(delay)
+    result = gated(fetch_profile, breaker)(url, timeout=timeout, cache=cache)
+    with crawl_metrics.waiting('delay'):
+        time.sleep(delay)
     return (entry, result, None)
 
 
-def main():
+def crawl_threaded(entries, concurrency=10, timeout=15, delay=1.0, cache=None, breaker=None, get_url=entry_url):
+    """Thread-pool crawl: yield (entry, result, err) as each worker finishes."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        futures = [ex.submit(worker, entry, timeout, delay, cache, breaker, get_url) for entry in entries]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+def crawl_pipeline(entries, fetchers=10, parsers=None, queue_depth=64, timeout=15, delay=1.0, cache=None,
+                   stats=None, breaker=None, get_url=entry_url):
+    """Fetch/parse pipeline (see pipeline.py): yield (entry, result, err) as results arrive."""
+    import pipeline
+
+    def finish_timed(page, parsed, cache=None):
+        # parser processes can't record into this process's metrics, so they return their timing
+        badges, strategy, seconds = parsed
+        crawl_metrics.observe('parse', strategy, seconds)
+        return finish_page(page, badges, cache)
+
+    return pipeline.iter_pipeline(entries, get_url, gated(fetch_page, breaker), finish_timed,
+                                  functools.partial(extract_badges_timed, backend=PARSER_BACKEND),
+                                  fetchers=fetchers, parsers=parsers, queue_depth=queue_depth,
+                                  timeout=timeout, delay=delay, cache=cache, stats=stats)
+
+
+def crawl_async(entries, concurrency=10, timeout=15, rate=10.0, burst=10, cache=None, breaker=None,
+                get_url=entry_url):
+    """asyncio crawl (see async_crawl.py): yield (entry, result, err) as results arrive."""
+    import async_crawl
+    return async_crawl.iter_crawl(entries, get_url, extract_badges_from_html, headers=HEADERS,
+                                  concurrency=concurrency, rate=rate, burst=burst, timeout=timeout,
+                                  cache=cache, breaker=breaker, archive=ARCHIVE)
+
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Crawl Cloud Skills Boost profiles and update badge counts in JSON')
     parser.add_argument('--input', '-i', default='main/data.json')
     parser.add_argument('--output', '-o', default='main/data.json')
-    parser.add_argument('--concurrency', '-c', type=int, default=10)
-    parser.add_argument('--delay', '-d', type=float, default=1.0, help='Delay (s) between requests per worker')
+    parser.add_argument('--mode', choices=['threads', 'async', 'pipeline'], default='threads',
+                        help='Crawl engine: thread pool with per-worker delay, asyncio with a shared connection pool, '
+                             'or fetcher threads feeding a process pool of parsers')
+    parser.add_argument('--concurrency', '-c', type=int, default=10, help='Worker threads / in-flight requests')
+    parser.add_argument('--delay', '-d', type=float, default=1.0, help='Delay (s) between requests per worker (threads/pipeline mode)')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parser processes, 0 = one per CPU (pipeline mode)')
+    parser.add_argument('--queue-depth', type=int, default=64, help='Fetched pages waiting for a parser (pipeline mode)')
+    parser.add_argument('--rate', type=float, default=10.0, help='Requests per second per host, 0 = unlimited (async mode)')
+    parser.add_argument('--burst', type=int, default=10, help='Token bucket burst size per host (async mode)')
     parser.add_argument('--timeout', type=int, default=15)
-    parser.add_argument('--retries', '-r', type=int, default=1, help='Number of retry attempts for failed fetches (default 1)')
+    parser.add_argument('--retries', '-r', type=int, default=1,
+                        help='Retries per failed fetch, run with backoff during the crawl (see retry_policy.py; default 1)')
     parser.add_argument('--dry-run', action='store_true', help='Do not write output file; just show changes')
     parser.add_argument('--max', type=int, default=0, help='Maximum number of profiles to process (0 = all)')
-    args = parser.parse_args()
-
-    with open(args.input, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    print(f'Loaded {len(data)} records from {args.input}')
-
-    to_process = data if args.max <= 0 else data[:args.max]
+    parser.add_argument('--backups', type=int, default=5, help='Timestamped backups of the output to keep (0 = none)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch profiles whose staleness budget has expired (see refresh_schedule.py)')
+    parser.add_argument('--budget', type=int, default=0,
+                        help='Fetch at most N profiles this run, most overdue first (implies --incremental)')
+    parser.add_argument('--schedule', default=DEFAULT_SCHEDULE_PATH,
+                        help='Per-profile fetch/change times (default: conversion/.cache/schedule.json)')
+    parser.add_argument('--parser', choices=['lxml', 'selectolax', 'bs4'], default=PARSER_BACKEND,
+                        help=f'Badge extractor backend (default: {PARSER_BACKEND})')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Conditional-GET cache file (default: conversion/.cache/fetch_cache.json)')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch and parse every profile, ignoring the cache')
+    parser.add_argument('--cache-max-entries', type=int, default=50000)
+    parser.add_argument('--cache-max-age', type=float, default=168, help='Drop cache entries not validated for this many hours')
+    parser.add_argument('--archive', nargs='?', const=DEFAULT_ARCHIVE_PATH,
+                        help='Keep every fetched page, compressed and deduplicated, in this pack file for '
+                             'page_archive.py reparse (default: conversion/.cache/pages.pack)')
+    parser.add_argument('--fresh-for', type=float, default=0,
+                        help='Reuse a profile result fetched less than this many seconds ago instead of fetching it '
+                             'again (see single_flight.py; refresh_server.py sets its own for every run)')
+    parser.add_argument('--report', help='Write a JSON run report (timings, histograms, bottleneck; see crawl_metrics.py) here')
+    parser.add_argument('--journal', help='Progress journal (default: next to --output, e.g. main/data.journal.jsonl)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Replay the journal of an unfinished run and only fetch the profiles it is missing')
+    parser.add_argument('--time-limit', type=float, default=0,
+                        help='Stop starting new fetches after this many seconds; the journal keeps the progress '
+                             'for the next --resume (0 = no limit)')
+    parser.add_argument('--db', help='Read the cohort from and write changes to this SQLite store instead of '
+                                     '--input/--output (see sqlite_store.py)')
+    parser.add_argument('--export', help='With --db, also write data.json (and its delta log) here after the run')
+    parser.add_argument('--profile', metavar='ID|URL|NAME',
+                        help='Refresh just this student now (profile id, profile URL or full name) and patch their '
+                             'record into --output (or --db/--export) without rewriting the file')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help='Crawl only shard i of N (by profile id hash) and write it to its own file next to '
+                             '--output, e.g. data.shard-1-of-4.json; combine them with merge_shards.py')
+    parser.add_argument('--worker', action='store_true',
+                        help='Stay up and run one command line (these options, without --worker) per line of stdin, '
+                             'keeping the cohort, parsers and connections warm; prints a JSON summary per line')
+    args = parser.parse_args(argv)
+
+    if args.profile and args.shard:
+        parser.error('--profile refreshes one student; it cannot be combined with --shard')
+    if args.db and args.shard:
+        parser.error('--shard writes shard files for merge_shards.py; it cannot be combined with --db')
+    if args.export and not args.db:
+        parser.error('--export needs --db')
+    if args.shard:
+        # local shard processes must not overwrite each other's cache and schedule
+        if args.cache == DEFAULT_CACHE_PATH:
+            args.cache = shard_path(args.cache, *args.shard)
+        if args.schedule == DEFAULT_SCHEDULE_PATH:
+            args.schedule = shard_path(args.schedule, *args.shard)
+        if args.archive == DEFAULT_ARCHIVE_PATH:
+            args.archive = shard_path(args.archive, *args.shard)
+
+    if args.parser != 'bs4' and args.parser not in fast_extract.available_backends():
+        parser.error(f'parser backend {args.parser!r} is not installed')
+    return args
+
+
+def run(args, log=print, progress=None):
+    """Crawl and update args.input -> args.output. Returns a summary dict.
+
+    log receives every status line (print by default); progress, if given, is
+    called as progress(done, total, errors) after each profile so callers
+    such as refresh_server.py can report how far a run has got.
+    """
+    global PARSER_BACKEND, ARCHIVE
+    PARSER_BACKEND = args.parser
+    metrics = crawl_metrics.start_run()
+
+    store = None
+    if args.db:
+        from sqlite_store import SqliteStore
+        store = SqliteStore(args.db)
+        data = store.load()
+        log(f'Loaded {len(data)} records from {args.db}')
+    else:
+        data = load_data(args.input, warm=True)
+        log(f'Loaded {len(data)} records from {args.input}')
+    output = args.db or args.output
+    if args.shard:
+        shard, shards = args.shard
+        cohort = len(data)
+        data = RecordStore(rec for rec in data if shard_of(profile_key(entry_url(rec)), shards) == shard - 1)
+        output = shard_path(args.output, shard, shards)
+        log(f'Shard {shard}/{shards}: {len(data)} of {cohort} records, writing {output}')
+    index = ProfileIndex(data).by_key  # profile_key -> every record listing that profile
+
+    cache = None
+    if not args.no_cache:
+        from fetch_cache import FetchCache
+        cache = FetchCache(args.cache, args.cache_max_entries, args.cache_max_age * 3600)
+    if args.archive:
+        from page_archive import PageArchive
+        ARCHIVE = PageArchive(args.archive)
 
     updated = 0
     errors = 0
+    dead = 0
     failed_fetches = []  # list of tuples: (entry, url, error_msg)
+    changed_records = {}  # delta_key -> record, for the frontend delta
+    applied = set()  # profile keys whose result has been applied to all their records
+    schedule = None
+
+    def apply_result(entry, result, label, fetched_at=None):
+        nonlocal updated, dead
+        url = result.get('url')
+        applied.add(profile_key(url))
+        if result.get('error'):
+            kind = classify(result)
+            if kind == 'dead':
+                dead += 1
+            failed_fetches.append((entry, url, f"{kind}: {result.get('error')}"))
+            if schedule is not None:
+                # backs off, so broken profiles don't come first again next run
+                schedule.record_failure(profile_key(url), dead=kind == 'dead', now=fetched_at)
+            return
+
+        badges = result.get('badges', [])
+        matched = index.get(profile_key(url))
+        if not matched:
+            log(f'Warning: fetched {url} but no matching record found in input')
+            return
+
+        # a profile listed twice gets the result in every record that lists it
+        changed = [(i, rec) for i, rec in enumerate(matched) if apply_badges(rec, badges, label=label, log=log)]
+        if changed:
+            if not updated and store is None:
+                # the warm copy (see load_data) no longer matches the file
+                forget_data(args.input)
+            updated += len(changed)
+            for i, rec in changed:
+                changed_records[delta_key(profile_key(url), i)] = rec.to_dict()
+        if schedule is not None:
+            schedule.record_fetch(profile_key(url), len(badges), bool(changed), now=fetched_at)
+
+    if args.incremental or args.budget > 0:
+        from refresh_schedule import RefreshSchedule
+        # loaded before the journal is replayed, so results restored by --resume are scheduled too
+        schedule = RefreshSchedule(args.schedule)
+
+    # every final result goes to the journal before it is applied, so a killed run can --resume
+    journal = None
+    finished = set()
+    if not args.dry_run:
+        from crawl_journal import CrawlJournal, journal_path
+        journal = CrawlJournal(args.journal or journal_path(output))
+        if args.resume:
+            replayed = journal.replay()
+            for key, item in replayed.items():
+                if item.get('error') and item.get('kind') in RETRYABLE:
+                    continue  # fetch it again
+                result = {'url': item['url'], 'badges': item['badges'], 'error': item.get('error'),
+                          'kind': item.get('kind')}
+                apply_result(index.get(key, [None])[0], result, 'Update (journal)', item.get('time'))
+                finished.add(key)
+            log(f'Resuming from {journal.path}: {len(finished)} profiles already done')
+        elif journal.exists():
+            log(f'Discarding the journal of an unfinished run ({journal.path}); use --resume to continue it')
+        journal.open(resume=args.resume)
+    elif args.resume:
+        log('--resume is ignored with --dry-run')
 
-    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
-        futures = [ex.submit(worker, entry, args.timeout, args.delay) for entry in to_process]
-        for fut in as_completed(futures):
-            entry, result, err = fut.result()
+    to_process = data if args.max <= 0 else data[:args.max]
+    if finished:
+        to_process = [e for e in to_process if profile_key(entry_url(e)) not in finished]
+
+    if schedule is not None:
+        candidates = len(to_process)
+        to_process = schedule.select(to_process, lambda e: profile_key(entry_url(e)), is_complete, args.budget)
+        log(f'Incremental refresh: {len(to_process)} of {candidates} profiles due'
+              + (f' (budget {args.budget})' if args.budget > 0 else ''))
+
+    fetched = 0
+    skipped = 0  # not started before --time-limit ran out
+    started = time.monotonic()
+    deadline = started + args.time_limit if args.time_limit > 0 else None
+
+    # a profile already being fetched (a duplicate entry, another run in this process) or fetched
+    # within --fresh-for is not fetched again; its entry gets the other fetch's result after the crawl
+    if FLIGHTS is not None:
+        flights = FLIGHTS
+    else:
+        from single_flight import SingleFlight
+        # on its own, a run still never fetches a profile twice
+        flights = SingleFlight(args.fresh_for or float('inf'), max_entries=max(1, len(data)))
+    flights.evict()
+    led = set()
+    shared = {}  # id(entry) -> entry waiting for someone else's fetch
+
+    def url_for(entry):
+        # engines skip entries without a URL, which is how the rest are left for the next --resume
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        url = entry_url(entry)
+        if url:
+            key = profile_key(url)
+            if not flights.begin(key):
+                shared[id(entry)] = entry
+                return None
+            led.add(key)
+        return url
+
+    def release_led():
+        # anything this run claimed and has no result for (e.g. a fetch that raised)
+        for key in list(led):
+            led.discard(key)
+            flights.finish(key, None)
+
+    # retries run on their own threads while the crawl continues, sharing its per-host breaker
+    breaker = HostBreaker(args.concurrency)
+    retry = RetryScheduler(lambda url: fetch_profile(url, timeout=args.timeout, cache=cache),
+                           RetryPolicy(args.retries), breaker, workers=args.concurrency, log=log)
+
+    stats = None
+    if args.mode == 'async':
+        results = crawl_async(to_process, args.concurrency, args.timeout, args.rate, args.burst, cache, breaker,
+                              url_for)
+    elif args.mode == 'pipeline':
+        import pipeline
+        stats = pipeline.PipelineStats()
+        results = crawl_pipeline(to_process, args.concurrency, args.parse_workers or None, args.queue_depth,
+                                 args.timeout, args.delay, cache, stats, breaker, url_for)
+    else:
+        results = crawl_threaded(to_process, args.concurrency, args.timeout, args.delay, cache, breaker,
+                                 url_for)
+
+    total = len(to_process)
+
+    def tracked(results):
+        # report progress once the loop below has handled each result
+        for done, item in enumerate(results, 1):
+            yield item
+            if progress is not None:
+                progress(done, total, errors)
+
+    def handle(entry, result, label):
+        t0 = time.perf_counter()
+        try:
+            if journal is not None:
+                url = result.get('url')
+                journal.record(profile_key(url), url, result.get('badges'), result.get('error'),
+                               classify(result) if result.get('error') else None)
+            apply_result(entry, result, label)
+            key = profile_key(result.get('url'))
+            if key in led:
+                led.discard(key)
+                flights.finish(key, result)
+        finally:
+            crawl_metrics.observe('update', '', time.perf_counter() - t0)
+
+    try:
+        for entry, result, err in tracked(results):
             if err == 'no-url':
+                if entry_url(entry) and id(entry) not in shared:
+                    skipped += 1
                 continue
+            fetched += 1
             if result is None:
                 errors += 1
                 continue
 
-            url = result.get('url')
-            badges = result.get('badges', [])
-            if not badges and result.get('error'):
+            if result.get('error'):
                 errors += 1
-                err_msg = result.get('error')
-                print(f'Error fetching {url}: {err_msg}')
-                failed_fetches.append((entry, url, err_msg))
-                continue
+                log(f"Error fetching {result.get('url')} ({classify(result)}): {result.get('error')}")
+                if retry.submit(entry, result.get('url'), result):
+                    continue
+            handle(entry, result, 'Update')
 
-            # Find the original entry in data list and update fields
-            # match by profile url
-            matched = None
-            for e in data:
-                if (e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')) == url:
-                    matched = e
-                    break
-
-            if not matched:
-                # sometimes URL normalization differs; try contains
-                for e in data:
-                    u = e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')
-                    if u and url in u or (u and u in url):
-                        matched = e
-                        break
-
-            if not matched:
-                print(f'Warning: fetched {url} but no matching record found in input')
-                continue
+        elapsed = time.monotonic() - started
+        log(f'Fetched {fetched} profiles in {elapsed:.1f}s ({fetched / elapsed if elapsed else 0:.1f} profiles/s, mode={args.mode})')
+        if stats is not None:
+            log(stats.summary())
 
-            old_count = int(matched.get('# of Skill Badges Completed') or 0)
-            new_count = len(badges)
-            if new_count > old_count:
-                print(f"Update {matched.get('User Name')}: badges {old_count} -> {new_count}")
-                matched['# of Skill Badges Completed'] = new_count
-                matched['Names of Completed Skill Badges'] = ' | '.join(badges)
-                # Recalculate total courses completed (badges + arcade games)
-                try:
-                    arcade_count = int(matched.get('# of Arcade Games Completed') or 0)
-                except Exception:
-                    # fallback: try to parse numeric from string
-                    try:
-                        arcade_count = int(str(matched.get('# of Arcade Games Completed') or '0').strip())
-                    except Exception:
-                        arcade_count = 0
-
-                matched['# of Courses Completed'] = new_count + arcade_count
-
-                # Update completion flags according to business rule: >=19 skill badges AND >=1 arcade game
-                completion_met = (new_count >= 19 and arcade_count >= 1)
-                # preserve both possible keys used in data
-                if 'All Skill Badges & Games Completed' in matched:
-                    matched['All Skill Badges & Games Completed'] = 'Yes' if completion_met else 'No'
-                matched['All 3 Pathways Completed - Yes or No'] = 'Yes' if completion_met else 'No'
-
-                # Also update arcade completion short flag if present
-                if 'Gen AI Arcade Game Completion' in matched:
-                    matched['Gen AI Arcade Game Completion'] = '1' if arcade_count > 0 else '0'
-
-                updated += 1
-
-    # Retry failed fetches if requested
-    if args.retries and failed_fetches:
-        for attempt in range(1, args.retries + 1):
-            if not failed_fetches:
-                break
-            print(f"Retry attempt {attempt} for {len(failed_fetches)} failed fetches...")
-            remaining = []
-            for entry, url, prev_err in failed_fetches:
-                try:
-                    result = fetch_profile(url, timeout=args.timeout)
-                except Exception as e:
-                    print(f"Retry error fetching {url}: {e}")
-                    remaining.append((entry, url, str(e)))
-                    time.sleep(args.delay)
-                    continue
+        for entry, result, _err in retry.drain():
+            handle(entry, result, 'Update (retry)')
+        release_led()
 
-                if result.get('error'):
-                    print(f"Retry error fetching {url}: {result.get('error')}")
-                    remaining.append((entry, url, result.get('error')))
-                    time.sleep(args.delay)
-                    continue
+        for entry in shared.values():
+            if profile_key(entry_url(entry)) in applied:
+                continue  # a duplicate of a profile this run fetched, already updated with it
+            result = flights.wait(profile_key(entry_url(entry)))
+            if result is None:
+                failed_fetches.append((entry, entry_url(entry), 'shared fetch gave no result'))
+                continue
+            handle(entry, result, 'Update (shared)')
+    finally:
+        retry.close()
+        release_led()
+        if journal is not None:
+            journal.close()
+        if ARCHIVE is not None:
+            ARCHIVE.close()
+            log(ARCHIVE.summary())
+            ARCHIVE = None
+    if retry.retried:
+        log(retry.summary())
+        log(breaker.summary())
+    if shared:
+        log(f'{len(shared)} profiles shared another fetch instead of being fetched again. {flights.summary()}')
+    if failed_fetches:
+        log(f'{len(failed_fetches)} fetches still failed ({dead} profiles not found).')
+
+    log(f'Done. Updated {updated} records, errors: {errors}')
+    if cache is not None:
+        log(cache.summary())
+        cache.save()
+
+    if skipped:
+        # an unfinished run leaves data.json and the schedule alone; its results wait in the journal
+        log(f'Time limit reached: {skipped} profiles not fetched'
+            + (f'; progress kept in {journal.path}, run again with --resume' if journal is not None else ''))
+    elif not args.dry_run:
+        if schedule is not None:
+            schedule.save()
+        if store is not None:
+            # one transaction with just the changed students; no data.json rewrite unless asked for
+            # the store keeps a profile's later rows by position, so (None, rec) can only update the first
+            changed_records = {k: rec for k, rec in changed_records.items() if k in index}
+            _run, written, events = store.write(((None, rec) for rec in changed_records.values()), 'scraper')
+            log(f'Wrote {written} updated records to {args.db} ({events} new badges)')
+            if args.export and (changed_records or not os.path.exists(args.export)):
+                version = store.export(args.export, changed_records)
+                log(f'Exported {args.export} (delta version {version})')
+        elif args.shard:
+            # always written, so the merge can tell the shard finished; the delta is logged by the merge
+            data.save(output)
+            log(f'Wrote shard {args.shard[0]}/{args.shard[1]} to {output} ({updated} updated records)')
+        elif updated > 0:
+            with data_writer.LOG_LOCK:
+                version = data.save(output, changed_records, backups=args.backups, key=record_key)
+                remember_data(output, data)
+            log(f'Wrote updated data to {output} (delta version {version}, {len(changed_records)} changed records)')
+        journal.remove()
+    if store is not None:
+        store.close()
+
+    summary = {'total': total, 'fetched': fetched, 'updated': updated, 'errors': errors,
+               'failed': len(failed_fetches), 'dead': dead, 'retried': retry.retried, 'recovered': retry.recovered,
+               'resumed': len(finished), 'remaining': skipped, 'shared': len(shared), 'elapsed': time.monotonic() - started}
+    report = metrics.report(mode=args.mode, concurrency=args.concurrency, delay=args.delay, summary=summary)
+    crawl_metrics.finish_run(metrics)
+    fetch_total = report['fetch'].get('total')
+    if fetch_total:
+        log(f"Fetch latency p50 {fetch_total['p50'] * 1000:.0f}ms p99 {fetch_total['p99'] * 1000:.0f}ms, "
+            f"{report['bytes'] / 2**20:.1f} MiB received; bottleneck: {report['bottleneck']} "
+            f"({', '.join(f'{k} {v:.1f}s' for k, v in report['seconds_by_activity'].items())})")
+    if args.report:
+        data_writer.write_json_atomic(args.report, report, indent=2)
+        log(f'Wrote run report to {args.report}')
+    summary['report'] = report
+    return summary
+
+
+def refresh_one(args, log=print):
+    """--profile: fetch one student and patch their record (see patch_profile). Returns a summary dict."""
+    t0 = time.perf_counter()
+    store = None
+    if args.db:
+        from sqlite_store import SqliteStore
+        store = SqliteStore(args.db)
+        matches = store.find(args.profile)
+    else:
+        matches = find_profiles(args.input, load_data(args.input, warm=True), args.profile)
+    try:
+        keys = {key for key, _rec in matches}
+        if len(keys) != 1:
+            error = 'not found' if not keys else 'ambiguous: ' + ', '.join(sorted(keys))
+            log(f'{args.profile}: {error}')
+            return {'profile': args.profile, 'error': error}
+        key, rec = matches[0]
+        fetch = functools.partial(fetch_profile, entry_url(rec), timeout=args.timeout)
+        result = FLIGHTS.do(key, fetch) if FLIGHTS is not None else fetch()
+        if result.get('error'):
+            log(f"Error fetching {result['url']} ({classify(result)}): {result['error']}")
+            return {'profile': key, 'error': result['error']}
+        badges = result.get('badges', [])
+        patched = None
+        if not args.dry_run:
+            # with --db, data.json is only patched when it is exported
+            path = args.export if store is not None else args.output
+            patched = patch_profile(path, key, [rec for _key, rec in matches], badges, store, log)
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = time.perf_counter() - t0
+    log(f"{rec.get('User Name')}: {len(badges)} skill badges"
+        + (f', patched (delta version {patched[1]})' if patched else ', no change')
+        + f' in {elapsed * 1000:.0f}ms')
+    return {'profile': key, 'badges': len(badges), 'updated': patched is not None,
+            'version': patched[1] if patched else None, 'elapsed': elapsed}
+
+
+def serve(lines=sys.stdin, out=sys.stdout):
+    """--worker: run one scrape_profiles command line per input line, answering each with a JSON summary line.
+
+    The process stays up between commands, so the cohort (see load_data),
+    the parser backends and keep-alive sessions are only set up once. Logs go
+    to stderr.
+    """
+    global WARM
+    if WARM is None:
+        WARM = {}
+    log = functools.partial(print, file=sys.stderr, flush=True)
+    for line in lines:
+        if not line.strip():
+            continue
+        t0 = time.perf_counter()
+        try:
+            args = parse_args(shlex.split(line))
+            summary = refresh_one(args, log) if args.profile else run(args, log)
+            summary.pop('report', None)
+        except SystemExit as e:
+            # argparse has already printed what was wrong
+            summary = {'error': f'bad arguments (exit status {e.code})'}
+        except Exception as e:
+            log(f'Failed: {e!r}')
+            summary = {'error': str(e) or type(e).__name__}
+        summary['seconds'] = time.perf_counter() - t0
+        print(json.dumps(summary), file=out, flush=True)
 
-                badges = result.get('badges', [])
-                # find matched record by url again
-                matched = None
-                for e in data:
-                    if (e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')) == url:
-                        matched = e
-                        break
-                if not matched:
-                    for e in data:
-                        u = e.get('Google Cloud Skills Boost Profile URL') or e.get('Profile URL')
-                        if u and (url in u or (u and u in url)):
-                            matched = e
-                            break
-
-                if not matched:
-                    print(f'Warning: retry fetched {url} but no matching record found in input')
-                    continue
 
-                old_count = int(matched.get('# of Skill Badges Completed') or 0)
-                new_count = len(badges)
-                if new_count > old_count:
-                    print(f"Update (retry) {matched.get('User Name')}: badges {old_count} -> {new_count}")
-                    matched['# of Skill Badges Completed'] = new_count
-                    matched['Names of Completed Skill Badges'] = ' | '.join(badges)
-                    # Recalculate totals and flags as above
-                    try:
-                        arcade_count = int(matched.get('# of Arcade Games Completed') or 0)
-                    except Exception:
-                        try:
-                            arcade_count = int(str(matched.get('# of Arcade Games Completed') or '0').strip())
-                        except Exception:
-                            arcade_count = 0
-
-                    matched['# of Courses Completed'] = new_count + arcade_count
-                    completion_met = (new_count >= 19 and arcade_count >= 1)
-                    if 'All Skill Badges & Games Completed' in matched:
-                        matched['All Skill Badges & Games Completed'] = 'Yes' if completion_met else 'No'
-                    matched['All 3 Pathways Completed - Yes or No'] = 'Yes' if completion_met else 'No'
-                    if 'Gen AI Arcade Game Completion' in matched:
-                        matched['Gen AI Arcade Game Completion'] = '1' if arcade_count > 0 else '0'
-
-                    updated += 1
-                time.sleep(args.delay)
-
-            failed_fetches = remaining
-
-        if failed_fetches:
-            print(f"After {args.retries} retries, {len(failed_fetches)} fetches still failed.")
-
-    print(f'Done. Updated {updated} records, errors: {errors}')
-
-    if not args.dry_run and updated > 0:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        print(f'Wrote updated data to {args.output}')
+def main():
+    args = parse_args()
+    if args.worker:
+        serve()
+    elif args.profile:
+        refresh_one(args)
+    else:
+        run(args)
 
 
 if __name__ == '__main__':
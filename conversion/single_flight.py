@@ -0,0 +1,122 @@
+"""
+single_flight.py
+
+Per-profile single-flight for scrape_profiles.py, so one process never
+fetches the same profile twice at once, nor again within a freshness window.
+
+A caller that wants a profile first asks begin(key):
+
+  True   it leads: nobody is fetching the profile and there is no fresh
+         result, so it fetches and hands the result to finish(key, result)
+  False  the profile is being fetched, or was fetched successfully less
+         than `fresh_for` seconds ago; wait(key) returns that result
+
+do(key, fetch) does all three for callers with a single fetch to make, and
+recent(key) answers from a fresh result without fetching. Fresh results are
+kept in an LRU of at most `max_entries` profiles.
+
+refresh_server.py keeps one SingleFlight for the life of the server, so
+refresh runs for different cohorts, and a cohort run plus a single-profile
+refresh, share fetches instead of each hitting the host.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self, fresh_for=0, max_entries=10000):
+        self.fresh_for = fresh_for
+        self.max_entries = max_entries
+        self.led = 0
+        self.joined = 0  # waited for a fetch in flight
+        self.reused = 0  # served a fresh result
+        self._flights = {}  # key -> _Flight in progress
+        self._fresh = OrderedDict()  # key -> (finished at, successful result), least recently used first
+        self._lock = threading.Lock()
+
+    def _fresh_result(self, key, now):
+        entry = self._fresh.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] >= self.fresh_for:
+            del self._fresh[key]
+            return None
+        self._fresh.move_to_end(key)
+        return entry[1]
+
+    def begin(self, key):
+        """True if the caller should fetch `key` itself (and then call finish)."""
+        with self._lock:
+            if key in self._flights:
+                self.joined += 1
+                return False
+            if self._fresh_result(key, time.time()) is not None:
+                self.reused += 1
+                return False
+            self._flights[key] = _Flight()
+            self.led += 1
+            return True
+
+    def finish(self, key, result):
+        """Publish the leader's result (None if it gave up) to everyone waiting for it."""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if result is not None and not result.get('error') and self.fresh_for > 0:
+                self._fresh[key] = (time.time(), result)
+                self._fresh.move_to_end(key)
+                while len(self._fresh) > self.max_entries:
+                    self._fresh.popitem(last=False)
+        if flight is not None:
+            flight.result = result
+            flight.done.set()
+
+    def wait(self, key, timeout=None):
+        """The result of the fetch in flight for `key`, or its fresh result. None if there is neither."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                return self._fresh_result(key, time.time())
+        flight.done.wait(timeout)
+        return flight.result
+
+    def recent(self, key):
+        """The fresh result for `key` and its age in seconds, or None."""
+        with self._lock:
+            result = self._fresh_result(key, time.time())
+            if result is None:
+                return None
+            self.reused += 1
+            return result, time.time() - self._fresh[key][0]
+
+    def do(self, key, fetch):
+        """fetch() unless the same key is in flight or fresh, in which case share that result."""
+        if not self.begin(key):
+            result = self.wait(key)
+            if result is not None:
+                return result
+            # the leader gave up without a result; fetch after all
+            return self.do(key, fetch)
+        result = None
+        try:
+            result = fetch()
+            return result
+        finally:
+            self.finish(key, result)
+
+    def evict(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._fresh = OrderedDict((k, v) for k, v in self._fresh.items() if now - v[0] < self.fresh_for)
+
+    def summary(self):
+        return (f'Single-flight: {self.led} fetched, {self.joined} joined a fetch in flight, '
+                f'{self.reused} reused a fresh result')
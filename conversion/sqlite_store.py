@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+sqlite_store.py
+
+Optional SQLite store for a cohort (stdlib sqlite3, WAL mode), written by
+converter.py --db and scrape_profiles.py --db instead of rewriting
+main/data.json and copying backups on every run.
+
+Tables:
+
+  students        one row per data.json record: the record itself as JSON,
+                  its position in the file, and indexed columns for the
+                  profile id, name, counts and completion
+  badges          badge names
+  student_badges  the badges each student currently has, and when each was
+                  first seen
+  badge_events    one row per badge a run found that the student did not have
+                  before, the time series behind "badges earned per day"
+  runs            one row per converter/scraper run
+
+Every run is one transaction of executemany() batches, so a refresh that
+changes 5 students writes 5 rows and a crash rolls back to the previous run.
+data.json is exported from the store on demand (the export command, or
+scrape_profiles.py --db ... --export main/data.json), exactly as
+converter.py would have written it.
+
+Usage examples:
+  python conversion/sqlite_store.py import --db main/cohort.db --input main/data.json
+  python conversion/sqlite_store.py export --db main/cohort.db --output main/data.json
+  python conversion/sqlite_store.py progress --db main/cohort.db --days 30
+  python conversion/sqlite_store.py history --db main/cohort.db --profile <profile id>
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+import data_writer
+from record_store import RecordStore, StudentRecord, entry_url, profile_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    position INTEGER,
+    name TEXT,
+    skill_badges INTEGER NOT NULL DEFAULT 0,
+    arcade_games INTEGER NOT NULL DEFAULT 0,
+    courses INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    record TEXT NOT NULL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS students_position ON students (position);
+CREATE INDEX IF NOT EXISTS students_name ON students (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS students_courses ON students (courses);
+CREATE TABLE IF NOT EXISTS badges (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS student_badges (
+    student_id INTEGER NOT NULL REFERENCES students (id) ON DELETE CASCADE,
+    badge_id INTEGER NOT NULL REFERENCES badges (id),
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (student_id, badge_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    time REAL NOT NULL,
+    students INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS badge_events (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    student_key TEXT NOT NULL,
+    badge_id INTEGER NOT NULL REFERENCES badges (id),
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS badge_events_time ON badge_events (time);
+CREATE INDEX IF NOT EXISTS badge_events_student ON badge_events (student_key, time);
+"""
+
+UPSERT_STUDENT = """
+INSERT INTO students (key, position, name, skill_badges, arcade_games, courses, complete, record, updated)
+VALUES (?1, COALESCE(?2, (SELECT IFNULL(MAX(position), -1) + 1 FROM students)), ?3, ?4, ?5, ?6, ?7, ?8, ?9)
+ON CONFLICT (key) DO UPDATE SET
+    position = COALESCE(?2, students.position),
+    name = excluded.name, skill_badges = excluded.skill_badges, arcade_games = excluded.arcade_games,
+    courses = excluded.courses, complete = excluded.complete, record = excluded.record, updated = excluded.updated
+"""
+
+
+def badge_names(rec):
+    names = rec.get('Names of Completed Skill Badges') or ''
+    return [n for n in names.split(' | ') if n]
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit; transaction() issues BEGIN/COMMIT itself
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self._badge_ids = dict(self.conn.execute('SELECT name, id FROM badges'))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            # badges inserted by the failed run are gone again
+            self._badge_ids = dict(self.conn.execute('SELECT name, id FROM badges'))
+            raise
+        self.conn.execute('COMMIT')
+
+    def _badge_id(self, name):
+        badge_id = self._badge_ids.get(name)
+        if badge_id is None:
+            badge_id = self.conn.execute('INSERT INTO badges (name) VALUES (?)', (name,)).lastrowid
+            self._badge_ids[name] = badge_id
+        return badge_id
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+
+    def load(self):
+        """The cohort as a RecordStore, in data.json order."""
+        rows = self.conn.execute('SELECT record FROM students ORDER BY position, id')
+        return RecordStore(StudentRecord.from_dict(json.loads(record)) for (record,) in rows)
+
+    def find(self, query):
+        """[(profile id, StudentRecord)] for a profile id or URL, or else a full name (any case), by index."""
+        rows = self.conn.execute('SELECT key, record FROM students WHERE key = ?', (profile_key(query),)).fetchall()
+        if not rows:
+            rows = self.conn.execute('SELECT key, record FROM students WHERE name = ? COLLATE NOCASE '
+                                     'ORDER BY position, id', (' '.join(query.split()),)).fetchall()
+        return [(key, StudentRecord.from_dict(json.loads(record))) for key, record in rows]
+
+    def write(self, records, source, replace=False, when=None):
+        """Upsert (position, record) pairs in one transaction and log the badges they gained.
+
+        position may be None to keep a student's place; a new student without
+        one goes after everyone else. With replace=True the
+        records are the whole cohort and students missing from it are
+        deleted (converter.py imports). Badges count as earned only for
+        students already in the store, so a first import logs no events.
+        Returns (run id, students written, badge events).
+        """
+        when = when or time.time()
+        with self.transaction() as conn:
+            run_id = conn.execute('INSERT INTO runs (source, time) VALUES (?, ?)', (source, when)).lastrowid
+            rows = []
+            lists = []
+            seen = set()
+            for position, rec in records:
+                if not isinstance(rec, StudentRecord):
+                    rec = StudentRecord.from_dict(rec)
+                key = profile_key(entry_url(rec)) or f'row:{position}'
+                if key in seen:
+                    key = f'{key}#{position}'  # a profile listed twice keeps both rows
+                seen.add(key)
+                rows.append((key, position, rec.get('User Name'), rec.skill_badges, rec.arcade_games, rec.courses,
+                             int(rec.is_complete()), json.dumps(rec.to_dict(), ensure_ascii=False), when))
+                lists.append((key, [self._badge_id(name) for name in badge_names(rec)]))
+
+            def lookup(key):
+                row = conn.execute('SELECT id FROM students WHERE key = ?', (key,)).fetchone()
+                return row[0] if row else None
+
+            # a whole-cohort import reads everything in one scan; a scraper run looks up just its students
+            if replace:
+                known = {key for (key,) in conn.execute('SELECT key FROM students')}
+            else:
+                known = {key for key, _ in lists if lookup(key) is not None}
+            conn.executemany(UPSERT_STUDENT, rows)
+            current = {}
+            if replace:
+                ids = dict(conn.execute('SELECT key, id FROM students'))
+                for student_id, badge_id in conn.execute('SELECT student_id, badge_id FROM student_badges'):
+                    current.setdefault(student_id, set()).add(badge_id)
+            else:
+                ids = {key: lookup(key) for key, _ in lists}
+                for student_id in ids.values():
+                    current[student_id] = {b for (b,) in conn.execute(
+                        'SELECT badge_id FROM student_badges WHERE student_id = ?', (student_id,))}
+
+            added, removed, events = [], [], []
+            for key, badge_ids in lists:
+                student_id = ids[key]
+                have = current.get(student_id, set())
+                new = set(badge_ids)
+                added.extend((student_id, b, when) for b in new - have)
+                removed.extend((student_id, b) for b in have - new)
+                if key in known:
+                    events.extend((run_id, key, b, when) for b in badge_ids if b not in have)
+            conn.executemany('INSERT INTO student_badges (student_id, badge_id, first_seen) VALUES (?, ?, ?)', added)
+            conn.executemany('DELETE FROM student_badges WHERE student_id = ? AND badge_id = ?', removed)
+            conn.executemany('INSERT INTO badge_events (run_id, student_key, badge_id, time) VALUES (?, ?, ?, ?)',
+                             events)
+            if replace:
+                conn.executemany('DELETE FROM students WHERE key = ?', [(k,) for k in known if k not in seen])
+            conn.execute('UPDATE runs SET students = ?, events = ? WHERE id = ?', (len(rows), len(events), run_id))
+        return run_id, len(rows), len(events)
+
+    def export(self, path, changed=None, backups=0):
+        """Write data.json from the store (see data_writer.save_data). Returns the delta version."""
+        rows = self.conn.execute('SELECT record FROM students ORDER BY position, id')
+        return data_writer.save_data(path, (json.loads(record) for (record,) in rows), changed, backups)
+
+    def badges_per_day(self, days=30, now=None):
+        """[(YYYY-MM-DD, badges earned, students who earned one)] for the last `days` days, oldest first."""
+        since = (now or time.time()) - days * 86400
+        return self.conn.execute(
+            "SELECT date(time, 'unixepoch', 'localtime') AS day, COUNT(*), COUNT(DISTINCT student_key) "
+            'FROM badge_events WHERE time >= ? GROUP BY day ORDER BY day', (since,)).fetchall()
+
+    def history(self, key):
+        """[(time, badge name)] for one profile id, in the order they were earned."""
+        return self.conn.execute(
+            'SELECT e.time, b.name FROM badge_events e JOIN badges b ON b.id = e.badge_id '
+            'WHERE e.student_key = ? ORDER BY e.time, e.id', (key,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import, export and query the SQLite cohort store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('import', help='Load a data.json into the store (replacing the cohort)')
+    p.add_argument('--db', required=True)
+    p.add_argument('--input', '-i', default='main/data.json')
+    p = sub.add_parser('export', help='Write data.json from the store')
+    p.add_argument('--db', required=True)
+    p.add_argument('--output', '-o', default='main/data.json')
+    p = sub.add_parser('progress', help='Badges earned per day')
+    p.add_argument('--db', required=True)
+    p.add_argument('--days', type=int, default=30)
+    p = sub.add_parser('history', help="One student's badges in the order they were earned")
+    p.add_argument('--db', required=True)
+    p.add_argument('--profile', required=True, help='Profile id or profile URL')
+    args = parser.parse_args()
+
+    with SqliteStore(args.db) as store:
+        if args.command == 'import':
+            data = RecordStore.load(args.input)
+            _run, count, events = store.write(enumerate(data), 'import', replace=True)
+            print(f'Imported {count} records from {args.input} into {args.db} ({events} badge events)')
+        elif args.command == 'export':
+            store.export(args.output)
+            print(f'Wrote {len(store)} records to {args.output}')
+        elif args.command == 'progress':
+            for day, earned, students in store.badges_per_day(args.days):
+                print(f'{day}  {earned:6d} badges  {students:6d} students')
+        else:
+            for when, name in store.history(profile_key(args.profile)):
+                print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(when))}  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+import pytest
+
+# the conversion scripts import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_simulator  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def simulator():
+    """(server, base_url) of a local profile simulator; server.stats['requests'] counts fetches."""
+    server, base_url = profile_simulator.start_server()
+    yield server, base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    """scrape_profiles with no state shared between runs (refresh_server.py sets some on import)."""
+    import scrape_profiles
+    monkeypatch.setattr(scrape_profiles, 'FLIGHTS', None)
+    monkeypatch.setattr(scrape_profiles, 'WARM', None)
+    return scrape_profiles
+
+
+@pytest.fixture
+def write_cohort(simulator):
+    """write_cohort(path, n): write a data.json of n students at the simulator and return its records."""
+    def write(path, n):
+        records = profile_simulator.make_cohort(n, simulator[1])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=4)
+        return records
+    return write
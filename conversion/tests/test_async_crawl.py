@@ -0,0 +1,47 @@
+import http.server
+import threading
+import types
+
+import pytest
+
+import async_crawl
+import profile_simulator
+import scrape_profiles
+
+PAGE = profile_simulator.render_profile('p1', ['Badge A', 'Café B']).encode('utf-8')
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=' + self.path.strip('/'))
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_unknown_charset_falls_back_to_utf8(base_url):
+    urls = [f'{base_url}/x-no-such-charset', f'{base_url}/utf-8']
+    results = list(async_crawl.iter_crawl(urls, lambda u: u, scrape_profiles.extract_badges_from_html))
+    expected = ['Badge A [Skill Badge]', 'Café B [Skill Badge]']
+    assert [result['badges'] for _url, result, _err in results] == [expected, expected]
+
+
+def test_charset_names():
+    def resp(charset):
+        return types.SimpleNamespace(get_encoding=lambda: charset)
+    assert async_crawl._charset(resp('UTF8'), b'x') == 'utf-8'
+    assert async_crawl._charset(resp('latin-1'), b'x') == 'iso8859-1'
+    assert async_crawl._charset(resp('x-no-such-charset'), b'x') == 'utf-8'
+    assert async_crawl._charset(resp('x-no-such-charset'), b'') == 'utf-8'
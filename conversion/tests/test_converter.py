@@ -0,0 +1,64 @@
+import contextlib
+import csv
+import io
+import json
+
+import pytest
+
+import converter
+import profile_simulator
+
+# header variants the campaign exports have come in: reordered, aliased, and with columns missing
+CSVS = {
+    'reordered': [
+        ['Names of Completed Skill Badges', '# of Arcade Games Completed', 'User Name', 'All 3 Pathways Completed',
+         'Google Cloud Skills Boost Profile URL', '# of Skill Badges Completed', 'Access Code Redemption Status'],
+        ['Prompt Design in Vertex AI [Skill Badge] | Develop GenAI Apps with Gemini and Streamlit [Skill Badge]', '1',
+         'Zoë Ünïcode', 'yes', 'https://www.cloudskillsboost.google/public_profiles/abc', '2', 'Yes'],
+        ['', '', 'Quote "Me", Please', 'No', 'https://www.cloudskillsboost.google/public_profiles/def', 'x', ''],
+        ['Line\nbreak [Skill Badge]', '0', 'Short Row'],
+    ],
+    'missing': [
+        ['Name', 'Profile URL', 'Names of Completed Arcade Games', 'Number of Skill Badges', 'Name'],
+        ['First', 'cloudskillsboost.google/u/0/x/', 'Game 1 | Game 2 | Game 3', '4', 'Last name wins'],
+        [],
+        ['', '', '', '', ''],
+        ['Short row', 'cloudskillsboost.google/u/0/y', 'Game 1'],
+    ],
+    'empty': [
+        ['User Name', 'Google Cloud Skills Boost Profile URL'],
+    ],
+}
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def quietly(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+
+
+@pytest.mark.parametrize('name', sorted(CSVS))
+def test_stream_and_ndjson_match_csv_to_json(tmp_path, name):
+    csv_path = str(tmp_path / 'export.csv')
+    write_csv(csv_path, CSVS[name])
+    legacy, stream, ndjson = (tmp_path / 'legacy.json', tmp_path / 'stream.json', tmp_path / 'data.ndjson')
+    quietly(converter.csv_to_json, csv_path, str(legacy))
+    quietly(converter.csv_to_json_stream, csv_path, str(stream))
+    quietly(converter.csv_to_json_stream, csv_path, str(ndjson), ndjson=True)
+
+    assert stream.read_bytes() == legacy.read_bytes()
+    records = json.loads(legacy.read_text(encoding='utf-8'))
+    expected = ''.join(json.dumps(rec, ensure_ascii=False) + '\n' for rec in records)
+    assert ndjson.read_bytes() == expected.encode('utf-8')
+
+
+def test_stream_matches_csv_to_json_on_a_simulated_export(tmp_path):
+    csv_path = str(tmp_path / 'export.csv')
+    profile_simulator.write_export_csv(csv_path, 300, 'http://127.0.0.1:9')
+    quietly(converter.csv_to_json, csv_path, str(tmp_path / 'legacy.json'))
+    quietly(converter.csv_to_json_stream, csv_path, str(tmp_path / 'stream.json'))
+    assert (tmp_path / 'stream.json').read_bytes() == (tmp_path / 'legacy.json').read_bytes()
@@ -0,0 +1,92 @@
+import json
+
+from crawl_journal import CrawlJournal, journal_path
+from record_store import RecordStore, record_key
+
+
+def test_journal_path():
+    assert journal_path('main/data.json') == 'main/data.journal.jsonl'
+
+
+def test_replay_keeps_the_latest_entry_per_profile(tmp_path):
+    journal = CrawlJournal(str(tmp_path / 'j.jsonl')).open()
+    journal.record('a', 'http://x/a', ['A'], fetched_at=1.0)
+    journal.record('b', 'http://x/b', [], error='HTTP 500', kind='server', fetched_at=2.0)
+    journal.record('b', 'http://x/b', ['B1', 'B2'], fetched_at=3.0)
+    journal.close()
+    entries = journal.replay()
+    assert entries['a']['badges'] == ['A']
+    assert entries['b'] == {'key': 'b', 'url': 'http://x/b', 'time': 3.0, 'badges': ['B1', 'B2'],
+                            'error': None, 'kind': None}
+    assert journal.written == 3
+
+
+def test_torn_last_line_is_skipped_and_finished_on_resume(tmp_path):
+    path = tmp_path / 'j.jsonl'
+    path.write_text(json.dumps({'key': 'a', 'url': 'u', 'badges': []}) + '\n{"key": "b", "ur', encoding='utf-8')
+    journal = CrawlJournal(str(path))
+    assert list(journal.replay()) == ['a']
+    journal.open(resume=True)
+    journal.record('c', 'u', [])
+    journal.close()
+    assert sorted(journal.replay()) == ['a', 'c']
+
+
+def test_open_without_resume_discards_the_journal(tmp_path):
+    journal = CrawlJournal(str(tmp_path / 'j.jsonl')).open()
+    journal.record('a', 'u', [])
+    journal.close()
+    journal.open(resume=False).close()
+    assert journal.replay() == {}
+    journal.remove()
+    assert not journal.exists()
+
+
+def test_resume_fetches_only_what_the_journal_lacks(tmp_path, simulator, scraper, write_cohort):
+    server = simulator[0]
+    path = str(tmp_path / 'data.json')
+    records = write_cohort(path, 10)
+    journal = CrawlJournal(str(tmp_path / 'data.journal.jsonl')).open()
+    for rec in records[:4]:
+        journal.record(record_key(rec), rec['Google Cloud Skills Boost Profile URL'], ['From Journal'])
+    # retryable failures are fetched again
+    rec = records[4]
+    journal.record(record_key(rec), rec['Google Cloud Skills Boost Profile URL'], [], error='timed out',
+                   kind='timeout')
+    journal.close()
+
+    before = server.stats['requests']
+    args = scraper.parse_args(['--input', path, '--output', path, '--resume', '--no-cache', '--delay', '0',
+                               '--backups', '0'])
+    summary = scraper.run(args, log=lambda line: None)
+    assert summary['resumed'] == 4
+    assert server.stats['requests'] - before == 6
+
+    data = RecordStore.load(path)
+    assert [rec['Names of Completed Skill Badges'] for rec in data[:4]] == ['From Journal'] * 4
+    assert all(rec.skill_badges > 0 for rec in data[4:])
+    # a finished run compacts the journal into data.json
+    assert not journal.exists()
+
+
+def test_resumed_results_reach_the_schedule(tmp_path, scraper, write_cohort):
+    path = str(tmp_path / 'data.json')
+    schedule_path = tmp_path / 'schedule.json'
+    records = write_cohort(path, 6)
+    journal = CrawlJournal(str(tmp_path / 'data.journal.jsonl')).open()
+    for rec in records[:3]:
+        journal.record(record_key(rec), rec['Google Cloud Skills Boost Profile URL'], ['From Journal'], fetched_at=50.0)
+    rec = records[3]
+    journal.record(record_key(rec), rec['Google Cloud Skills Boost Profile URL'], [], error='HTTP 404', kind='dead',
+                   fetched_at=60.0)
+    journal.close()
+
+    args = scraper.parse_args(['--input', path, '--output', path, '--resume', '--incremental', '--schedule',
+                               str(schedule_path), '--no-cache', '--delay', '0', '--backups', '0'])
+    summary = scraper.run(args, log=lambda line: None)
+    assert summary['resumed'] == 4 and summary['fetched'] == 2
+
+    state = json.loads(schedule_path.read_text(encoding='utf-8'))
+    assert set(state) == {record_key(rec) for rec in records}
+    assert [state[record_key(rec)]['last_fetched'] for rec in records[:4]] == [50.0, 50.0, 50.0, 60.0]
+    assert state[record_key(records[3])]['dead']
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import data_writer
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_write_json_array_matches_json_dump():
+    import io
+    records = [{'User Name': 'Zoë', 'n': 1, 'tags': ['a', 'b']}, {'User Name': 'B', 'nested': {'x': []}}]
+    for data in (records, []):
+        out = io.StringIO()
+        assert data_writer.write_json_array(out, iter(data)) == len(data)
+        assert out.getvalue() == json.dumps(data, indent=4, ensure_ascii=False)
+
+
+def test_open_atomic_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('old', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        with data_writer.open_atomic(str(path)) as f:
+            f.write('half written')
+            raise RuntimeError('crash')
+    assert path.read_text(encoding='utf-8') == 'old'
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_save_data_replaces_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    data_writer.save_data(path, [{'a': 1}], backups=0)
+    data_writer.save_data(path, iter([{'a': 2}, {'a': 3}]), backups=0)
+    assert read_json(path) == [{'a': 2}, {'a': 3}]
+    assert sorted(os.listdir(tmp_path)) == ['data.json']
+
+
+def test_backup_keeps_newest(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('current', encoding='utf-8')
+    for stamp in ('20250101_000000', '20250102_000000', '20250103_000000'):
+        (tmp_path / f'data.json.{stamp}.bak').write_text(stamp, encoding='utf-8')
+    dest = data_writer.backup(str(path), keep=2)
+    assert open(dest, encoding='utf-8').read() == 'current'
+    assert sorted(os.listdir(tmp_path)) == ['data.json', 'data.json.20250103_000000.bak', os.path.basename(dest)]
+    assert data_writer.backup(str(path), keep=0) is None
+
+
+def test_delta_versions(tmp_path):
+    path = str(tmp_path / 'data.json')
+    assert data_writer.save_data(path, [], {'p1': {'n': 1}}, backups=0) == 1
+    assert data_writer.save_data(path, [], {'p2': {'n': 2}}, backups=0) == 2
+    assert data_writer.save_data(path, [], None, backups=0) is None
+
+    delta = data_writer.read_delta(path, 1)
+    assert delta['version'] == 2 and not delta['full_reload']
+    assert delta['records'] == {'p2': {'n': 2}}
+    assert data_writer.read_delta(path, 0)['records'] == {'p1': {'n': 1}, 'p2': {'n': 2}}
+    assert data_writer.read_delta(path, 2)['records'] == {}
+    # a client ahead of the log (it was reset) reloads
+    assert data_writer.read_delta(path, 5)['full_reload']
+
+
+def test_old_versions_are_pruned(tmp_path):
+    path = str(tmp_path / 'data.json')
+    for i in range(5):
+        data_writer.append_delta(path, {f'p{i}': {}}, keep=2)
+    log = data_writer.load_delta_log(path)
+    assert [c['version'] for c in log['changes']] == [4, 5]
+    assert data_writer.read_delta(path, 1)['full_reload']
+    assert not data_writer.read_delta(path, 3)['full_reload']
+
+
+def test_pending_until_flushed(tmp_path):
+    path = str(tmp_path / 'data.json')
+    data_writer.save_data(path, [{'a': 1}], {'p1': {'n': 1}}, backups=0)
+    data_writer.patch_data(path, {'p2': {'n': 1}})
+    data_writer.patch_data(path, {'p2': {'n': 2}, 'p3': {'n': 3}})
+    assert data_writer.pending(path) == {'p2': {'n': 2}, 'p3': {'n': 3}}
+    # patches are served to clients straight away
+    assert data_writer.read_delta(path, 1)['records'] == {'p2': {'n': 2}, 'p3': {'n': 3}}
+
+    # pending versions are never pruned, however many flushed ones follow
+    for i in range(3):
+        data_writer.append_delta(path, {f'q{i}': {}}, keep=1, flushed=False)
+    assert 'p3' in data_writer.pending(path)
+
+    data_writer.save_data(path, [{'a': 2}], None, backups=0)
+    assert data_writer.pending(path) == {}
+    log = data_writer.load_delta_log(path)
+    assert log['flushed'] == log['version'] == 6
@@ -0,0 +1,58 @@
+import glob
+import os
+
+import pytest
+
+import fast_extract
+import scrape_profiles
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'profile_pages')
+PAGES = sorted(glob.glob(os.path.join(FIXTURES, '*.html')))
+BACKENDS = fast_extract.available_backends()
+
+
+def read(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_backends_match_bs4(path, backend):
+    text = read(path)
+    expected = scrape_profiles.extract_badges_bs4(text)
+    fast = fast_extract.extract(text, backend)
+    # the fast path either reads the page exactly as bs4 does or leaves it to bs4
+    assert fast is None or fast == expected
+    assert scrape_profiles.extract_badges_timed(text, backend)[0] == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_script_style_and_template_text_is_left_out(backend):
+    assert fast_extract.extract(read('script_in_title.html'), backend) == [
+        'Get Started with Cloud Storage [Skill Badge]',
+        'Build a Secure Google Cloud Network [Skill Badge]',
+        'Implement Load Balancing [Skill Badge]',
+    ]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_nested_markup_is_joined_and_deduplicated(backend):
+    assert fast_extract.extract(read('nested_markup.html'), backend) == [
+        'Analyze Speech & Language with Google APIs [Skill Badge]',
+        'Créer des applis sans JS — Gemini [Skill Badge]',
+    ]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', ['cdata_in_title.html', 'no_badges.html', 'legacy_markup.html',
+                                  'untitled_block.html'])
+def test_unusual_pages_fall_back_to_bs4(name, backend):
+    text = read(name)
+    assert fast_extract.extract(text, backend) is None
+    assert scrape_profiles.extract_badges_timed(text, backend)[1] == 'bs4-fallback'
+
+
+def test_default_backend_is_the_fastest_installed():
+    assert fast_extract.default_backend() == (BACKENDS[0] if BACKENDS else 'bs4')
+    assert list(fast_extract.BACKENDS) == ['selectolax', 'lxml']
@@ -0,0 +1,44 @@
+import async_crawl
+import scrape_profiles
+from fetch_cache import FetchCache
+
+
+class EvictedCache(FetchCache):
+    """Sends the validators of an entry that is gone by the time the 304 comes back."""
+
+    def __init__(self, path, validators):
+        super().__init__(path)
+        self.validators = validators
+
+    def conditional_headers(self, url):
+        return dict(self.validators)
+
+
+def primed(tmp_path, url):
+    cache = FetchCache(str(tmp_path / 'cache.json'))
+    result = scrape_profiles.fetch_profile(url, cache=cache)
+    assert result['badges'] and cache.entries[url]['etag']
+    return result['badges'], cache.conditional_headers(url)
+
+
+def test_304_without_an_entry_is_a_miss(tmp_path):
+    cache = FetchCache(str(tmp_path / 'cache.json'))
+    assert cache.check('http://x/p', 304, b'') == (None, None)
+    assert cache.misses == 1 and not cache.entries
+
+
+def test_unexpected_304_refetches_the_page(tmp_path, simulator):
+    url = f'{simulator[1]}/public_profiles/00000000-0000-0000-0000-000000000003'
+    badges, validators = primed(tmp_path, url)
+    cache = EvictedCache(str(tmp_path / 'other.json'), validators)
+    assert scrape_profiles.fetch_profile(url, cache=cache) == {'url': url, 'badges': badges}
+    assert not cache.entries
+
+
+def test_unexpected_304_refetches_the_page_async(tmp_path, simulator):
+    url = f'{simulator[1]}/public_profiles/00000000-0000-0000-0000-000000000003'
+    badges, validators = primed(tmp_path, url)
+    cache = EvictedCache(str(tmp_path / 'other.json'), validators)
+    results = list(async_crawl.iter_crawl([url], lambda u: u, scrape_profiles.extract_badges_from_html, cache=cache))
+    assert [(result['badges'], err) for _url, result, err in results] == [(badges, None)]
+    assert not cache.entries
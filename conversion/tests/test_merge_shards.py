@@ -0,0 +1,116 @@
+import json
+
+import data_writer
+import merge_shards
+import profile_simulator
+from leaderboard import Leaderboard
+from record_store import RecordStore, record_key
+
+
+def quiet(line):
+    pass
+
+
+def with_badges(rec, names):
+    return dict(rec, **{'# of Skill Badges Completed': len(names), 'Names of Completed Skill Badges': ' | '.join(names)})
+
+
+def write(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=4)
+
+
+def test_find_and_missing_shards(tmp_path):
+    output = str(tmp_path / 'data.json')
+    for name in ('data.shard-1-of-3.json', 'data.shard-3-of-3.json', 'other.shard-2-of-3.json'):
+        (tmp_path / name).write_text('[]', encoding='utf-8')
+    shards = merge_shards.find_shards(output)
+    assert [p[len(str(tmp_path)) + 1:] for p in shards] == ['data.shard-1-of-3.json', 'data.shard-3-of-3.json']
+    assert merge_shards.missing_shards(shards) == ['2/3']
+
+
+def test_merge_only_raises_badge_counts(tmp_path, write_cohort):
+    output = str(tmp_path / 'data.json')
+    records = write_cohort(output, 4)
+    records[3] = with_badges(records[3], ['A', 'B', 'C'])
+    write(output, records)
+    shard_1 = str(tmp_path / 'data.shard-1-of-2.json')
+    shard_2 = str(tmp_path / 'data.shard-2-of-2.json')
+    stranger = dict(records[0], **{'Google Cloud Skills Boost Profile URL': 'https://example.com/public_profiles/ff'})
+    write(shard_1, [with_badges(records[0], ['A']), stranger])
+    # an older shard must not take badges away
+    write(shard_2, [with_badges(records[2], ['A', 'B']), with_badges(records[3], ['A'])])
+
+    summary = merge_shards.merge(output, [shard_1, shard_2], backups=0, log=quiet)
+    assert summary == {'shards': 2, 'updated': 2, 'unknown': 1, 'version': 1}
+    data = RecordStore.load(output)
+    assert [rec.skill_badges for rec in data] == [1, 0, 2, 3]
+    delta = data_writer.read_delta(output, 0)
+    assert sorted(delta['records']) == sorted([record_key(records[0]), record_key(records[2])])
+
+    # merging the same shards again changes nothing
+    assert merge_shards.merge(output, [shard_1, shard_2], backups=0, log=quiet)['updated'] == 0
+
+
+def test_profile_listed_twice_updates_every_record(tmp_path, write_cohort):
+    output = str(tmp_path / 'data.json')
+    records = write_cohort(output, 3)
+    records.append(dict(records[1], **{'User Name': 'Student 2 again'}))
+    write(output, records)
+    board = Leaderboard('test', output)
+    board.sync()
+    shard = str(tmp_path / 'data.shard-1-of-1.json')
+    write(shard, [with_badges(records[1], ['A', 'B'])])
+
+    assert merge_shards.merge(output, [shard], backups=0, log=quiet)['updated'] == 2
+    assert [rec.skill_badges for rec in RecordStore.load(output)] == [0, 2, 0, 2]
+    key = record_key(records[1])
+    assert sorted(data_writer.read_delta(output, 0)['records']) == [key, key + '#2']
+    board.sync()
+    assert [rec.skill_badges for rec in board.records] == [0, 2, 0, 2]
+    assert board.find(key) == [1, 3]
+
+
+def test_scrape_run_emits_every_duplicate_record(tmp_path, scraper, write_cohort):
+    output = str(tmp_path / 'data.json')
+    records = write_cohort(output, 6)
+    i = next(i for i, rec in enumerate(records) if profile_simulator.badges_for(record_key(rec)))
+    records.append(dict(records[i]))
+    write(output, records)
+    scraper.run(scraper.parse_args(['--input', output, '--output', output, '--no-cache', '--delay', '0',
+                                    '--backups', '0']), log=quiet)
+    data = RecordStore.load(output)
+    assert data[i].to_dict() == data[len(records) - 1].to_dict() and data[i].skill_badges > 0
+    delta = data_writer.read_delta(output, 0)['records']
+    assert delta[record_key(records[i]) + '#2'] == delta[record_key(records[i])] == data[i].to_dict()
+
+
+def test_dry_run_writes_nothing(tmp_path, write_cohort):
+    output = str(tmp_path / 'data.json')
+    records = write_cohort(output, 2)
+    before = open(output, encoding='utf-8').read()
+    shard = str(tmp_path / 'data.shard-1-of-1.json')
+    write(shard, [with_badges(records[1], ['A'])])
+    summary = merge_shards.merge(output, [shard], dry_run=True, log=quiet)
+    assert summary['updated'] == 1 and summary['version'] is None
+    assert open(output, encoding='utf-8').read() == before
+
+
+def test_sharded_crawl_matches_a_single_crawl(tmp_path, scraper, write_cohort):
+    common = ['--no-cache', '--delay', '0', '--backups', '0']
+    single = str(tmp_path / 'single.json')
+    write_cohort(single, 30)
+    scraper.run(scraper.parse_args(['--input', single, '--output', single] + common), log=quiet)
+
+    output = str(tmp_path / 'data.json')
+    write_cohort(output, 30)
+    sizes = []
+    for i in (1, 2, 3):
+        summary = scraper.run(scraper.parse_args(['--input', output, '--output', output, '--shard', f'{i}/3']
+                                                 + common), log=quiet)
+        sizes.append(summary['total'])
+    assert sum(sizes) == 30 and all(sizes)
+    shards = merge_shards.find_shards(output)
+    assert merge_shards.missing_shards(shards) == []
+    merge_shards.merge(output, shards, backups=0, log=quiet)
+    assert open(output, encoding='utf-8').read() == open(single, encoding='utf-8').read()
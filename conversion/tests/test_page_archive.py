@@ -0,0 +1,95 @@
+import hashlib
+import json
+import sys
+
+import data_writer
+import page_archive
+import profile_simulator
+import scrape_profiles
+from fetch_cache import FetchCache
+from page_archive import PageArchive, index_path
+from record_store import RecordStore, record_key
+
+BASE = 'http://127.0.0.1:9'
+
+
+def page(pid):
+    return profile_simulator.render_profile(pid, profile_simulator.badges_for(pid)).encode('utf-8')
+
+
+def test_add_dedupes_identical_pages(tmp_path):
+    path = str(tmp_path / 'pages.pack')
+    archive = PageArchive(path)
+    body = page('a1')
+    archive.add(f'{BASE}/public_profiles/a1', body)
+    archive.add(f'{BASE}/public_profiles/a2', body)  # another profile, same body
+    archive.add(f'{BASE}/public_profiles/a1', body)  # the same page again
+    archive.add(f'{BASE}/public_profiles/a3', 'Zoë'.encode('latin-1'), 'latin-1')
+    archive.close()
+    assert (archive.added, archive.deduplicated) == (2, 2)
+    with open(index_path(path), encoding='utf-8') as f:
+        assert len(f.readlines()) == 5  # 2 bodies + 3 profile pages; the repeat writes nothing
+
+    reopened = PageArchive(path)
+    assert reopened.blobs == archive.blobs and reopened.pages == archive.pages
+    assert reopened.pages['a1']['h'] == reopened.pages['a2']['h'] == hashlib.sha256(body).hexdigest()
+    assert reopened.read('a2') == body.decode('utf-8')
+    assert reopened.read('a3') == 'Zoë'
+    assert reopened.read('a4') is None
+
+
+def test_reparse_reads_the_pack_through_mmap(tmp_path):
+    archive = PageArchive(str(tmp_path / 'pages.pack'))
+    pids = [f'{i:04x}' for i in range(10)]
+    for pid in pids:
+        archive.add(f'{BASE}/public_profiles/{pid}', page(pid))
+    archive.add(f'{BASE}/public_profiles/c0de', page('0003'))
+    archive.close()
+    expected = {pid: scrape_profiles.extract_badges_from_html(page(pid).decode('utf-8')) for pid in pids}
+    expected['c0de'] = expected['0003']
+    for workers in (1, 2):
+        extracted, strategies = page_archive.reparse(PageArchive(archive.path), 'bs4', workers, batch_size=4)
+        assert extracted == expected
+        # identical bodies are parsed once
+        assert sum(strategies.values()) == 10
+
+
+def test_reparse_apply_updates_data_and_cache(tmp_path, monkeypatch, capsys):
+    records = profile_simulator.make_cohort(4, BASE)
+    records.append(dict(records[1]))  # a profile listed twice gets the badges in both records
+    data_path = str(tmp_path / 'data.json')
+    with open(data_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=4)
+    pack = str(tmp_path / 'pages.pack')
+    archive = PageArchive(pack)
+    urls = [scrape_profiles.entry_url(rec) for rec in records[:4]]
+    for url in urls:
+        archive.add(url, page(record_key({'Profile URL': url})))
+    archive.close()
+    # the cache still holds an older extraction of these exact bodies
+    cache_path = str(tmp_path / 'cache.json')
+    cache = FetchCache(cache_path)
+    for url in urls:
+        body = page(record_key({'Profile URL': url}))
+        cache.store(url, {'ETag': 'x'}, hashlib.sha256(body).hexdigest(), [])
+    cache.save()
+
+    monkeypatch.setattr(sys, 'argv', ['page_archive.py', '--archive', pack, 'reparse', '--data', data_path,
+                                      '--parser', 'bs4', '--workers', '1', '--apply', '--cache', cache_path,
+                                      '--backups', '0'])
+    page_archive.main()
+    assert 'Updated 4 fetch cache entries' in capsys.readouterr().out
+
+    expected = {record_key(rec): scrape_profiles.extract_badges_from_html(page(record_key(rec)).decode('utf-8'))
+                for rec in records}
+    data = RecordStore.load(data_path)
+    assert [rec.skill_badges for rec in data] == [len(expected[record_key(rec)]) for rec in records]
+    assert data[1].to_dict() == data[4].to_dict()
+    delta = data_writer.read_delta(data_path, 0)['records']
+    assert sorted(delta) == sorted(list(expected) + [record_key(records[1]) + '#2'])
+    cached = FetchCache(cache_path).entries
+    assert all(cached[url]['badges'] == expected[record_key({'Profile URL': url})] for url in urls)
+
+    # nothing left to apply the second time
+    page_archive.main()
+    assert 'Updated 0 fetch cache entries' in capsys.readouterr().out
@@ -0,0 +1,77 @@
+import contextlib
+import csv
+import io
+import json
+import sys
+
+import converter
+from pathways import PATHWAYS, PathwayClassifier, load_pathways
+
+OVERLAPPING = (
+    {'name': 'short', 'field': 'Short', 'keywords': ['gen', 'tex']},
+    {'name': 'long', 'field': 'Long', 'keywords': ['GenAI', 'vertex']},
+    {'name': 'ai', 'field': 'AI', 'keywords': ['ai']},
+    {'name': 'games', 'field': 'Games', 'arcade_games': 2},
+)
+
+TITLES = ['GenAI Apps', 'Vertex AI', 'Prompt Design', 'general', 'Texture', 'Cloud Run', '', 'gEN-ai and Streamlit',
+          'Build a Secure Google Cloud Network', 'Develop GenAI Apps with Gemini and Streamlit [Skill Badge]']
+
+
+def naive(pathways, names):
+    """The rules applied one keyword at a time, as documented."""
+    found = set()
+    for name in names:
+        for p in pathways:
+            if any(k.lower() in name.lower() for k in p.get('keywords', ())):
+                found.add(p['name'])
+    return found
+
+
+def test_classifier_matches_substring_search():
+    for pathways in (PATHWAYS, OVERLAPPING):
+        classifier = PathwayClassifier(pathways)
+        for title in TITLES:
+            assert classifier.classify_badge(title) == naive(pathways, [title]), title
+        joined = ' | '.join(TITLES)
+        assert classifier.classify_badges(joined) == naive(pathways, TITLES)
+        # the memoized answers are the same
+        assert classifier.classify_badges(joined) == naive(pathways, TITLES)
+
+
+def test_overlapping_and_prefix_keywords():
+    classifier = PathwayClassifier(OVERLAPPING)
+    # 'genai' is the longest match at 0 but its prefix 'gen' still counts; 'tex' overlaps 'vertex'
+    assert classifier.classify_badge('GenAI') == {'short', 'long', 'ai'}
+    assert classifier.classify_badge('Vertex') == {'short', 'long'}
+    assert classifier.classify_badge('gen') == {'short'}
+    assert classifier.classify_badges('') == set()
+
+
+def test_arcade_threshold():
+    classifier = PathwayClassifier(OVERLAPPING)
+    flags = [dict(classifier.completion_flags('Vertex', n))['Games'] for n in (0, 1, 2, 3)]
+    assert flags == ['0', '0', '1', '1']
+    assert classifier.completion_flags('Vertex', 2) == [('Short', '1'), ('Long', '1'), ('AI', '0'), ('Games', '1')]
+    default = dict(PathwayClassifier().completion_flags('', 1))
+    assert default['Gen AI Arcade Game Completion'] == '1'
+
+
+def test_converter_loads_pathways(tmp_path, monkeypatch):
+    rules = tmp_path / 'pathways.json'
+    rules.write_text(json.dumps(OVERLAPPING), encoding='utf-8')
+    assert load_pathways(str(rules)) == OVERLAPPING
+    csv_path = tmp_path / 'export.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([['User Name', 'Names of Completed Skill Badges', '# of Arcade Games Completed'],
+                                 ['A', 'Vertex AI | Cloud Run', '2'], ['B', 'Cloud Run', '1']])
+    for extra in ([], ['--stream']):
+        out = tmp_path / 'data.json'
+        monkeypatch.setattr(sys, 'argv', ['converter.py', '-i', str(csv_path), '-o', str(out),
+                                          '--pathways', str(rules)] + extra)
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter.main()
+        records = json.loads(out.read_text(encoding='utf-8'))
+        assert [[rec.get(p['field']) for p in OVERLAPPING] for rec in records] == [['1', '1', '1', '1'],
+                                                                                   ['0', '0', '0', '0']]
+        assert 'Gen AI Arcade Game Completion' not in records[0]
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+import pipeline
+
+
+def fetch(url, timeout=15, cache=None, session=None):
+    if url.endswith('/cached'):
+        return {'url': url, 'badges': ['A'], 'cached': True}
+    if url.endswith('/missing'):
+        return {'url': url, 'error': 'HTTP 404', 'badges': [], 'status': 404}
+    return {'url': url, 'text': f'<p>{url}</p>'}
+
+
+def finish(page, badges, cache=None):
+    return {'url': page['url'], 'badges': badges}
+
+
+def parse(text):
+    return [text]
+
+
+def crash(text):
+    os._exit(1)  # a parser process dying mid-crawl
+
+
+def run(urls, parse_fn=parse, stats=None, **kwargs):
+    return pipeline.iter_pipeline(urls, lambda url: url, fetch, finish, parse_fn, fetchers=3, parsers=1,
+                                  queue_depth=2, delay=0, stats=stats, **kwargs)
+
+
+def fetch_threads():
+    return [t for t in threading.enumerate() if t.name.startswith(('fetch-', 'parse-dispatch'))]
+
+
+def test_every_page_comes_through():
+    stats = pipeline.PipelineStats()
+    urls = [f'http://x/{i}' for i in range(20)] + ['http://x/cached', 'http://x/missing', '']
+    results = {entry: (result, err) for entry, result, err in run(urls, stats=stats)}
+    assert results['http://x/3'] == ({'url': 'http://x/3', 'badges': ['<p>http://x/3</p>']}, None)
+    assert results['http://x/cached'][0]['cached']
+    assert results['http://x/missing'][0]['error'] == 'HTTP 404'
+    assert results[''] == (None, 'no-url')
+    assert (stats.fetched, stats.parsed, stats.parse_skipped, stats.fetch_errors, stats.written) == (22, 20, 1, 1, 23)
+    assert '1 skipped via cache' in stats.summary() and '1 failed' in stats.summary()
+
+
+def test_dead_parser_process_fails_pages_instead_of_hanging():
+    urls = [f'http://x/{i}' for i in range(10)]
+    done = []
+    worker = threading.Thread(target=lambda: done.extend(run(urls, parse_fn=crash)), daemon=True)
+    worker.start()
+    worker.join(30)
+    assert not worker.is_alive(), 'pipeline hung after its process pool broke'
+    assert sorted(entry for entry, _result, _err in done) == sorted(urls)
+    assert all(result['kind'] == 'parse' and result['error'].startswith('parse failed') for _e, result, _ in done)
+
+
+def test_stopping_early_shuts_every_stage_down():
+    urls = [f'http://x/{i}' for i in range(200)]
+    results = run(urls)
+    next(results)
+    t0 = time.monotonic()
+    results.close()
+    assert time.monotonic() - t0 < 10
+    assert fetch_threads() == []
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import json
+
+import converter
+import data_writer
+import profile_simulator
+from record_store import ProfileIndex, RecordStore, StudentRecord, apply_badges, load_data, profile_key, record_key
+
+ODD_RECORDS = [
+    {'User Name': 'Zoë Ünïcode', 'Google Cloud Skills Boost Profile URL': 'https://www.cloudskillsboost.google/public_profiles/ABC-1',
+     '# of Skill Badges Completed': '3', '# of Arcade Games Completed': 1, '# of Courses Completed': ' 4',
+     'All 3 Pathways Completed - Yes or No': 'yes', 'Names of Completed Skill Badges': 'A | B | C',
+     'Gen AI Arcade Game Completion': '1', 'Unknown Column': [1, 2]},
+    {'Profile URL': 'cloudskillsboost.google/u/0/x/', '# of Skill Badges Completed': '', 'User Name': None},
+    {},
+]
+
+
+def test_odd_records_round_trip():
+    for d in ODD_RECORDS:
+        rec = StudentRecord.from_dict(d)
+        assert rec.to_dict() == d
+        assert list(rec.to_dict()) == list(d)
+
+
+def test_converter_output_round_trips_byte_for_byte(tmp_path):
+    csv_path = tmp_path / 'export.csv'
+    json_path = tmp_path / 'data.json'
+    profile_simulator.write_export_csv(str(csv_path), 200, 'http://127.0.0.1:9')
+    with contextlib.redirect_stdout(io.StringIO()):
+        converter.csv_to_json(str(csv_path), str(json_path))
+    original = json_path.read_bytes()
+
+    store = RecordStore.load(str(json_path))
+    assert len(store) == 200
+    store.save(str(json_path))
+    assert json_path.read_bytes() == original
+
+
+def test_set_skill_badges_recomputes_derived_columns():
+    rec = StudentRecord.from_dict({'# of Skill Badges Completed': '18', '# of Arcade Games Completed': '1',
+                                   '# of Courses Completed': '19', 'All 3 Pathways Completed - Yes or No': 'No'})
+    names = [f'Badge {i}' for i in range(19)]
+    assert apply_badges(rec, names, log=lambda line: None)
+    assert rec['# of Skill Badges Completed'] == 19
+    assert rec['# of Courses Completed'] == 20
+    assert rec['All 3 Pathways Completed - Yes or No'] == 'Yes'
+    assert rec['Names of Completed Skill Badges'] == ' | '.join(names)
+    # badge counts only ever go up
+    assert not apply_badges(rec, names[:5], log=lambda line: None)
+
+
+def test_load_data_applies_pending_patches(tmp_path):
+    path = str(tmp_path / 'data.json')
+    records = profile_simulator.make_cohort(3, 'http://127.0.0.1:9')
+    data_writer.save_data(path, records, backups=0)
+    patched = dict(records[1], **{'# of Skill Badges Completed': '2', 'Names of Completed Skill Badges': 'A | B'})
+    data_writer.patch_data(path, {record_key(records[1]): patched})
+    # a patch never lowers a count
+    data_writer.patch_data(path, {record_key(records[2]): dict(records[2], **{'# of Skill Badges Completed': '0'})})
+
+    data = load_data(path)
+    assert [rec.to_dict() for rec in data] == [records[0], patched, records[2]]
+
+
+def test_profile_keys_and_index():
+    url = 'https://www.cloudskillsboost.google/public_profiles/ABC-1?utm=x'
+    assert profile_key(url) == profile_key('http://cloudskillsboost.google/public_profiles/abc-1/') == 'abc-1'
+    assert profile_key('https://www.example.com/u/x/') == 'example.com/u/x'
+    data = RecordStore.from_dicts(json.loads(json.dumps(ODD_RECORDS)) + [dict(ODD_RECORDS[0], **{'User Name': 'Other'})])
+    index = ProfileIndex(data)
+    assert [rec.get('User Name') for _key, rec in index.find(url)] == ['Zoë Ünïcode', 'Other']
+    assert [key for key, _rec in index.find('  zoë   ÜNÏCODE ')] == ['abc-1']
+    assert index.find('nobody') == []
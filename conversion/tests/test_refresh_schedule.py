@@ -0,0 +1,85 @@
+from refresh_schedule import DAY, HOUR, NEW_SCORE, RefreshSchedule
+
+NOW = 1_000_000_000.0
+
+
+def make_schedule(tmp_path):
+    return RefreshSchedule(str(tmp_path / 'schedule.json'))
+
+
+def select(schedule, keys, budget=0, complete=(), now=NOW):
+    return schedule.select(keys, lambda k: k, lambda k: k in complete, budget, now=now)
+
+
+def test_never_fetched_is_due(tmp_path):
+    schedule = make_schedule(tmp_path)
+    assert select(schedule, ['a', 'b']) == ['a', 'b']
+
+
+def test_fresh_fetch_is_not_due(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_fetch('a', 3, now=NOW - 60)
+    assert select(schedule, ['a']) == []
+
+
+def test_budget_takes_most_overdue_first(tmp_path):
+    schedule = make_schedule(tmp_path)
+    # both changed a week ago, so their interval is max_interval; 'old' was fetched longer ago
+    for key, fetched in (('old', NOW - 9 * DAY), ('recent', NOW - 4 * DAY)):
+        schedule.record_fetch(key, 1, changed=True, now=NOW - 10 * DAY)
+        schedule.record_fetch(key, 1, now=fetched)
+    assert select(schedule, ['recent', 'old']) == ['old', 'recent']
+    assert select(schedule, ['recent', 'old'], budget=1) == ['old']
+
+
+def test_new_profiles_rank_behind_long_overdue(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_fetch('stale', 1, changed=True, now=NOW - 30 * DAY)
+    schedule.record_fetch('stale', 1, now=NOW - 20 * DAY)
+    assert schedule.overdue('stale', False, NOW) > NEW_SCORE
+    assert select(schedule, ['new', 'stale'], budget=1) == ['stale']
+
+
+def test_complete_profiles_wait_longer(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_fetch('done', 5, changed=True, now=NOW - 4 * DAY)
+    schedule.record_fetch('active', 5, changed=True, now=NOW - 4 * DAY)
+    assert select(schedule, ['done', 'active'], complete={'done'}) == ['active']
+
+
+def test_failures_back_off_exponentially(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_failure('flaky', now=NOW)
+    assert schedule.interval('flaky', False, NOW) == HOUR
+    schedule.record_failure('flaky', now=NOW)
+    schedule.record_failure('flaky', now=NOW)
+    assert schedule.interval('flaky', False, NOW) == 4 * HOUR
+    assert select(schedule, ['flaky'], now=NOW + 3 * HOUR) == []
+    assert select(schedule, ['flaky'], now=NOW + 4 * HOUR) == ['flaky']
+
+
+def test_failing_keys_do_not_take_the_budget(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_failure('gone', dead=True, now=NOW - HOUR)
+    schedule.record_failure('flaky', now=NOW - 30 * 60)
+    schedule.record_fetch('due', 1, changed=True, now=NOW - 2 * DAY)
+    schedule.record_fetch('due', 1, now=NOW - DAY)
+    assert schedule.interval('gone', False, NOW) == schedule.complete_interval
+    assert select(schedule, ['gone', 'flaky', 'due'], budget=1) == ['due']
+
+
+def test_success_clears_failures(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_failure('a', now=NOW - DAY)
+    schedule.record_fetch('a', 2, now=NOW)
+    st = schedule.state['a']
+    assert 'failures' not in st and 'dead' not in st
+    assert st['first_fetched'] == NOW
+
+
+def test_state_survives_save(tmp_path):
+    schedule = make_schedule(tmp_path)
+    schedule.record_fetch('a', 2, now=NOW)
+    schedule.record_failure('b', now=NOW)
+    schedule.save()
+    assert make_schedule(tmp_path).state == schedule.state
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+import refresh_server
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, scraper, write_cohort):
+    """The refresh server's test client, serving one cohort of 5 simulated students."""
+    path = str(tmp_path / 'data.json')
+    write_cohort(path, 5)
+    monkeypatch.setattr(refresh_server, 'DATA_PATH', path)
+    monkeypatch.setattr(refresh_server, 'COHORTS', {})
+    monkeypatch.setattr(refresh_server, 'SCRAPER_ARGS', ['--schedule', str(tmp_path / 'schedule.json'), '--no-cache',
+                                                         '--delay', '0', '--backups', '0'])
+    monkeypatch.setattr(refresh_server, 'FLUSH_AFTER', 3600)
+    for name in ('_jobs', '_current', '_boards', '_flush_timers'):
+        monkeypatch.setattr(refresh_server, name, {})
+    monkeypatch.setattr(scraper, 'FLIGHTS', SingleFlight(600))
+    monkeypatch.setattr(scraper, 'WARM', {})
+    return refresh_server.app.test_client()
+
+
+def test_refresh_runs_a_job(app):
+    response = app.post('/refresh?wait=30')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'succeeded' and not body['merged']
+    assert body['summary']['fetched'] == 5
+    assert app.get(f"/jobs/{body['job_id']}").get_json()['done'] == 5
+
+
+def test_job_failures(monkeypatch, scraper):
+    monkeypatch.setattr(refresh_server, 'sync_leaderboards', lambda: None)
+    job = refresh_server.RefreshJob()
+    job.run(['--no-such-option'])
+    assert job.status == 'failed' and job.error == '2'
+
+    def interrupted(args, log, progress):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(scraper, 'run', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        refresh_server.RefreshJob().run([])
+
+
+def test_concurrent_refreshes_join_one_job(app, monkeypatch):
+    release = threading.Event()
+    ran = []
+
+    def run(job, argv):
+        job.set_status('running')
+        ran.append(job.id)
+        release.wait(10)
+        job.set_status('succeeded')
+
+    monkeypatch.setattr(refresh_server.RefreshJob, 'run', run)
+    first = app.post('/refresh')
+    assert first.status_code == 202
+    second = app.post('/refresh').get_json()
+    assert second['merged'] and second['job_id'] == first.get_json()['job_id']
+    assert app.post('/refresh?cohort=elsewhere').status_code == 404
+
+    release.set()
+    refresh_server._jobs[second['job_id']].wait(10)
+    third = app.post('/refresh?wait=10').get_json()
+    assert not third['merged'] and third['job_id'] != second['job_id']
+    assert len(ran) == 2
+
+
+def test_leaderboard_pages_and_etag(app):
+    response = app.get('/cohorts/main/leaderboard?per_page=2&page=2')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['total'], body['pages'], len(body['rows'])) == (5, 3, 2)
+    assert response.headers['ETag']
+
+    cached = app.get('/cohorts/main/leaderboard?per_page=2&page=2', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304 and not cached.data
+    assert cached.headers['ETag'] == response.headers['ETag']
+
+    # a refresh changes the cohort, so the old ETag no longer matches
+    app.post('/refresh?wait=30')
+    fresh = app.get('/cohorts/main/leaderboard', headers={'If-None-Match': response.headers['ETag']})
+    assert fresh.status_code == 200 and fresh.headers['ETag'] != response.headers['ETag']
+    assert fresh.get_json()['rows'][0]['rank'] == 1
+
+
+def test_leaderboard_errors(app):
+    assert app.get('/cohorts/nope/leaderboard').status_code == 404
+    assert app.get('/cohorts/main/leaderboard?sort=shoe-size').status_code == 400
+    assert app.get('/cohorts/main/leaderboard?q=Student%203').get_json()['total'] == 1
+
+
+def test_cohort_delta(app, tmp_path, monkeypatch, write_cohort):
+    other = str(tmp_path / 'other.json')
+    write_cohort(other, 3)
+    monkeypatch.setattr(refresh_server, 'COHORTS', {'main': refresh_server.DATA_PATH, 'other': other})
+    app.post('/refresh?cohort=other&wait=30')
+    delta = app.get('/cohorts/other/delta?since=0').get_json()
+    assert delta['version'] == 1 and len(delta['records']) == 3
+    assert app.get('/data/delta?cohort=other&since=0').get_json() == delta
+    assert app.get('/data/delta?since=0').get_json()['version'] == 0
+    assert app.get('/cohorts/nope/delta').status_code == 404
+
+
+def test_refresh_one_profile(app, simulator):
+    server = simulator[0]
+    with open(refresh_server.DATA_PATH, encoding='utf-8') as f:
+        before = f.read()
+    assert app.post('/refresh/nobody').status_code == 404
+    assert app.post('/refresh/Student%202?cohort=nope').status_code == 404
+
+    requests = server.stats['requests']
+    first = app.post('/refresh/Student%202').get_json()
+    assert first['success'] and first['updated'] and not first['cached']
+    assert first['record']['User Name'] == 'Student 2' and first['badges'] > 0
+    assert server.stats['requests'] == requests + 1
+
+    # patched into the delta log, not data.json
+    delta = app.get('/data/delta?since=0').get_json()
+    assert delta['records'] == {first['profile']: first['record']}
+    with open(refresh_server.DATA_PATH, encoding='utf-8') as f:
+        assert f.read() == before
+    board = app.get('/cohorts/main/leaderboard?q=Student%202').get_json()
+    assert board['rows'][0]['# of Skill Badges Completed'] == first['badges']
+
+    # a repeat click, by profile id this time, is answered from memory
+    again = app.post(f"/refresh/{first['profile']}").get_json()
+    assert again['cached'] and not again['updated'] and again['profile'] == first['profile']
+    assert server.stats['requests'] == requests + 1
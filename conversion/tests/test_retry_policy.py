@@ -0,0 +1,159 @@
+import random
+import time
+import types
+
+import pytest
+
+import retry_policy
+from retry_policy import HostBreaker, RetryPolicy, classify, parse_retry_after
+
+URL = 'http://profiles.test/public_profiles/1'
+
+
+@pytest.mark.parametrize('result, kind', [
+    (None, 'network'),
+    ({'badges': []}, None),
+    ({'error': 'timed out', 'timeout': True}, 'timeout'),
+    ({'error': 'HTTP 429', 'status': 429}, 'throttled'),
+    ({'error': 'HTTP 503', 'status': 503}, 'throttled'),
+    ({'error': 'HTTP 500', 'status': 500}, 'server'),
+    ({'error': 'HTTP 404', 'status': 404}, 'dead'),
+    ({'error': 'HTTP 410', 'status': 410}, 'dead'),
+    ({'error': 'HTTP 403', 'status': 403}, 'client'),
+    ({'error': 'connection reset'}, 'network'),
+    ({'error': 'no badges', 'kind': 'parse', 'status': 200}, 'parse'),
+])
+def test_classify(result, kind):
+    assert classify(result) == kind
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Thu, 01 Jan 1970 00:01:40 GMT', now=40) == 60.0
+
+
+def test_retry_delays():
+    policy = RetryPolicy(retries=3, base=1.0, cap=5.0, rng=random.Random(1))
+    for attempt in (1, 2, 3):
+        assert 0 <= policy.delay('server', attempt) <= min(5.0, 2 ** attempt)
+    assert policy.delay('server', 4) is None
+    assert policy.delay('dead', 1) is None
+    assert policy.delay('client', 1) is None
+    assert policy.delay('parse', 1) is not None and policy.delay('parse', 2) is None
+    assert 3.0 <= policy.delay('throttled', 1, retry_after=3.0) <= 4.0
+    # a Retry-After beyond the cap gives up for this run
+    assert policy.delay('throttled', 1, retry_after=60.0) is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    fake = types.SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter)
+    monkeypatch.setattr(retry_policy, 'time', fake)
+    return now
+
+
+def fetch(breaker, result):
+    assert breaker.try_acquire(URL) == 0
+    breaker.release(URL, result)
+
+
+def state(breaker):
+    return breaker.hosts['profiles.test']
+
+
+def test_breaker_limits_in_flight(clock):
+    breaker = HostBreaker(max_concurrency=2)
+    assert breaker.try_acquire(URL) == 0
+    assert breaker.try_acquire(URL) == 0
+    assert breaker.try_acquire(URL) > 0
+    breaker.release(URL, {'badges': []})
+    assert breaker.try_acquire(URL) == 0
+    # other hosts have their own slots
+    assert breaker.try_acquire('http://other.test/x') == 0
+
+
+def test_throttling_halves_the_limit_once_per_cooldown(clock):
+    breaker = HostBreaker(max_concurrency=8, failure_threshold=100, cooldown=5.0)
+    throttled = {'error': 'HTTP 429', 'status': 429}
+    fetch(breaker, throttled)
+    fetch(breaker, throttled)
+    assert state(breaker)['limit'] == 4
+    clock[0] += 5.0
+    fetch(breaker, throttled)
+    assert state(breaker)['limit'] == 2
+
+
+def test_successes_raise_the_limit(clock):
+    breaker = HostBreaker(max_concurrency=8, failure_threshold=100)
+    fetch(breaker, {'error': 'HTTP 429', 'status': 429})
+    assert state(breaker)['limit'] == 4
+    for _ in range(4):
+        fetch(breaker, {'badges': []})
+    assert state(breaker)['limit'] == 5
+    for _ in range(100):
+        fetch(breaker, {'badges': []})
+    assert state(breaker)['limit'] == 8
+
+
+def test_consecutive_failures_open_the_circuit(clock):
+    breaker = HostBreaker(max_concurrency=4, failure_threshold=3, cooldown=5.0)
+    for _ in range(3):
+        fetch(breaker, {'error': 'HTTP 500', 'status': 500})
+    assert breaker.trips == 1
+    assert breaker.try_acquire(URL) == pytest.approx(5.0)
+    clock[0] += 5.0
+    # half-open: requests go through again, at the reduced limit
+    assert breaker.try_acquire(URL) == 0
+    assert state(breaker)['limit'] == 2
+    breaker.release(URL, {'badges': []})
+    assert state(breaker)['failures'] == 0
+
+
+def test_retry_after_pauses_the_host(clock):
+    breaker = HostBreaker(max_concurrency=4, failure_threshold=100, max_pause=30.0)
+    fetch(breaker, {'error': 'HTTP 503', 'status': 503, 'retry_after': '10'})
+    assert breaker.try_acquire(URL) == pytest.approx(10.0)
+    fetch_after = {'error': 'HTTP 503', 'status': 503, 'retry_after': '600'}
+    clock[0] += 10.0
+    fetch(breaker, fetch_after)
+    assert breaker.try_acquire(URL) == pytest.approx(30.0)
+
+
+def test_dead_profiles_do_not_trip_the_breaker(clock):
+    breaker = HostBreaker(max_concurrency=4, failure_threshold=2)
+    for _ in range(5):
+        fetch(breaker, {'error': 'HTTP 404', 'status': 404})
+    assert breaker.trips == 0
+    assert state(breaker)['limit'] == 4
+
+
+def test_dead_and_client_errors_are_neutral(clock):
+    breaker = HostBreaker(max_concurrency=8, failure_threshold=2)
+    fetch(breaker, {'error': 'HTTP 429', 'status': 429})
+    for _ in range(10):
+        fetch(breaker, {'error': 'HTTP 404', 'status': 404})
+        fetch(breaker, {'error': 'HTTP 403', 'status': 403})
+    # no additive increase from them, and the failure run is not reset either
+    assert state(breaker)['limit'] == 4 and state(breaker)['successes'] == 0
+    fetch(breaker, {'error': 'HTTP 500', 'status': 500})
+    assert breaker.trips == 1
+
+
+def test_scheduler_retries_until_success():
+    attempts = []
+
+    def flaky(url):
+        attempts.append(url)
+        if len(attempts) < 3:
+            return {'url': url, 'error': 'HTTP 500', 'status': 500, 'badges': []}
+        return {'url': url, 'badges': ['A']}
+
+    scheduler = retry_policy.RetryScheduler(flaky, RetryPolicy(retries=3, base=0.01), HostBreaker(4),
+                                            workers=2, log=lambda line: None)
+    assert scheduler.submit('entry', URL, {'url': URL, 'error': 'HTTP 500', 'status': 500})
+    assert not scheduler.submit('gone', URL, {'url': URL, 'error': 'HTTP 404', 'status': 404})
+    assert list(scheduler.drain()) == [('entry', {'url': URL, 'badges': ['A']}, None)]
+    assert (scheduler.retried, scheduler.recovered) == (3, 1)
@@ -0,0 +1,94 @@
+import contextlib
+import io
+
+import pytest
+
+import converter
+import profile_simulator
+from record_store import RecordStore, StudentRecord, apply_badges, record_key
+from sqlite_store import SqliteStore, badge_names
+
+
+def quiet(line):
+    pass
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    """(data.json path, its records) as converter.py writes them, and an open store holding them."""
+    csv_path = str(tmp_path / 'export.csv')
+    json_path = str(tmp_path / 'data.json')
+    profile_simulator.write_export_csv(csv_path, 40, 'http://127.0.0.1:9')
+    with contextlib.redirect_stdout(io.StringIO()):
+        converter.csv_to_json(csv_path, json_path)
+    store = SqliteStore(str(tmp_path / 'cohort.db'))
+    _run, written, events = store.write(enumerate(RecordStore.load(json_path)), 'import', replace=True)
+    assert written == 40 and events == 0
+    yield json_path, list(RecordStore.load(json_path)), store
+    store.close()
+
+
+def with_more_badges(rec, *names):
+    rec = StudentRecord.from_dict(rec.to_dict())
+    assert apply_badges(rec, badge_names(rec) + list(names), log=quiet)
+    return rec
+
+
+def test_export_matches_data_json(tmp_path, cohort):
+    json_path, _records, store = cohort
+    store.export(str(tmp_path / 'exported.json'))
+    assert (tmp_path / 'exported.json').read_bytes() == open(json_path, 'rb').read()
+    # converter.py --db, exported, is what converter.py would have written
+    with contextlib.redirect_stdout(io.StringIO()):
+        converter.csv_to_db(str(tmp_path / 'export.csv'), str(tmp_path / 'converted.db'))
+    with SqliteStore(str(tmp_path / 'converted.db')) as converted:
+        converted.export(str(tmp_path / 'converted.json'))
+    assert (tmp_path / 'converted.json').read_bytes() == open(json_path, 'rb').read()
+
+
+def test_upsert_keeps_position_and_logs_new_badges(cohort):
+    _json_path, records, store = cohort
+    updated = with_more_badges(records[3], 'New Badge One', 'New Badge Two')
+    _run, written, events = store.write([(None, updated)], 'scraper', when=1000.0)
+    assert (written, events) == (1, 2)
+    loaded = store.load()
+    assert len(loaded) == 40 and loaded[3].to_dict() == updated.to_dict()
+    assert store.history(record_key(records[3])) == [(1000.0, 'New Badge One'), (1000.0, 'New Badge Two')]
+    # writing the same record again earns nothing
+    assert store.write([(None, updated)], 'scraper')[2] == 0
+
+
+def test_new_student_goes_last_without_events(cohort):
+    _json_path, records, store = cohort
+    newcomer = with_more_badges(StudentRecord.from_dict(dict(
+        records[0].to_dict(), **{'User Name': 'New Student', 'Names of Completed Skill Badges': '',
+                                 '# of Skill Badges Completed': '0',
+                                 'Google Cloud Skills Boost Profile URL': 'https://example.com/public_profiles/ff'})),
+        'Badge X')
+    known = with_more_badges(records[0], 'Badge Y')
+    _run, written, events = store.write([(None, newcomer), (None, known)], 'scraper')
+    # only the student the store already had earns an event
+    assert (written, events) == (2, 1)
+    loaded = store.load()
+    assert len(loaded) == 41 and loaded[40]['User Name'] == 'New Student'
+    assert store.history('ff') == []
+    assert [name for _when, name in store.history(record_key(records[0]))] == ['Badge Y']
+    assert store.find('ff')[0][1].to_dict() == newcomer.to_dict()
+
+
+def test_replace_deletes_missing_students(cohort):
+    _json_path, records, store = cohort
+    store.write(enumerate(records[:30]), 'import', replace=True)
+    assert len(store) == 30
+    assert store.find(record_key(records[35])) == []
+    assert [rec.to_dict() for rec in store.load()] == [rec.to_dict() for rec in records[:30]]
+
+
+def test_profile_listed_twice_keeps_both_rows(tmp_path, cohort):
+    _json_path, records, store = cohort
+    twice = records + [StudentRecord.from_dict(dict(records[5].to_dict(), **{'User Name': 'Again'}))]
+    store.write(enumerate(twice), 'import', replace=True)
+    assert len(store) == 41 and store.load()[40]['User Name'] == 'Again'
+    store.export(str(tmp_path / 'exported.json'))
+    assert [rec.to_dict() for rec in RecordStore.load(str(tmp_path / 'exported.json'))] == \
+        [rec.to_dict() for rec in twice]
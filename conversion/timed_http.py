@@ -0,0 +1,61 @@
+"""
+timed_http.py
+
+urllib3 connection classes that time connection setup for crawl_metrics.py,
+and the requests adapter that mounts them (see
+crawl_metrics.instrument_session).
+
+Only public hooks are used: connect() is timed as a whole, so the 'connect'
+phase of the requests-based engines covers DNS, TCP and TLS together (the
+async engine, whose aiohttp trace hooks report DNS on its own, records 'dns'
+and 'connect' apart). Splitting them here would mean reaching into urllib3's
+private resolver state, which changes between releases.
+
+Kept apart from crawl_metrics so that importing the metrics (the report,
+/metrics, leaderboard queries) doesn't load requests and urllib3; this module
+is only imported once a session is created.
+"""
+import sys
+import time
+
+try:
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+except Exception:
+    print("Missing dependencies. Install with: pip install -r conversion/requirements.txt", file=sys.stderr)
+    raise
+
+from crawl_metrics import add_connection_timing
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        add_connection_timing('connect', time.perf_counter() - t0)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """requests adapter whose connections record their setup time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                   'https': TimedHTTPSConnectionPool}
@@ -2,6 +2,10 @@ const progress = document.querySelector(".progress-bar");
 const progressLabelLeft = document.querySelector(".progress-label.left");
 const progressLabelRight = document.querySelector(".progress-label.right");
 
+// Local refresh server (conversion/refresh_server.py)
+const REFRESH_SERVER = 'http://localhost:5001';
+const REFRESH_POLL_MS = 1000;
+
 // Milestones and current target selection
 const MILESTONES = [50, 75, 100];
 let activeMilestoneIndex = 0; // start with first milestone (50)
@@ -34,44 +38,99 @@ let currentComparator = numericCompareFactory((r) => {
   return s + a;
 });
 
-const updateData = async (filter, flag, bustCache = false) => {
+// Records currently shown, kept in memory so filtering/sorting doesn't refetch
+// data.json, and the delta-log version they correspond to (see data_writer.py)
+let allData = null;
+let dataVersion = 0;
+
+const showLastUpdated = (lastModified) => {
+  const lastUpdateEl = document.getElementById('last-update-text');
+  if (!lastUpdateEl) return;
+  // Fallback: show current time if Last-Modified header is not available
+  const date = lastModified ? new Date(lastModified) : new Date();
+  const formattedDate = date.toLocaleString('en-US', {
+    month: 'short',
+    day: 'numeric',
+    year: 'numeric',
+    hour: 'numeric',
+    minute: '2-digit',
+    hour12: true
+  });
+  lastUpdateEl.textContent = `📊 Last updated: ${formattedDate} • Click "Refresh Data" to update now!`;
+};
+
+// Same key as profile_key() in scrape_profiles.py
+const profileId = (r) => {
+  const url = (r['Google Cloud Skills Boost Profile URL'] || r['Profile URL'] || '').trim();
+  const m = url.match(/public_profiles\/([0-9a-fA-F-]+)/);
+  if (m) return m[1].toLowerCase();
+  return url.replace(/^[a-z]+:\/\//i, '').replace(/^www\./i, '').split(/[?#]/)[0].replace(/\/+$/, '').toLowerCase();
+};
+
+// Same keys as delta_keys() in record_store.py: later records of a profile listed twice get '#2', '#3', ...
+const deltaIds = (rows) => {
+  const seen = new Map();
+  return rows.map((r) => {
+    const id = profileId(r);
+    const n = seen.get(id) || 0;
+    seen.set(id, n + 1);
+    return n && id ? `${id}#${n + 1}` : id;
+  });
+};
+
+const loadData = async (bustCache = false) => {
   // Add cache-busting parameter if needed
   const cacheBuster = bustCache ? `?t=${Date.now()}` : '';
-  let data = await (await fetch(`./data.json${cacheBuster}`)).json();
-  
-  // Get last modified time from data.json
+  // Read the delta version before data.json: if data.json turns out newer,
+  // re-applying those deltas later is harmless
+  const pending = {};
   try {
-    const response = await fetch(`./data.json${cacheBuster}`);
-    const lastModified = response.headers.get('Last-Modified');
-    const lastUpdateEl = document.getElementById('last-update-text');
-    
-    if (lastModified && lastUpdateEl) {
-      const date = new Date(lastModified);
-      const formattedDate = date.toLocaleString('en-US', {
-        month: 'short',
-        day: 'numeric',
-        year: 'numeric',
-        hour: 'numeric',
-        minute: '2-digit',
-        hour12: true
-      });
-      lastUpdateEl.textContent = `📊 Last updated: ${formattedDate} • Click "Refresh Data" to update now!`;
-    } else if (lastUpdateEl) {
-      // Fallback: show current time if Last-Modified header is not available
-      const now = new Date();
-      const formattedDate = now.toLocaleString('en-US', {
-        month: 'short',
-        day: 'numeric',
-        year: 'numeric',
-        hour: 'numeric',
-        minute: '2-digit',
-        hour12: true
-      });
-      lastUpdateEl.textContent = `📊 Last updated: ${formattedDate} • Click "Refresh Data" to update now!`;
-    }
+    const log = await (await fetch(`./data.delta.json?t=${Date.now()}`)).json();
+    dataVersion = log.version || 0;
+    // single-profile refreshes not yet written into data.json
+    const flushed = log.flushed ?? dataVersion;
+    (log.changes || []).filter((c) => c.version > flushed).forEach((c) => Object.assign(pending, c.records));
   } catch (e) {
-    console.error('Could not fetch last modified time:', e);
+    dataVersion = 0;
+  }
+  const response = await fetch(`./data.json${cacheBuster}`);
+  allData = await response.json();
+  if (Object.keys(pending).length) {
+    const ids = deltaIds(allData);
+    allData = allData.map((r, i) => pending[ids[i]] || r);
   }
+  showLastUpdated(response.headers.get('Last-Modified'));
+};
+
+// Fetch only the records changed since dataVersion and patch them in place
+const applyDelta = async () => {
+  const delta = await (await fetch(`${REFRESH_SERVER}/data/delta?since=${dataVersion}`)).json();
+  if (delta.full_reload || !allData) {
+    await loadData(true);
+    return;
+  }
+  const positions = new Map(deltaIds(allData).map((id, i) => [id, i]));
+  Object.entries(delta.records).forEach(([id, record]) => {
+    if (positions.has(id)) {
+      allData[positions.get(id)] = record;
+    } else {
+      allData.push(record);
+    }
+  });
+  dataVersion = delta.version;
+  if (delta.time) showLastUpdated(delta.time * 1000);
+};
+
+const updateData = async (filter, flag, bustCache = false) => {
+  if (!allData || bustCache) {
+    try {
+      await loadData(bustCache);
+    } catch (e) {
+      console.error('Could not load data.json:', e);
+      return;
+    }
+  }
+  let data = allData.slice();
   
   if (filter !== "") {
     data = data.filter((el) => {
@@ -208,24 +267,38 @@ if (refreshBtn && refreshStatus && refreshIcon && refreshText) {
     refreshStatus.style.color = '#4285f4';
     
     try {
-      const response = await fetch('http://localhost:5001/refresh', {
+      // Start (or join) a background refresh job, then poll it until it finishes
+      const response = await fetch(`${REFRESH_SERVER}/refresh`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
         }
       });
       
-      const result = await response.json();
+      let result = await response.json();
+      while (result.status === 'queued' || result.status === 'running') {
+        if (result.total) {
+          const eta = result.eta_seconds != null ? ` • about ${Math.ceil(result.eta_seconds)}s left` : '';
+          refreshStatus.innerHTML = `<div class="pulse">🔄 Checked ${result.done}/${result.total} profiles${eta}</div>`;
+        }
+        await new Promise((resolve) => setTimeout(resolve, REFRESH_POLL_MS));
+        result = await (await fetch(`${REFRESH_SERVER}/jobs/${result.job_id}`)).json();
+      }
       
       if (result.success) {
         // Show success message
         refreshStatus.innerHTML = '<div class="slide-in">✅ Data refreshed successfully! Updating leaderboard...</div>';
         refreshStatus.style.color = '#0f9d58';
         
-        // Reload the data from data.json with cache-busting
-        setTimeout(() => {
-          // Force fresh fetch with cache-busting
-          updateData(input.value, true, true);
+        // Pull just the changed records (falls back to a full reload)
+        setTimeout(async () => {
+          try {
+            await applyDelta();
+          } catch (e) {
+            console.error('Could not apply delta, reloading data.json:', e);
+            await loadData(true);
+          }
+          updateData(input.value, true);
           
           // Update the last modified timestamp with animation
           const lastUpdateEl = document.getElementById('last-update-text');